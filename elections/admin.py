@@ -1,17 +1,36 @@
+from django.conf import settings
 from django.contrib import admin, messages
+from django.db.models import Prefetch, Q
+from django.http import FileResponse, Http404, HttpResponse, \
+    StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import path, reverse
 from django.utils import timezone
-from django.utils.html import mark_safe
+from django.utils.html import escape, mark_safe
 
 from django.contrib.auth import models as auth_models
 
 from .models import College, GovernmentPosition, Candidate, OfferedPosition, \
-    RunningCandidate, ElectionSeason, ElectionSeasonWinningCandidate, Ballot
-
-from . forms import ManualEntryPreliminaryForm, VotingForm
-
-import random
+    RunningCandidate, ElectionSeason, Ballot, EligibleVoter, Job
+
+from .ballots import AlreadyVotedError, ElectionClosedError, cast_ballot
+from .changelists import KeysetChangeList
+from .conclusion import conclude_election_season, refresh_winners
+from .exports import BALLOT_COLUMNS, TOTAL_COLUMNS, iter_ballot_rows, \
+    iter_csv, iter_total_rows
+from . forms import ManualEntryPreliminaryForm, SeasonImportForm, \
+    VotingForm
+from .imports import IMPORT_SECTIONS, import_season_setup, read_import_file
+from .jobs import enqueue_job
+from .lookups import get_turnout
+from .metrics import request_metrics
+from .results import build_results, get_results_summary, \
+    materialize_results
+from .tally import count_live_votes, create_vote_counters
+from .winners import get_tiebreak_seed
+
+import datetime
+import os
 
 
 @admin.register(College)
@@ -22,6 +41,9 @@ class CollegeModelAdmin(admin.ModelAdmin):
 @admin.register(GovernmentPosition)
 class GovernmentPositionModelAdmin(admin.ModelAdmin):
     list_display = ('name', 'college_description', 'description',)
+    list_select_related = ('college',)
+    search_fields = ('name', 'college__name',)
+    ordering = ('-id',)
 
     @admin.display
     def college_description(self, obj):
@@ -31,6 +53,9 @@ class GovernmentPositionModelAdmin(admin.ModelAdmin):
 @admin.register(Candidate)
 class CandidateModelAdmin(admin.ModelAdmin):
     list_display = ('student_number', 'college', 'party', 'name',)
+    list_select_related = ('college',)
+    search_fields = ('student_number', 'first_name', 'last_name',)
+    ordering = ('-id',)
 
     @admin.display
     def name(self, obj):
@@ -47,13 +72,39 @@ class RunningCandidateTabularInline(admin.TabularInline):
     model = RunningCandidate
     extra = 0
     min_num = 1
+    # Not a select of every candidate and position on each row
+    autocomplete_fields = ('candidate', 'government_position',)
 
 
 @admin.register(Ballot)
 class BallotModelAdmin(admin.ModelAdmin):
     list_display = ('id', 'voter_name', 'election_season', 'casted_on',
-                    'receipt_link',)
+                    'is_tampered', 'receipt_link',)
+    list_filter = ('is_tampered',)
+    list_select_related = ('voter', 'election_season',)
     search_fields = ('id', 'voter__first_name', 'voter__last_name',)
+    # Ballots are listed newest first, paged by id
+    sortable_by = ()
+    change_list_template = 'admin/elections/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # The voters are searched first, then their ballots through the
+        # voter index, instead of matching the voter of every ballot
+        terms = search_term.split()
+        if not terms:
+            return queryset, False
+
+        voters = auth_models.User.objects.all()
+        for term in terms:
+            voters = voters.filter(Q(first_name__icontains=term)
+                                   | Q(last_name__icontains=term))
+        matches = Q(voter__in=voters.values('id'))
+        if search_term.strip().isdigit():
+            matches |= Q(id=int(search_term))
+        return queryset.filter(matches), False
 
     @admin.display(description='Voter Name')
     def voter_name(self, obj):
@@ -66,27 +117,181 @@ class BallotModelAdmin(admin.ModelAdmin):
         return mark_safe(f'<a href="{pdf_link}" target="_blank">PDF</a>')
 
 
+@admin.register(EligibleVoter)
+class EligibleVoterModelAdmin(admin.ModelAdmin):
+    list_display = ('email', 'student_number', 'college', 'election_season',)
+    list_filter = ('election_season', 'college',)
+    list_select_related = ('college', 'election_season',)
+    search_fields = ('email', 'student_number',)
+    # Voters are listed newest first, paged by id
+    sortable_by = ()
+    change_list_template = 'admin/elections/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # Voters are searched by their exact email or student number,
+        # both of which are indexed
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(Q(email=search_term.lower())
+                               | Q(student_number=search_term)), False
+
+
+def format_job_status(job):
+    """
+    Describes a job's status, progress and duration, for the changelists.
+    """
+    status = job.get_status_display()
+    if job.status == 'RUNNING':
+        status += f' {job.progress}%'
+    elif job.status == 'PENDING' and job.run_after:
+        status += (f' (retrying at '
+                   f'{timezone.localtime(job.run_after):%H:%M:%S})')
+    if job.started_on:
+        duration = (job.finished_on if job.status != 'RUNNING'
+                    else timezone.now()) - job.started_on
+        status += f' ({duration.total_seconds():.0f}s)'
+    return (f'<a href="{reverse("admin:elections_job_change", args=[job.id])}"'
+            f' title="{escape(job.result or "")}">'
+            f'{job.get_kind_display()}: {status}</a>')
+
+
+@admin.register(Job)
+class JobModelAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'election_season', 'job_status',
+                    'created_on', 'attempts', 'output_link',)
+    list_filter = ('status', 'kind',)
+    list_select_related = ('election_season',)
+    readonly_fields = ('election_season', 'kind', 'status', 'progress',
+                       'result', 'output_link', 'attempts', 'created_on',
+                       'started_on', 'finished_on', 'heartbeat_on',
+                       'run_after',)
+    exclude = ('output',)
+
+    def has_add_permission(self, request):
+        # Jobs are requested through the election season actions
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Status')
+    def job_status(self, obj):
+        return mark_safe(format_job_status(obj))
+
+    @admin.display(description='Output')
+    def output_link(self, obj):
+        if obj.output and obj.status == 'SUCCEEDED':
+            url = reverse('admin:elections_job_output', args=[obj.id])
+            return mark_safe(f'<a href="{url}">Download</a>')
+        return '-'
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/output/',
+                 self.admin_site.admin_view(self.output_view),
+                 name='elections_job_output'),
+        ] + super().get_urls()
+        return urls
+
+    def output_view(self, request, pk):
+        job = Job.objects.filter(pk=pk, status='SUCCEEDED').first()
+        if job is None or not job.output or not os.path.exists(job.output):
+            raise Http404('This job has no output.')
+        return FileResponse(open(job.output, 'rb'), as_attachment=True,
+                            filename=os.path.basename(job.output))
+
+
 @admin.register(ElectionSeason)
 class ElectionSeasonModelAdmin(admin.ModelAdmin):
     list_display = ('academic_year', 'status', 'initiated_on', 'concluded_on',
                     'manual_entry_link', 'manage_links',
-                    'refresh_winners_link',)
+                    'refresh_winners_link', 'export_links', 'jobs',)
+    actions = ('conclude_seasons', 'refresh_winners', 'generate_results',
+               'recount_seasons', 'export_receipts',)
 
     fields = ('academic_year',)
     inlines = [OfferedPositionTabularInline, RunningCandidateTabularInline, ]
 
+    def get_queryset(self, request):
+        # The latest jobs of each season, for the jobs column
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('job_set', queryset=Job.objects.order_by('-id'),
+                     to_attr='latest_jobs'))
+
+    def changelist_view(self, request, extra_context=None):
+        # The changelist reloads itself while jobs are running,
+        # to show their progress
+        extra_context = {
+            **(extra_context or {}),
+            'has_active_jobs': Job.objects.filter(
+                status__in=('PENDING', 'RUNNING')).exists()}
+        return super().changelist_view(request, extra_context)
+
+    @admin.display(description='Jobs')
+    def jobs(self, obj):
+        # Only the latest job of each kind
+        latest_jobs = {}
+        for job in obj.latest_jobs:
+            latest_jobs.setdefault(job.kind, job)
+        return mark_safe('<br/>'.join(
+            format_job_status(job) for job in latest_jobs.values())
+            or '-')
+
+    def enqueue_jobs(self, request, queryset, kind):
+        for election_season in queryset:
+            enqueue_job(election_season, kind)
+        messages.add_message(
+            request, messages.SUCCESS,
+            f'{len(queryset)} job(s) requested. Their progress is shown '
+            f'here while `manage.py run_jobs` runs them.')
+
+    @admin.action(description='Conclude selected seasons')
+    def conclude_seasons(self, request, queryset):
+        self.enqueue_jobs(request, queryset, 'CONCLUDE')
+
+    @admin.action(description='Refresh winners of selected seasons')
+    def refresh_winners(self, request, queryset):
+        self.enqueue_jobs(request, queryset, 'REFRESH_WINNERS')
+
+    @admin.action(description='Generate results of selected seasons')
+    def generate_results(self, request, queryset):
+        self.enqueue_jobs(request, queryset, 'RESULTS')
+
+    @admin.action(description='Recount selected seasons')
+    def recount_seasons(self, request, queryset):
+        self.enqueue_jobs(request, queryset, 'RECOUNT')
+
+    @admin.action(description='Export receipts of selected seasons')
+    def export_receipts(self, request, queryset):
+        self.enqueue_jobs(request, queryset, 'EXPORT_RECEIPTS')
+
     @admin.display(description='Manage')
     def manage_links(self, obj):
         if not obj.status:
             return mark_safe(
                 f'<a href="{obj.id}/initiate/"'
                 f'onclick="return confirm(\'Initiate election season {obj}?\')"'
-                '>Initiate</a>')
+                '>Initiate</a>'
+                f' | <a href="{obj.id}/import/">Import Setup</a>')
         elif obj.status == "INITIATED":
+            live_results_link = (
+                f' | <a href="{obj.id}/results/">Live Results</a>'
+                if settings.ELECTIONS_LIVE_TALLY else '')
             return mark_safe(
                 f'<a href="{obj.id}/conclude/"'
                 f'onclick="return confirm(\'Conclude election season {obj}?\')">'
-                f'Conclude</a>')
+                f'Conclude</a>{live_results_link}'
+                f' | <a href="{obj.id}/turnout/">Turnout</a>')
+        elif obj.status == "CONCLUDING":
+            # A conclusion that did not finish can be run again
+            return mark_safe(
+                f'<a href="{obj.id}/conclude/"'
+                f'onclick="return confirm(\'Conclude election season {obj}?\')">'
+                f'Resume Conclusion</a>')
         elif obj.status == "CONCLUDED":
             return mark_safe(f'<a href="{obj.id}/results/">View Results</a>')
         else:
@@ -110,6 +315,15 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
         else:
             return "N/A"
 
+    @admin.display(description='Export')
+    def export_links(self, obj):
+        if obj.status == "CONCLUDED":
+            return mark_safe(
+                f'<a href="{obj.id}/export/ballots/">Ballots</a> | '
+                f'<a href="{obj.id}/export/totals/">Totals</a>')
+        else:
+            return "N/A"
+
     def get_urls(self):
         # TODO: Add views for initiating and concluding an election.
         urls = [
@@ -131,9 +345,98 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
             path('<int:pk>/results/',
                  self.admin_site.admin_view(
                      self.results_season_view)),
+            path('<int:pk>/turnout/',
+                 self.admin_site.admin_view(
+                     self.turnout_season_view)),
+            path('<int:pk>/import/',
+                 self.admin_site.admin_view(
+                     self.import_season_view)),
+            path('<int:pk>/export/<str:export>/',
+                 self.admin_site.admin_view(
+                     self.export_season_view)),
+            path('request-metrics/',
+                 self.admin_site.admin_view(
+                     self.request_metrics_view),
+                 name='elections_request_metrics'),
         ] + super().get_urls()
         return urls
 
+    def import_season_view(self, request, pk):
+        election_season = ElectionSeason.objects.get(pk=pk)
+
+        # Check if the season has not started, as its ballots are set
+        if election_season.status != None:
+            messages.add_message(
+                request, messages.WARNING,
+                f'Election Season {election_season} has already started.')
+            return redirect(
+                reverse('admin:elections_electionseason_changelist'))
+
+        errors = []
+        if request.method == 'POST':
+            form = SeasonImportForm(request.POST, request.FILES)
+
+            if form.is_valid():
+                data = form.cleaned_data
+                try:
+                    sections = read_import_file(data['file'],
+                                                data['section'] or None)
+                except ValueError as error:
+                    form.add_error('file', str(error))
+                else:
+                    season_import = import_season_setup(
+                        election_season, sections, dry_run=data['dry_run'])
+                    errors = season_import.errors
+
+                    if not errors and data['dry_run']:
+                        messages.add_message(request, messages.SUCCESS,
+                                             'All rows are valid.')
+                    elif not errors:
+                        messages.add_message(
+                            request, messages.SUCCESS,
+                            f'Setup of {election_season} imported: '
+                            + ', '.join(
+                                f'{season_import.created[section]} '
+                                f'{section.replace("_", " ")}'
+                                for section in IMPORT_SECTIONS) + '.')
+                        return redirect(reverse(
+                            'admin:elections_electionseason_change',
+                            args=[election_season.id]))
+
+        else:
+            form = SeasonImportForm()
+
+        return render(
+            request,
+            'admin/elections/electionseason/import_setup.html',
+            {'title': 'Import Setup', 'election_season': election_season,
+             'form': form, 'errors': errors})
+
+    def export_season_view(self, request, pk, export):
+        election_season = ElectionSeason.objects.get(pk=pk)
+
+        # Check if the season is concluded, so no ballot is missed
+        if election_season.status != 'CONCLUDED' \
+                or export not in ('ballots', 'totals'):
+            messages.add_message(
+                request, messages.WARNING,
+                f'Election Season {election_season} cannot be exported.')
+            return redirect(
+                reverse('admin:elections_electionseason_changelist'))
+
+        # Rows are sent as they are read, so the download starts right
+        # away and the ballots are never held in memory all at once
+        if export == 'ballots':
+            lines = iter_csv(BALLOT_COLUMNS,
+                             iter_ballot_rows(election_season))
+        else:
+            lines = iter_csv(TOTAL_COLUMNS,
+                             iter_total_rows(election_season))
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export}-{election_season.id}.csv"')
+        return response
+
     def initiate_season_view(self, request, pk):
         election_season = ElectionSeason.objects.get(pk=pk)
 
@@ -160,6 +463,10 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
         election_season.initiated_on = timezone.now()
         election_season.save()
 
+        # Prepare the live counters of each candidate
+        if settings.ELECTIONS_LIVE_TALLY:
+            create_vote_counters(election_season)
+
         messages.add_message(request, messages.SUCCESS,
                              f'Election Season {election_season} '
                              f'has been initiated.')
@@ -194,20 +501,14 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
         if not all(key in request.GET for key in ['voter_id', 'college_id']):
             return redirect('../step-1/')
 
-        election_season = (ElectionSeason.objects.prefetch_related(
-            "offeredposition_set",
-            "offeredposition_set__government_position",
-            "offeredposition_set__government_position__college",
-            "runningcandidate_set",
-            "runningcandidate_set__candidate",
-            "runningcandidate_set__government_position")
-            .get(pk=pk))
+        election_season = ElectionSeason.objects.get(pk=pk)
         voter = auth_models.User.objects.get(pk=request.GET.get('voter_id'))
         college = College.objects.get(pk=request.GET.get('college_id'))
 
         # Check if inputted user already has a ballot.
-        if Ballot.objects.filter(election_season=election_season,
-                                 voter=voter).first() != None:
+        # (a submitted ballot is checked by the database upon saving)
+        if request.method == 'GET' and Ballot.objects.filter(
+                election_season=election_season, voter=voter).first() != None:
             messages.add_message(
                 request, messages.WARNING,
                 f'User {voter} has already casted '
@@ -230,15 +531,23 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
                                     for voted_candidate
                                     in position_candidates]
 
-                # Construct then save the ballot object
-                ballot = Ballot(election_season=election_season,
-                                college=college,
-                                voter=voter,
-                                casted_on=timezone.now())
-                ballot.save()
-                # Set the voted candidates of this ballot
-                # then trigger another save
-                ballot.voted_candidates.add(*voted_candidates)
+                # Save the ballot
+                try:
+                    ballot = cast_ballot(election_season, college, voter,
+                                         voted_candidates)
+                except AlreadyVotedError:
+                    messages.add_message(
+                        request, messages.WARNING,
+                        f'User {voter} has already casted '
+                        f'its votes for this election.')
+                    return redirect(
+                        reverse("admin:elections_electionseason_changelist"))
+                except ElectionClosedError:
+                    messages.add_message(
+                        request, messages.WARNING,
+                        f'Election Season {election_season} is not ongoing.')
+                    return redirect(
+                        reverse("admin:elections_electionseason_changelist"))
                 # Add message
                 messages.add_message(
                     request, messages.SUCCESS,
@@ -251,105 +560,40 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
             'admin/elections/electionseason/manual_entry_second_step.html',
             {'election_season': election_season, 'voting_form': voting_form})
 
-    def get_tally(self, election_season):
-        # Initialize tally to 0 votes per candidate
-        tally = {running_candidate.id: running_candidate
-                 for running_candidate
-                 in election_season.runningcandidate_set.all()}
-        for running_candidate in tally.values():
-            running_candidate.tallied_votes = 0
-
-        # Go through each ballot's votes, add to tally
-        # TODO: Validate if ballot is tampered (digest + public key)
-        for ballot in election_season.ballot_set.all():
-            for voted_candidate in ballot.voted_candidates.all():
-                tally[voted_candidate.id].tallied_votes += 1
-
-        return tally
-
-    def get_winners(self, election_season, tally):
-        winners = []
-        # While calculating the winners, ties are inevitable.
-        # The tiebreaking enforced in here is a random.choice
-        # which is the same as a real-life coin toss done by most states.
-        # The chosen winner's tallied votes will be increased by one
-        # just so the system easily recognizes it as the winner.
-        # The candidates with updated tallies will be stored in this variable,
-        # which should be saved by the caller.
-        candidates_to_update = []
-
-        for offered_position in election_season.offeredposition_set.all():
-            candidates_for_pos = election_season.runningcandidate_set.filter(
-                government_position=offered_position.government_position)
-
-            # Find the winners of this position
-            # (uses a list to handle the possibility of ties)
-            pos_winners = []
-            for running_candidate in candidates_for_pos:
-                # Add to winners if either it is empty
-                # or if this candidate ties with the current winners
-                if len(pos_winners) == 0 \
-                    or tally[pos_winners[0].id].tallied_votes \
-                        == tally[running_candidate.id].tallied_votes:
-                    pos_winners.append(running_candidate)
-
-                # Override the winners if this candidate has more votes
-                elif tally[pos_winners[0].id].tallied_votes \
-                        < tally[running_candidate.id].tallied_votes:
-                    pos_winners.clear()
-                    pos_winners.append(running_candidate)
-
-            # If there are ties, randomly pick a winner
-            # (like simulating a real-life toin coss for tiebreaking)
-            # TODO: Consult with an elections expert
-            #       of the conducting state
-            if len(pos_winners) > 1:
-                pos_winner = random.choice(pos_winners)
-                pos_winner.tallied_votes += 1
-                candidates_to_update.append(pos_winner)
-            else:
-                pos_winner = pos_winners[0]
-
-            # Save the winner
-            government_position = offered_position.government_position
-            # Student council name
-            student_council \
-                = "CENTRAL" if not government_position.college \
-                else government_position.college.name
-            # Position name
-            position_name = f'{student_council} - ' \
-                            f'{offered_position.government_position.name}'
-
-            # Candidate name
-            candidate = pos_winner.candidate
-            candidate_name = f'{candidate.first_name} ' \
-                f'{candidate.last_name}'
-
-            winning_candidate = ElectionSeasonWinningCandidate(
-                election_season=election_season,
-                running_candidate=pos_winner,
-                position_name=position_name,
-                ballot_number=pos_winner.ballot_number,
-                candidate_name=candidate_name)
-            winners.append(winning_candidate)
-
-        return winners, candidates_to_update
+    def add_conclusion_messages(self, request, conclusion):
+        if conclusion.tampered_ballots:
+            messages.add_message(
+                request, messages.WARNING,
+                f'{len(conclusion.tampered_ballots)} ballot(s) did not '
+                f'match their signature and were left out of the tally.')
+        if conclusion.rejected_queued_ballots:
+            messages.add_message(
+                request, messages.WARNING,
+                f'{conclusion.rejected_queued_ballots} queued ballot(s) '
+                f'could not be saved and were left out of the tally.')
+        if conclusion.live_tally_mismatches:
+            messages.add_message(
+                request, messages.WARNING,
+                f'Live tally of {len(conclusion.live_tally_mismatches)} '
+                f'candidate(s) did not match the recount. '
+                f'The recount is used.')
+        # Ties are broken by a seeded, reproducible coin toss,
+        # which is told to the admin for auditing
+        for position_name, tied in conclusion.ties:
+            messages.add_message(
+                request, messages.INFO,
+                f'Tie for {position_name} between candidates '
+                f'{", ".join(str(id) for id in tied)} was broken with seed '
+                f'"{get_tiebreak_seed(conclusion.election_season)}".')
+        messages.add_message(request, messages.INFO,
+                             f'Took {conclusion.summary()}.')
 
     def conclude_season_view(self, request, pk):
-        election_season = (
-            ElectionSeason.objects.filter(pk=pk)
-            .prefetch_related(
-                'ballot_set',
-                'ballot_set__voted_candidates',
-                'offeredposition_set',
-                'offeredposition_set__government_position',
-                'offeredposition_set__government_position__college',
-                'runningcandidate_set',
-                'runningcandidate_set__candidate',
-                'runningcandidate_set__government_position')[0])
-
-        # If status is not 'INITIATED', do nothing.
-        if election_season.status != 'INITIATED':
+        election_season = ElectionSeason.objects.get(pk=pk)
+
+        # If status is not 'INITIATED' (or 'CONCLUDING' if a previous
+        # conclusion did not finish), do nothing.
+        if election_season.status not in ('INITIATED', 'CONCLUDING'):
             messages.add_message(
                 request, messages.WARNING,
                 f'Election Season {election_season}'
@@ -357,25 +601,16 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
             return redirect(
                 reverse('admin:elections_electionseason_changelist'))
 
-        election_season.concluded_on = timezone.now()
-        election_season.status = 'CONCLUDED'
-        election_season.save()
+        if settings.ELECTIONS_BACKGROUND_JOBS:
+            enqueue_job(election_season, 'CONCLUDE')
+            messages.add_message(
+                request, messages.SUCCESS,
+                f'Election Season {election_season} is being concluded.')
+            return redirect(
+                reverse('admin:elections_electionseason_changelist'))
 
-        # Tally the results then merge it to the objects
-        tally = self.get_tally(election_season)
-        # Get the winners while resolving ties
-        winners, candidates_to_update = self.get_winners(
-            election_season, tally)
-
-        # Save the tally
-        for running_candidate in tally.values():
-            running_candidate.save()
-        # After resolving the ties, reupdate the candidate tallies
-        for running_candidate in candidates_to_update:
-            running_candidate.save()
-        # Save the winners
-        for winning_candidate in winners:
-            winning_candidate.save()
+        conclusion = conclude_election_season(election_season)
+        self.add_conclusion_messages(request, conclusion)
 
         messages.add_message(
             request, messages.SUCCESS,
@@ -383,31 +618,27 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
         return redirect(reverse('admin:elections_electionseason_changelist'))
 
     def refresh_winners_view(self, request, pk):
-        election_season = (
-            ElectionSeason.objects.filter(pk=pk)
-            .prefetch_related(
-                'offeredposition_set',
-                'offeredposition_set__government_position',
-                'offeredposition_set__government_position__college',
-                'runningcandidate_set',
-                'runningcandidate_set__candidate',
-                'runningcandidate_set__government_position',
-                'electionseasonwinningcandidate_set')[0])
-
-        # Extract tally
-        tally = {running_candidate.id: running_candidate
-                 for running_candidate
-                 in election_season.runningcandidate_set.all()}
-        # Get the winners
-        winners, candidates_to_update = self.get_winners(
-            election_season, tally)
-
-        # Refresh the winners
-        election_season.electionseasonwinningcandidate_set.all().delete()
-        for running_candidate in candidates_to_update:
-            running_candidate.save()
-        for winning_candidate in winners:
-            winning_candidate.save()
+        election_season = ElectionSeason.objects.get(pk=pk)
+
+        # Only concluded seasons have a tally to pick the winners from
+        if election_season.status != 'CONCLUDED':
+            messages.add_message(
+                request, messages.WARNING,
+                f'Election Season {election_season} is not concluded yet.')
+            return redirect(
+                reverse('admin:elections_electionseason_changelist'))
+
+        if settings.ELECTIONS_BACKGROUND_JOBS:
+            enqueue_job(election_season, 'REFRESH_WINNERS')
+            messages.add_message(
+                request, messages.SUCCESS,
+                f'Election Season {election_season} '
+                f'winners are being recalculated.')
+            return redirect(
+                reverse('admin:elections_electionseason_changelist'))
+
+        conclusion = refresh_winners(election_season)
+        self.add_conclusion_messages(request, conclusion)
 
         messages.add_message(
             request, messages.SUCCESS,
@@ -418,54 +649,52 @@ class ElectionSeasonModelAdmin(admin.ModelAdmin):
     def results_season_view(self, request, pk):
         election_season = ElectionSeason.objects.get(pk=pk)
 
-        # Construct a results list, structured like the ff:
-        # [
-        #   { position: GovernmentPosition obj,
-        #     running_candidates: [
-        #       { running_candidate: RunningCandidate,
-        #         vote_percentage: float },
-        #       { ... next candidate }
-        #     ],
-        #     winning_candidates: [ WinningCandidate obj, ... ]
-        #   },
-        #   { ... next position candidates and winners }
-        # ]
-        results = []
-
-        for offered_position in election_season.offeredposition_set.all():
-            govt_pos = offered_position.government_position
-
-            position_summary = {
-                'position': govt_pos,
-                'running_candidates': []
-            }
-
-            running_candidates_for_pos = \
-                (election_season.runningcandidate_set.filter(
-                    government_position=govt_pos))
-            # Get the total votes
-            total = 0
-            for running_candidate in running_candidates_for_pos:
-                total += running_candidate.tallied_votes
-            # Plug each candidate to the summary
-            # with the candidate's percentage of votes garnered
-            for running_candidate in running_candidates_for_pos:
-                vote_percentage = running_candidate.tallied_votes / total
-                position_summary['running_candidates'].append({
-                    'running_candidate': running_candidate,
-                    'vote_percentage': vote_percentage
-                })
-            # Plug each winning candidate to the summary
-            position_summary['winning_candidates'] = \
-                list(election_season
-                     .electionseasonwinningcandidate_set
-                     .filter(
-                         running_candidate__government_position=govt_pos))
-
-            results.append(position_summary)
+        # Results of concluded seasons are materialized upon conclusion
+        # (materialize them now for seasons concluded before that)
+        if election_season.status == 'CONCLUDED':
+            materialized = get_results_summary(election_season.id)
+            results = (materialized[0] if materialized
+                       else materialize_results(election_season).summary)
+
+        # While the season is ongoing, show the live counts instead
+        else:
+            live_votes = (count_live_votes(election_season)
+                          if election_season.status == 'INITIATED'
+                          and settings.ELECTIONS_LIVE_TALLY else None)
+            results = build_results(election_season, votes=live_votes)
 
         return render(
             request,
             'admin/elections/electionseason/statistics.html',
             {"title": f"Results of Election Season {election_season}",
-             "election_season": election_season, "results": results})
+             "election_season": election_season,
+             "results": results['positions'],
+             "turnout": get_turnout(election_season)})
+
+    def turnout_season_view(self, request, pk):
+        election_season = ElectionSeason.objects.get(pk=pk)
+
+        # The dashboard long-polls the turnout from elections:season_turnout
+        return render(
+            request,
+            'admin/elections/electionseason/turnout.html',
+            {"title": f"Turnout of Election Season {election_season}",
+             "election_season": election_season,
+             "turnout_url": reverse('elections:season_turnout',
+                                    args=[election_season.id])})
+
+    def request_metrics_view(self, request):
+        if request.GET.get('format') == 'prometheus':
+            return HttpResponse(request_metrics.export_prometheus(),
+                                content_type='text/plain; version=0.0.4')
+
+        url_names, slowest_requests = request_metrics.summary()
+        return render(
+            request,
+            'admin/elections/electionseason/request_metrics.html',
+            {"title": "Request Metrics",
+             "is_enabled": settings.ELECTIONS_REQUEST_METRICS,
+             "started_on": datetime.datetime.fromtimestamp(
+                 request_metrics.started_on, tz=datetime.timezone.utc),
+             "url_names": url_names,
+             "slowest_requests": slowest_requests})
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VotingappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'elections'
+
+    def ready(self):
+        # Connect the signal receivers
+        from . import signals  # noqa: F401
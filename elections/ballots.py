@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .lookups import invalidate_current_election_season, remember_vote
+from .metrics import QueryCounter
+from .models import Ballot, ElectionSeason
+from .receipts import store_receipt_in_background
+from .tally import record_votes
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AlreadyVotedError(Exception):
+    """
+    Raised when a voter casts a second ballot in an election season.
+    """
+
+
+class ElectionClosedError(Exception):
+    """
+    Raised when a ballot is cast in an election season that is no longer
+    ongoing (e.g. one concluded while its voters still had it cached).
+    """
+
+
+def get_election_season_status(election_season_id):
+    """
+    Reads the status of an election season, in a transaction, or None if
+    there is no such season.
+
+    On PostgreSQL, the season's row is also locked FOR SHARE until the
+    transaction ends. Concluding a season updates that row, so it waits for
+    the ballots being saved to be committed before it tallies them, while
+    the ballots themselves do not wait on each other. (On SQLite, writes
+    are serialized already.)
+    """
+    lock = ' FOR SHARE' if connection.vendor == 'postgresql' else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT status FROM {ElectionSeason._meta.db_table} '
+            f'WHERE id = %s{lock}', [election_season_id])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def check_election_season_open(election_season):
+    """
+    Raises ElectionClosedError unless an election season is still
+    INITIATED. Should be called in a transaction.
+    """
+    if get_election_season_status(election_season.pk) != 'INITIATED':
+        # Other requests of this process should not offer it either
+        invalidate_current_election_season()
+        raise ElectionClosedError(f'{election_season} is not ongoing.')
+
+
+def cast_ballot(election_season, college, voter, voted_candidate_ids,
+                signature=None, public_key=None):
+    """
+    Saves the ballot of a voter along with its voted candidates
+    (and its signature, if signed) in a single transaction, then returns it.
+
+    The season is checked to still be ongoing, then the ballot and all its
+    voted candidates are inserted, in three queries. ElectionClosedError is
+    raised if the season is no longer ongoing. A voter having voted already
+    is caught by the unique constraint of the ballot, in which case
+    AlreadyVotedError is raised.
+    """
+    Vote = Ballot.voted_candidates.through
+
+    with QueryCounter() as queries:
+        try:
+            with transaction.atomic():
+                check_election_season_open(election_season)
+                ballot = Ballot.objects.create(
+                    election_season=election_season, college=college,
+                    voter=voter, casted_on=timezone.now(),
+                    signature=signature, public_key=public_key)
+                Vote.objects.bulk_create(
+                    [Vote(ballot_id=ballot.id,
+                          runningcandidate_id=running_candidate_id)
+                     for running_candidate_id in voted_candidate_ids])
+                # Update the live counters along with the ballot
+                if settings.ELECTIONS_LIVE_TALLY:
+                    record_votes(ballot, voted_candidate_ids)
+        except IntegrityError:
+            if Ballot.objects.filter(election_season=election_season,
+                                     voter=voter).exists():
+                raise AlreadyVotedError(
+                    f'{voter} has already voted in {election_season}.')
+            raise
+
+    logger.debug('Ballot #%s casted in %s queries.', ballot.id, queries.count)
+
+    transaction.on_commit(lambda: remember_vote(election_season, voter))
+
+    # Have the receipt ready before the voter asks for it
+    if settings.ELECTIONS_PREGENERATE_RECEIPTS:
+        transaction.on_commit(
+            lambda: store_receipt_in_background(ballot.id))
+
+    return ballot
@@ -0,0 +1,263 @@
+from django.conf import settings
+from django.contrib.auth import models as auth_models
+from django.db import DatabaseError, connection, close_old_connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .intake import get_ballot_queue
+from .layout import compile_ballot_layout
+from .metrics import QueryCounter
+from .models import College, GovernmentPosition, Candidate, ElectionSeason, \
+    OfferedPosition, RunningCandidate, Ballot, \
+    ElectionSeasonWinningCandidate, ElectionSeasonResults
+
+from concurrent.futures import ThreadPoolExecutor
+import random
+import statistics
+import time
+
+# (name, seats) of the positions of each student council
+CENTRAL_POSITIONS = (('President', 1), ('Vice President', 1),
+                     ('Councilor', 8))
+COLLEGE_POSITIONS = (('President', 1), ('Vice President', 1),
+                     ('Secretary', 1), ('Treasurer', 1))
+
+
+class Timings:
+    """
+    Collected latencies (in seconds) and query counts of a kind of request.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.queries = []
+
+    def add(self, latency, queries):
+        self.latencies.append(latency)
+        self.queries.append(queries)
+
+    def percentile(self, percent):
+        latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1,
+                    round(percent / 100 * (len(latencies) - 1)))
+        return latencies[index]
+
+    def summary(self):
+        if not self.latencies:
+            return f'{self.name}: no requests'
+        return (f'{self.name}: {len(self.latencies)} requests, '
+                f'p50 {self.percentile(50) * 1000:.1f} ms, '
+                f'p99 {self.percentile(99) * 1000:.1f} ms, '
+                f'{statistics.mean(self.queries):.1f} queries/request')
+
+
+def timed(timings, request):
+    """
+    Runs a request (a callable) while recording its latency and queries.
+    """
+    with QueryCounter() as queries:
+        start = time.perf_counter()
+        response = request()
+        timings.add(time.perf_counter() - start, queries.count)
+    return response
+
+
+def seed_season(colleges=20, candidates_per_seat=2, seed=0):
+    """
+    Creates an initiated election season with its colleges, positions
+    and running candidates, then returns it.
+    """
+    rng = random.Random(seed)
+
+    college_objs = College.objects.bulk_create(
+        [College(name=f'College {number}')
+         for number in range(1, colleges + 1)])
+
+    positions = [GovernmentPosition(name=name, to_fill=seats)
+                 for name, seats in CENTRAL_POSITIONS]
+    positions += [GovernmentPosition(name=name, to_fill=seats,
+                                     college=college)
+                  for college in college_objs
+                  for name, seats in COLLEGE_POSITIONS]
+    positions = GovernmentPosition.objects.bulk_create(positions)
+
+    election_season = ElectionSeason.objects.create(
+        academic_year=f'Benchmark {timezone.now():%Y%m%d%H%M%S}',
+        status='INITIATED', initiated_on=timezone.now())
+    OfferedPosition.objects.bulk_create(
+        [OfferedPosition(election_season=election_season,
+                         government_position=position,
+                         max_positions_to_fill=position.to_fill)
+         for position in positions])
+
+    candidates = []
+    for position in positions:
+        for number in range(position.to_fill * candidates_per_seat):
+            candidates.append((position, number + 1, Candidate(
+                student_number=f'{len(candidates):05d}-BM-0',
+                college=position.college or rng.choice(college_objs),
+                first_name=f'Candidate{len(candidates)}',
+                last_name=position.name, contact='-')))
+    Candidate.objects.bulk_create(
+        [candidate for _, _, candidate in candidates])
+    RunningCandidate.objects.bulk_create(
+        [RunningCandidate(election_season=election_season,
+                          candidate=candidate,
+                          government_position=position,
+                          ballot_number=ballot_number,
+                          is_disqualified=False)
+         for position, ballot_number, candidate in candidates])
+
+    return election_season
+
+
+def create_voters(count, prefix='voter'):
+    """
+    Creates voters (users) in bulk, then returns them.
+    """
+    start = auth_models.User.objects.count()
+    return auth_models.User.objects.bulk_create(
+        [auth_models.User(username=f'{prefix}{start + number}',
+                          first_name='Voter', last_name=str(start + number))
+         for number in range(count)], batch_size=1000)
+
+
+def pick_candidates(layout, rng):
+    """
+    Picks random candidates of each position of a ballot layout, like a
+    voter would. Returns a dict of { field_name: [running_candidate_id] }.
+    """
+    return {position['field_name']: rng.sample(
+                [candidate['id'] for candidate in position['candidates']],
+                rng.randint(1, min(position['max_positions_to_fill'],
+                                   len(position['candidates']))))
+            for position in layout}
+
+
+def get_ballot_layouts(election_season):
+    """
+    Returns the ballot layout of each college, keyed by college id.
+    """
+    return {college_id: compile_ballot_layout(election_season.id, college_id)
+            for college_id in College.objects.values_list('id', flat=True)}
+
+
+def benchmark_casting(election_season, voters, concurrency=1, seed=0):
+    """
+    Casts a ballot for each voter through the voting pages with the test
+    client. Returns the timings of each step, the ballots casted per second
+    and the number of voters that failed to cast.
+
+    A voter only counts as having casted if its ballot was saved (or
+    queued), as the voting page is also shown again, with a 200, when the
+    ballot is not accepted.
+    """
+    layouts = get_ballot_layouts(election_season)
+
+    first_step = Timings('POST vote_step_first')
+    ballot_page = Timings('GET vote_step_second')
+    cast = Timings('POST vote_step_second')
+
+    def vote(number_and_voter):
+        number, voter = number_and_voter
+        rng = random.Random(seed + number)
+        client = Client()
+        client.force_login(voter)
+
+        college_id = rng.choice(list(layouts))
+        timed(first_step, lambda: client.post(
+            reverse('elections:vote_step_first'),
+            {'college_of_voter': college_id}))
+        timed(ballot_page, lambda: client.get(
+            reverse('elections:vote_step_second')))
+        timed(cast, lambda: client.post(
+            reverse('elections:vote_step_second'),
+            pick_candidates(layouts[college_id], rng)))
+
+        casted = (Ballot.objects.filter(election_season=election_season,
+                                        voter=voter).exists()
+                  or bool(settings.ELECTIONS_BALLOT_QUEUE)
+                  and get_ballot_queue().has_ballot(election_season, voter))
+        close_old_connections()
+        return casted
+
+    def try_vote(number_and_voter):
+        # Failures (e.g. database locked) are counted, not raised
+        try:
+            return vote(number_and_voter)
+        except DatabaseError:
+            close_old_connections()
+            return False
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            casted = sum(executor.map(try_vote, enumerate(voters)))
+    else:
+        casted = sum(map(try_vote, enumerate(voters)))
+    elapsed = time.perf_counter() - start
+
+    return ([first_step, ballot_page, cast], casted / elapsed,
+            len(voters) - casted)
+
+
+def fill_ballots(election_season, count, seed=0):
+    """
+    Inserts synthetic ballots directly, until the election season has
+    count ballots.
+    """
+    rng = random.Random(seed)
+    existing = Ballot.objects.filter(election_season=election_season).count()
+    layouts = get_ballot_layouts(election_season)
+    Vote = Ballot.voted_candidates.through
+
+    for batch_start in range(existing, count, 1000):
+        voters = create_voters(min(1000, count - batch_start),
+                               prefix='filler')
+        now = timezone.now()
+        ballots = []
+        votes = []
+        for voter in voters:
+            college_id = rng.choice(list(layouts))
+            ballots.append(Ballot(election_season=election_season,
+                                  college_id=college_id, voter=voter,
+                                  casted_on=now))
+            votes.append([candidate_id for candidate_ids
+                          in pick_candidates(layouts[college_id],
+                                             rng).values()
+                          for candidate_id in candidate_ids])
+        if connection.features.can_return_rows_from_bulk_insert:
+            Ballot.objects.bulk_create(ballots)
+        else:
+            for ballot in ballots:
+                ballot.save()
+        Vote.objects.bulk_create(
+            [Vote(ballot_id=ballot.id, runningcandidate_id=candidate_id)
+             for ballot, candidate_ids in zip(ballots, votes)
+             for candidate_id in candidate_ids], batch_size=5000)
+
+
+def benchmark_conclusion(election_season, admin_client):
+    """
+    Concludes the election season then views its results through the
+    admin, returning the timings of both.
+    """
+    # Start over from an initiated season
+    ElectionSeasonWinningCandidate.objects.filter(
+        election_season=election_season).delete()
+    ElectionSeasonResults.objects.filter(
+        election_season=election_season).delete()
+    ElectionSeason.objects.filter(pk=election_season.pk).update(
+        status='INITIATED', concluded_on=None)
+
+    conclude = Timings('conclude_season_view')
+    results = Timings('results_season_view')
+    timed(conclude, lambda: admin_client.get(reverse(
+        'admin:elections_electionseason_changelist')
+        + f'{election_season.pk}/conclude/'))
+    timed(results, lambda: admin_client.get(reverse(
+        'admin:elections_electionseason_changelist')
+        + f'{election_season.pk}/results/'))
+    return [conclude, results]
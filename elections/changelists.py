@@ -0,0 +1,71 @@
+from django.contrib.admin.views.main import ChangeList
+
+# Query string keys of the id the page is before (older) or after (newer)
+OLDER_VAR = 'older_than'
+NEWER_VAR = 'newer_than'
+KEYSET_VARS = (OLDER_VAR, NEWER_VAR)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    A changelist paged by id (newest first) instead of by page number, for
+    big tables. A page is read as the rows older, or newer, than an id, so
+    the last page is as fast as the first, and the rows are never counted.
+    Only "Newer" and "Older" links are shown in place of page numbers.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for keyset_var in KEYSET_VARS:
+            lookup_params.pop(keyset_var, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing the filters, the search or the ordering starts over
+        return super().get_query_string(new_params,
+                                        [*(remove or []), *KEYSET_VARS])
+
+    def get_keyset_param(self, request, keyset_var):
+        try:
+            return int(request.GET[keyset_var])
+        except (KeyError, ValueError):
+            return None
+
+    def get_results(self, request):
+        queryset = self.queryset.order_by('-pk')
+        older_than = self.get_keyset_param(request, OLDER_VAR)
+        newer_than = self.get_keyset_param(request, NEWER_VAR)
+
+        # One more row than shown tells if there is a page past this one
+        if newer_than is not None:
+            result_list = list(queryset.filter(pk__gt=newer_than)
+                               .order_by('pk')[:self.list_per_page + 1])
+            has_newer = len(result_list) > self.list_per_page
+            result_list = result_list[:self.list_per_page][::-1]
+            has_older = True
+        else:
+            if older_than is not None:
+                queryset = queryset.filter(pk__lt=older_than)
+            result_list = list(queryset[:self.list_per_page + 1])
+            has_older = len(result_list) > self.list_per_page
+            result_list = result_list[:self.list_per_page]
+            has_newer = older_than is not None
+
+        self.newer_url = (self.get_query_string(
+            {NEWER_VAR: result_list[0].pk}) if has_newer and result_list
+            else None)
+        self.older_url = (self.get_query_string(
+            {OLDER_VAR: result_list[-1].pk}) if has_older and result_list
+            else None)
+        self.newest_url = (self.get_query_string()
+                           if newer_than is not None or older_than is not None
+                           else None)
+
+        self.result_list = result_list
+        self.result_count = len(result_list)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = has_newer or has_older
+        self.paginator = None
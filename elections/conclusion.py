@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .intake import drain_ballot_queue
+from .models import ElectionSeasonWinningCandidate, RunningCandidate
+from .results import materialize_results
+from .signatures import flag_tampered_ballots
+from .tally import count_votes, count_live_votes, find_tally_mismatches
+from .winners import get_season_winners
+
+from contextlib import contextmanager
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ConclusionError(Exception):
+    """
+    Raised when an election season is not in a status it can be concluded
+    from, or its winners refreshed in.
+    """
+
+
+class Conclusion:
+    """
+    Outcome of concluding an election season, or of refreshing its winners:
+    how long each phase took, and what the admin should be told about.
+    progress, if given, is called with the number of phases done so far
+    each time one is done.
+    """
+
+    def __init__(self, election_season, progress=None):
+        self.election_season = election_season
+        self.progress = progress
+        # Seconds taken by each phase, in the order they were run
+        self.phase_durations = {}
+        self.tampered_ballots = []
+        # Ballots of the ballot queue that could not be saved
+        self.rejected_queued_ballots = 0
+        self.live_tally_mismatches = []
+        # (position name, tied candidate ids) of the ties broken
+        self.ties = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_durations[name] = time.perf_counter() - start
+        if self.progress:
+            self.progress(len(self.phase_durations))
+
+    def summary(self):
+        return ', '.join(f'{name} {seconds * 1000:.0f} ms'
+                         for name, seconds in self.phase_durations.items())
+
+
+def save_winners(election_season, winners):
+    """
+    Replaces the winners of an election season, then rebuilds its stored
+    results. Should be called in a transaction.
+    """
+    ElectionSeasonWinningCandidate.objects.filter(
+        election_season=election_season).delete()
+    ElectionSeasonWinningCandidate.objects.bulk_create(winners)
+    materialize_results(election_season)
+
+
+def conclude_election_season(election_season, progress=None):
+    """
+    Concludes an initiated election season, then returns its Conclusion.
+
+    The season is first marked CONCLUDING, which stops the voting, and
+    its ballots left in the ballot queue are saved. Its tampered ballots
+    are then flagged, the rest are tallied and the winners
+    picked. Lastly, the tally, the winners, the results and the CONCLUDED
+    status are saved in one transaction, so a season is never CONCLUDED
+    without its winners. A season left CONCLUDING (e.g. by a crash) can
+    be concluded again. Raises ConclusionError if the season is neither.
+    """
+    if election_season.status not in ('INITIATED', 'CONCLUDING'):
+        raise ConclusionError(f'{election_season} cannot be concluded.')
+
+    conclusion = Conclusion(election_season, progress)
+
+    election_season.status = 'CONCLUDING'
+    election_season.save(update_fields=['status'])
+
+    # The ballots acknowledged while it was ongoing are tallied too
+    if settings.ELECTIONS_BALLOT_QUEUE:
+        with conclusion.phase('ballot queue'):
+            _, conclusion.rejected_queued_ballots \
+                = drain_ballot_queue(election_season)
+
+    with conclusion.phase('signatures'):
+        _, conclusion.tampered_ballots \
+            = flag_tampered_ballots(election_season)
+
+    with conclusion.phase('tally'):
+        votes = count_votes(election_season)
+
+    # Check the live counters against the recount
+    if settings.ELECTIONS_LIVE_TALLY:
+        with conclusion.phase('live tally check'):
+            conclusion.live_tally_mismatches = find_tally_mismatches(
+                votes, count_live_votes(election_season))
+
+    # Ties are broken with a seed that includes the conclusion time
+    election_season.concluded_on = timezone.now()
+    election_season.status = 'CONCLUDED'
+    with conclusion.phase('winners'):
+        winners, conclusion.ties = get_season_winners(election_season,
+                                                      votes)
+
+    with conclusion.phase('save'), transaction.atomic():
+        running_candidates = list(
+            RunningCandidate.objects
+            .filter(election_season=election_season)
+            .only('id', 'tallied_votes'))
+        for running_candidate in running_candidates:
+            running_candidate.tallied_votes = votes.get(running_candidate.id,
+                                                        0)
+        RunningCandidate.objects.bulk_update(
+            running_candidates, ['tallied_votes'], batch_size=500)
+        save_winners(election_season, winners)
+        election_season.save(update_fields=['status', 'concluded_on'])
+
+    logger.info('Concluded %s: %s.', election_season, conclusion.summary())
+    return conclusion
+
+
+def refresh_winners(election_season, progress=None):
+    """
+    Picks the winners of a concluded election season again from its
+    stored tally, replacing the previous ones, then returns its Conclusion.
+    Raises ConclusionError if the season is not concluded, as it has no
+    tally yet.
+    """
+    if election_season.status != 'CONCLUDED':
+        raise ConclusionError(f'{election_season} is not concluded yet.')
+
+    conclusion = Conclusion(election_season, progress)
+
+    with conclusion.phase('winners'):
+        winners, conclusion.ties = get_season_winners(
+            election_season,
+            dict(RunningCandidate.objects
+                 .filter(election_season=election_season)
+                 .values_list('id', 'tallied_votes')))
+
+    with conclusion.phase('save'), transaction.atomic():
+        save_winners(election_season, winners)
+
+    logger.info('Refreshed winners of %s: %s.', election_season,
+                conclusion.summary())
+    return conclusion
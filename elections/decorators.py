@@ -0,0 +1,90 @@
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.urls import reverse
+
+from asgiref.sync import sync_to_async
+
+from .lookups import get_current_election_season, has_voted
+
+from functools import wraps
+import asyncio
+
+
+def check_before(check):
+    """
+    Makes a view decorator out of a check of the request, which returns
+    a response to reply with instead of the view, or None to proceed.
+
+    Asynchronous views are wrapped asynchronously, with the check run in a
+    thread, as checks may load the session and the user, and query the
+    database.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                response = await sync_to_async(check)(request)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = check(request)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return response
+        return wrapper
+    # The decorator is named and documented after the check
+    return wraps(check)(decorator)
+
+
+def redirect_to_index(request, message):
+    messages.add_message(request, messages.WARNING, message)
+    return redirect(reverse('elections:index'))
+
+
+@check_before
+def voter_login_required(request):
+    """
+    Redirects to the homepage if the voter is not logged in.
+    """
+    if not request.user.is_authenticated:
+        return redirect_to_index(request,
+            'Login first to your Microsoft Webmail account prior to voting.')
+
+
+@check_before
+def ongoing_election_required(request):
+    """
+    Redirects to the homepage if there is no ongoing election, otherwise
+    sets the current election season to request.current_election_season.
+    """
+    current_election_season = get_current_election_season()
+    if not current_election_season:
+        return redirect_to_index(request,
+            'You are trying to vote when there is no ongoing election.')
+    request.current_election_season = current_election_season
+
+
+@check_before
+def not_yet_voted_required(request):
+    """
+    Redirects to the homepage if the voter has already voted for the
+    current election season. Use after ongoing_election_required.
+    """
+    if has_voted(request, request.current_election_season):
+        return redirect_to_index(request,
+            'You have already voted for this election.')
+
+
+@check_before
+def staff_required(request):
+    """
+    Forbids users that are not staff, e.g. from the election committee's
+    pages outside of the admin.
+    """
+    if not (request.user.is_active and request.user.is_staff):
+        raise PermissionDenied
@@ -0,0 +1,123 @@
+from .models import Ballot, College, ElectionSeasonWinningCandidate, \
+    RunningCandidate
+
+import csv
+import zlib
+
+BALLOT_COLUMNS = ('ballot_id', 'casted_on', 'college', 'is_tampered',
+                  'voted_candidate_ids', 'signature', 'public_key')
+# Ballots of audit exports also have their voter, which their signature is
+# verified with, but which tells who voted for whom
+AUDIT_BALLOT_COLUMNS = BALLOT_COLUMNS + ('voter_id',)
+TOTAL_COLUMNS = ('running_candidate_id', 'position', 'ballot_number',
+                 'student_number', 'candidate_name', 'party',
+                 'is_disqualified', 'votes', 'is_winner')
+
+
+class Echo:
+    """
+    A file-like object that returns what is written to it, so that csv
+    rows can be yielded one at a time instead of held in a buffer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_ballot_rows(election_season, chunk_size=2000, audit=False):
+    """
+    Yields every ballot of an election season as a row of BALLOT_COLUMNS
+    (AUDIT_BALLOT_COLUMNS if audit), by ascending id. Ballots are loaded
+    chunk_size at a time, each chunk after the last id of the previous one,
+    along with their voted candidates, so that only a chunk is ever held in
+    memory.
+    """
+    colleges = dict(College.objects.values_list('id', 'name'))
+    last_ballot_id = 0
+    while True:
+        ballots = list(Ballot.objects
+                       .filter(election_season=election_season,
+                               id__gt=last_ballot_id)
+                       .order_by('id')
+                       .values_list('id', 'casted_on', 'college_id',
+                                    'voter_id', 'is_tampered', 'signature',
+                                    'public_key')[:chunk_size])
+        if not ballots:
+            return
+
+        voted_candidates = {}
+        for ballot_id, running_candidate_id in (
+                Ballot.voted_candidates.through.objects
+                .filter(ballot__election_season=election_season,
+                        ballot__gte=ballots[0][0],
+                        ballot__lte=ballots[-1][0])
+                .order_by('ballot_id', 'runningcandidate_id')
+                .values_list('ballot_id', 'runningcandidate_id')):
+            voted_candidates.setdefault(ballot_id, []).append(
+                running_candidate_id)
+
+        for (ballot_id, casted_on, college_id, voter_id, is_tampered,
+             signature, public_key) in ballots:
+            row = (ballot_id, casted_on.isoformat(), colleges[college_id],
+                   is_tampered,
+                   ' '.join(str(running_candidate_id) for running_candidate_id
+                            in voted_candidates.get(ballot_id, [])),
+                   signature or '', public_key or '')
+            yield row + (voter_id,) if audit else row
+
+        last_ballot_id = ballots[-1][0]
+
+
+def iter_total_rows(election_season):
+    """
+    Yields the stored tally of every running candidate of a concluded
+    election season as a row of TOTAL_COLUMNS, by position.
+    """
+    winner_ids = set(ElectionSeasonWinningCandidate.objects
+                     .filter(election_season=election_season)
+                     .values_list('running_candidate_id', flat=True))
+
+    for running_candidate in (RunningCandidate.objects
+                              .filter(election_season=election_season)
+                              .select_related('candidate',
+                                              'government_position',
+                                              'government_position__college')
+                              .order_by('government_position_id',
+                                        'ballot_number')):
+        candidate = running_candidate.candidate
+        yield (running_candidate.id,
+               str(running_candidate.government_position),
+               running_candidate.ballot_number, candidate.student_number,
+               f'{candidate.first_name} {candidate.last_name}',
+               candidate.party or '', running_candidate.is_disqualified,
+               running_candidate.tallied_votes,
+               running_candidate.id in winner_ids)
+
+
+def iter_csv(columns, rows):
+    """
+    Yields a header line, then each row, as CSV text lines.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_gzip(lines, flush_every=64 * 1024):
+    """
+    Yields the gzip compression of text lines, as bytes, in pieces of
+    about flush_every bytes of input.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    pending = 0
+    for line in lines:
+        data = line.encode()
+        pending += len(data)
+        compressed = compressor.compress(data)
+        if pending >= flush_every:
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,8 +1,12 @@
 from django import forms
-from django.utils.html import mark_safe
+from django.conf import settings
+from django.utils.html import escape, mark_safe
 from django.contrib.auth import models as auth_models
 
+from .imports import IMPORT_SECTIONS
+from .layout import get_ballot_layout
 from .models import College
+from .signatures import verify_ballot_signature
 
 
 class VoteCollegeChoiceForm(forms.Form):
@@ -20,25 +24,65 @@ class ManualEntryPreliminaryForm(forms.Form):
     college_of_voter = forms.ModelChoiceField(queryset=College.objects.all())
 
 
-class CandidateMultipleChoiceField(forms.ModelMultipleChoiceField):
-    def label_from_instance(self, obj):
+class SeasonImportForm(forms.Form):
+    """
+    Form for uploading the setup of an election season, either a JSON file
+    of sections or a CSV file of a single section.
+    """
+    file = forms.FileField()
+    section = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All (JSON file)')]
+        + [(section, f'{section.replace("_", " ").capitalize()} (CSV file)')
+           for section in IMPORT_SECTIONS])
+    dry_run = forms.BooleanField(required=False,
+                                 label='Only check the rows')
+
+
+class CandidateMultipleChoiceField(forms.TypedMultipleChoiceField):
+    """
+    Multiple choice field of the running candidates of a position,
+    built from its compiled ballot layout. Cleans to a list of
+    RunningCandidate ids.
+    """
+
+    def __init__(self, position, use_custom_label=False, **kwargs):
+        self.max_positions_to_fill = position['max_positions_to_fill']
+
+        super().__init__(
+            coerce=int, label=position['label'],
+            choices=[(candidate['id'],
+                      self.label_from_candidate(candidate)
+                      if use_custom_label else candidate['label'])
+                     for candidate in position['candidates']],
+            **kwargs)
+
+    def label_from_candidate(self, candidate):
         return mark_safe(
             "<img src='"
-            + (obj.candidate.image.url if obj.candidate.image
-                else 'https://via.placeholder.com/150')
+            + (candidate['image_url'] or 'https://via.placeholder.com/150')
             + "' class='img-fluid' />"
             + "<p class='text-center'>"
-            + f"#{obj.ballot_number} - "
-            + f"{obj.candidate.first_name} "
-            + obj.candidate.last_name
+            + escape(candidate['label'])
             + "</p>")
 
+    def validate(self, value):
+        super().validate(value)
+        if len(value) > self.max_positions_to_fill:
+            raise forms.ValidationError(
+                f'Select at most {self.max_positions_to_fill} '
+                f'candidate(s) for this position.')
+
 
 class VotingForm(forms.Form):
     """
     Form used by a voter to pick candidates.
     Has dynamic multiple choice fields (checkbox)
     for each of an election season's offered positions.
+
+    If given the voter, the signature of the voter's browser over the
+    votes (see signatures.py) is checked too, then kept in
+    self.signature and self.public_key.
     """
 
     def __init__(self, *args, **kwargs):
@@ -46,42 +90,37 @@ class VotingForm(forms.Form):
         voter_college = kwargs.pop('college')
         use_custom_candidate_field = kwargs.pop('use_custom_candidate_field',
                                                 False)
+        self.voter = kwargs.pop('voter', None)
+        self.election_season = election_season
 
         super().__init__(*args, **kwargs)
 
-        # For each position offered in this election season,
-        # create a multiple choice field  with the candidates as the choices.
-        for offered_position in election_season.offeredposition_set.all():
-
-            position_college = offered_position.government_position.college
-
-            # Only create a field for positions that belong
-            # either in CENTRAL SC or in the same college SC as the voter,
-            # and if there are actual running candidates in that position.
-            if position_college == None or position_college == voter_college:
-                candidates_queryset \
-                    = (election_season.runningcandidate_set
-                       .filter(government_position=offered_position
-                               .government_position,
-                               is_disqualified=False))
-
-                if candidates_queryset.count() > 0:
-                    field_name \
-                        = ((position_college.name.replace(' ', '').lower()
-                            if position_college else 'central')) \
-                        + "_" + (offered_position.government_position.name
-                                 .replace(' ', '').lower())
-
-                    field_label \
-                        = ((position_college.name
-                            if position_college else 'Central')) \
-                        + " - " + offered_position.government_position.name
-
-                    self.fields[field_name] \
-                        = (CandidateMultipleChoiceField(
-                            queryset=candidates_queryset)
-                           if use_custom_candidate_field else
-                           forms.ModelMultipleChoiceField(
-                            queryset=candidates_queryset))
-
-                    self.fields[field_name].label = field_label
+        # For each position in the voter's ballot,
+        # create a multiple choice field with the candidates as the choices.
+        # The ballot layout is cached, so no query is needed in here.
+        for position in get_ballot_layout(election_season.pk,
+                                          voter_college.pk):
+            self.fields[position['field_name']] \
+                = CandidateMultipleChoiceField(
+                    position, use_custom_label=use_custom_candidate_field)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        self.signature = self.data.get('signature') or None
+        self.public_key = self.data.get('public_key') or None
+
+        # Check if the voter's browser signed these very votes
+        if self.voter is not None and not self.errors \
+                and (self.signature
+                     or settings.ELECTIONS_REQUIRE_BALLOT_SIGNATURES):
+            voted_candidates = [voted_candidate for position_candidates
+                                in cleaned_data.values()
+                                for voted_candidate in position_candidates]
+            if not verify_ballot_signature(
+                    self.election_season.pk, self.voter.pk,
+                    voted_candidates, self.signature, self.public_key):
+                raise forms.ValidationError(
+                    'Your ballot could not be verified. '
+                    'Please try voting again.')
+
+        return cleaned_data
@@ -0,0 +1,307 @@
+from django.db import transaction
+
+from .models import Candidate, College, EligibleVoter, GovernmentPosition, \
+    OfferedPosition, RunningCandidate
+
+import csv
+import io
+import json
+
+# Sections of a season setup, in the order they are checked and saved.
+# Each is checked against the sections before it.
+IMPORT_SECTIONS = ('positions', 'candidates', 'offered_positions',
+                   'running_candidates', 'voters')
+
+
+class ImportRowError(Exception):
+    """
+    Raised when a row of an import cannot be loaded.
+    """
+
+
+def read_import_file(file, section=None):
+    """
+    Reads the rows of an import file into a { section: [row dict] } dict.
+
+    A JSON file holds an object of sections, each a list of row objects.
+    A CSV file holds the rows of a single section, given as section, with
+    a header line of column names.
+    """
+    data = file.read()
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+
+    if section is None:
+        sections = json.loads(data)
+        if not isinstance(sections, dict) or any(
+                name not in IMPORT_SECTIONS
+                or not isinstance(rows, list)
+                or not all(isinstance(row, dict) for row in rows)
+                for name, rows in sections.items()):
+            raise ValueError(f'Expected an object of sections (any of '
+                             f'{", ".join(IMPORT_SECTIONS)}), each a list '
+                             f'of row objects.')
+        return sections
+
+    if section not in IMPORT_SECTIONS:
+        raise ValueError(f'Unknown section {section}.')
+    return {section: list(csv.DictReader(io.StringIO(data)))}
+
+
+def get_text(row, column, required=True):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ImportRowError(f'{column} is required.')
+    return value
+
+
+def get_number(row, column, default=None):
+    value = get_text(row, column, required=default is None)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ImportRowError(f'{column} must be a whole number.')
+    if number < 0:
+        raise ImportRowError(f'{column} cannot be negative.')
+    return number
+
+
+def get_flag(row, column):
+    value = get_text(row, column, required=False).lower()
+    if value in ('', '0', 'false', 'no', 'n'):
+        return False
+    if value in ('1', 'true', 'yes', 'y'):
+        return True
+    raise ImportRowError(f'{column} must be true or false.')
+
+
+def check_max_lengths(obj):
+    """
+    Raises ImportRowError if a text of an object to create is longer than
+    its model field allows.
+    """
+    for field in obj._meta.concrete_fields:
+        value = field.value_from_object(obj)
+        if field.max_length and value is not None \
+                and len(str(value)) > field.max_length:
+            raise ImportRowError(f'{field.name} is too long (at most '
+                                 f'{field.max_length} characters).')
+
+
+def get_position_key(position):
+    return (position.college_id, position.name.lower())
+
+
+class SeasonImport:
+    """
+    Bulk import of an election season's setup: its government positions,
+    candidates, offered positions, running candidates and voter roll.
+
+    Every row is checked in one pass against in-memory indexes of the
+    existing colleges, positions and candidates (and of the rows checked
+    before it), then everything is saved with bulk_create in a single
+    transaction, only if no row has an error. Positions and candidates
+    that already exist are reused, not updated.
+    """
+
+    def __init__(self, election_season):
+        self.election_season = election_season
+        # (section, row number, message) of each row that cannot be loaded
+        self.errors = []
+        self.created = {section: 0 for section in IMPORT_SECTIONS}
+
+        self.colleges = {college.name.lower(): college
+                         for college in College.objects.all()}
+        self.positions = {get_position_key(position): position
+                          for position in GovernmentPosition.objects.all()}
+        self.candidates = {candidate.student_number: candidate
+                           for candidate in Candidate.objects.all()}
+        # Positions are told apart by (college id, lowercase name), as the
+        # new ones have no id until saved
+        self.offered_positions = {
+            get_position_key(offered_position.government_position)
+            for offered_position in (OfferedPosition.objects
+                                     .filter(election_season=election_season)
+                                     .select_related('government_position'))}
+        running_candidates = list(RunningCandidate.objects
+                                  .filter(election_season=election_season)
+                                  .select_related('candidate',
+                                                  'government_position'))
+        self.running_student_numbers = {
+            running_candidate.candidate.student_number
+            for running_candidate in running_candidates}
+        self.ballot_numbers = {
+            (get_position_key(running_candidate.government_position),
+             running_candidate.ballot_number)
+            for running_candidate in running_candidates}
+
+        voter_roll = list(EligibleVoter.objects
+                          .filter(election_season=election_season)
+                          .values_list('email', 'student_number'))
+        self.voter_emails = {email for email, _ in voter_roll}
+        self.voter_student_numbers = {student_number
+                                      for _, student_number in voter_roll
+                                      if student_number}
+
+        # Objects to create, per section
+        self.new_objects = {section: [] for section in IMPORT_SECTIONS}
+
+    def get_college(self, row, required=True):
+        name = get_text(row, 'college', required=required)
+        # Central positions have no college
+        if not required and name.upper() in ('', 'CENTRAL'):
+            return None
+        college = self.colleges.get(name.lower())
+        if college is None:
+            raise ImportRowError(f'College {name} does not exist.')
+        return college
+
+    def get_row_position_key(self, row, column='position'):
+        college = self.get_college(row, required=False)
+        return (college.id if college else None,
+                get_text(row, column).lower())
+
+    def get_position(self, row):
+        position = self.positions.get(self.get_row_position_key(row))
+        if position is None:
+            raise ImportRowError(
+                f'Position {get_text(row, "position")} of '
+                f'{get_text(row, "college", required=False) or "CENTRAL"} '
+                f'does not exist.')
+        return position
+
+    def check_positions(self, row):
+        key = self.get_row_position_key(row, 'name')
+        if key in self.positions:
+            return
+        position = GovernmentPosition(
+            name=get_text(row, 'name'),
+            description=get_text(row, 'description', required=False),
+            college=self.get_college(row, required=False),
+            to_fill=get_number(row, 'to_fill'))
+        check_max_lengths(position)
+        self.positions[key] = position
+        return position
+
+    def check_candidates(self, row):
+        student_number = get_text(row, 'student_number')
+        if student_number in self.candidates:
+            return
+        candidate = Candidate(
+            student_number=student_number,
+            college=self.get_college(row),
+            party=get_text(row, 'party', required=False) or None,
+            first_name=get_text(row, 'first_name'),
+            last_name=get_text(row, 'last_name'),
+            contact=get_text(row, 'contact', required=False),
+            image=get_text(row, 'image', required=False))
+        check_max_lengths(candidate)
+        self.candidates[student_number] = candidate
+        return candidate
+
+    def check_offered_positions(self, row):
+        position = self.get_position(row)
+        position_key = get_position_key(position)
+        if position_key in self.offered_positions:
+            raise ImportRowError(f'{position} is already offered.')
+        self.offered_positions.add(position_key)
+        return OfferedPosition(
+            election_season=self.election_season,
+            government_position=position,
+            max_positions_to_fill=get_number(row, 'max_positions_to_fill',
+                                             default=position.to_fill))
+
+    def check_running_candidates(self, row):
+        student_number = get_text(row, 'student_number')
+        candidate = self.candidates.get(student_number)
+        if candidate is None:
+            raise ImportRowError(
+                f'Candidate {student_number} does not exist.')
+        position = self.get_position(row)
+        position_key = get_position_key(position)
+        if position_key not in self.offered_positions:
+            raise ImportRowError(f'{position} is not offered.')
+        if student_number in self.running_student_numbers:
+            raise ImportRowError(
+                f'Candidate {student_number} is already running.')
+        ballot_number = get_number(row, 'ballot_number')
+        if (position_key, ballot_number) in self.ballot_numbers:
+            raise ImportRowError(
+                f'Ballot number {ballot_number} of {position} is taken.')
+
+        self.running_student_numbers.add(student_number)
+        self.ballot_numbers.add((position_key, ballot_number))
+        return RunningCandidate(
+            election_season=self.election_season, candidate=candidate,
+            government_position=position, ballot_number=ballot_number,
+            is_disqualified=get_flag(row, 'is_disqualified'))
+
+    def check_voters(self, row):
+        email = get_text(row, 'email').lower()
+        if '@' not in email:
+            raise ImportRowError(f'{email} is not an email.')
+        if email in self.voter_emails:
+            raise ImportRowError(f'{email} is already on the roll.')
+        student_number = get_text(row, 'student_number', required=False)
+        # Voters are also looked up by student number, so it must be unique
+        if student_number in self.voter_student_numbers:
+            raise ImportRowError(
+                f'Student number {student_number} is already on the roll.')
+        voter = EligibleVoter(election_season=self.election_season,
+                              email=email,
+                              student_number=student_number or None,
+                              college=self.get_college(row))
+        check_max_lengths(voter)
+
+        self.voter_emails.add(email)
+        if student_number:
+            self.voter_student_numbers.add(student_number)
+        return voter
+
+    def check(self, sections):
+        """
+        Checks the rows of each section, collecting the objects to create
+        and the errors of the rows that cannot be loaded.
+        """
+        for section in IMPORT_SECTIONS:
+            check_row = getattr(self, f'check_{section}')
+            # Row numbers start at 2, after the header line of a CSV file
+            for number, row in enumerate(sections.get(section, []), 2):
+                try:
+                    obj = check_row(row)
+                except ImportRowError as error:
+                    self.errors.append((section, number, str(error)))
+                else:
+                    if obj is not None:
+                        self.new_objects[section].append(obj)
+        return not self.errors
+
+    def save(self):
+        """
+        Creates the checked objects in a single transaction. Objects are
+        created section by section, so that each gets the ids of the
+        objects it refers to (bulk_create sets them).
+        """
+        with transaction.atomic():
+            for section in IMPORT_SECTIONS:
+                objects = self.new_objects[section]
+                if objects:
+                    type(objects[0]).objects.bulk_create(objects,
+                                                         batch_size=500)
+                self.created[section] = len(objects)
+        return self.created
+
+
+def import_season_setup(election_season, sections, dry_run=False):
+    """
+    Checks, then saves unless dry_run, the rows of a season setup given as
+    a { section: [row dict] } dict. Returns the SeasonImport, whose errors
+    are empty if it was saved.
+    """
+    season_import = SeasonImport(election_season)
+    if season_import.check(sections) and not dry_run:
+        season_import.save()
+    return season_import
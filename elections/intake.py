@@ -0,0 +1,343 @@
+from django.conf import settings
+from django.contrib.auth import models as auth_models
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .ballots import AlreadyVotedError, check_election_season_open, \
+    get_election_season_status
+from .lookups import remember_vote
+from .models import Ballot, College, RunningCandidate
+from .tally import record_votes
+
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# What the voter is told of a rejected queued ballot, by its reason
+REJECTION_REASONS = {
+    'ALREADY_VOTED': 'Your ballot was rejected since you have already '
+                     'voted for this election.',
+    'ELECTION_CLOSED': 'Your ballot was rejected since this election was '
+                       'concluded before it could be recorded.',
+    'BALLOT_CHANGED': 'Your ballot was rejected since this election was '
+                      'changed (e.g. a candidate was removed) before it '
+                      'could be recorded.',
+    'NOT_SAVED': 'Your ballot was rejected since it could not be recorded.',
+}
+
+
+class BallotQueue:
+    """
+    A durable write-ahead queue of submitted ballots, kept in its own
+    SQLite journal file apart from the main database.
+
+    Ballots are acknowledged as soon as they are appended in here, then
+    saved as Ballot objects in batches by the commit_ballots command.
+    A voter can only have one queued ballot per election season.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS queued_ballot (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            receipt_id TEXT NOT NULL UNIQUE,
+            election_season_id INTEGER NOT NULL,
+            college_id INTEGER NOT NULL,
+            voter_id INTEGER NOT NULL,
+            voted_candidate_ids TEXT NOT NULL,
+            casted_on TEXT NOT NULL,
+            signature TEXT,
+            public_key TEXT,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            ballot_id INTEGER,
+            reason TEXT,
+            UNIQUE (election_season_id, voter_id)
+        );
+        CREATE INDEX IF NOT EXISTS queued_ballot_status
+            ON queued_ballot (status, seq);
+    '''
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # SQLite connections cannot be shared between threads
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # A ballot is only acknowledged once it is on disk
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.executescript(self.SCHEMA)
+            # Queues made before rejections had a reason
+            if 'reason' not in {column['name'] for column in conn.execute(
+                    'PRAGMA table_info(queued_ballot)')}:
+                conn.execute(
+                    'ALTER TABLE queued_ballot ADD COLUMN reason TEXT')
+            self._local.connection = conn
+        return conn
+
+    def enqueue(self, election_season, college, voter, voted_candidate_ids,
+                signature=None, public_key=None):
+        """
+        Appends a ballot to the queue then returns its receipt id.
+        Raises ElectionClosedError if the season is no longer ongoing, and
+        AlreadyVotedError if the voter already has a queued ballot.
+        """
+        receipt_id = uuid.uuid4().hex
+        # Checked like cast_ballot does, and appended while the season is
+        # locked, so that its conclusion finds the ballot in the queue
+        with transaction.atomic():
+            check_election_season_open(election_season)
+            try:
+                self.connection.execute(
+                    'INSERT INTO queued_ballot (receipt_id, '
+                    'election_season_id, college_id, voter_id, '
+                    'voted_candidate_ids, casted_on, signature, public_key) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (receipt_id, election_season.pk, college.pk, voter.pk,
+                     json.dumps(list(voted_candidate_ids)),
+                     timezone.now().isoformat(), signature, public_key))
+            except sqlite3.IntegrityError:
+                raise AlreadyVotedError(
+                    f'{voter} has already voted in {election_season}.')
+        remember_vote(election_season, voter)
+        return receipt_id
+
+    def get(self, receipt_id):
+        """
+        Returns the queued ballot with the receipt id, or None.
+        """
+        return self.connection.execute(
+            'SELECT * FROM queued_ballot WHERE receipt_id = ?',
+            (receipt_id,)).fetchone()
+
+    def has_ballot(self, election_season, voter):
+        """
+        Tells if a voter has a ballot in the queue for an election season
+        that was not rejected.
+        """
+        return self.connection.execute(
+            'SELECT 1 FROM queued_ballot WHERE election_season_id = ? '
+            "AND voter_id = ? AND status != 'REJECTED'",
+            (election_season.pk, voter.pk)).fetchone() is not None
+
+    def pending(self, limit, election_season_id=None):
+        """
+        Returns the oldest queued ballots not saved yet, of an election
+        season if given.
+        """
+        if election_season_id is None:
+            return self.connection.execute(
+                "SELECT * FROM queued_ballot WHERE status = 'PENDING' "
+                'ORDER BY seq LIMIT ?', (limit,)).fetchall()
+        return self.connection.execute(
+            "SELECT * FROM queued_ballot WHERE status = 'PENDING' "
+            'AND election_season_id = ? ORDER BY seq LIMIT ?',
+            (election_season_id, limit)).fetchall()
+
+    def mark(self, outcomes):
+        """
+        Marks queued ballots as either COMMITTED or REJECTED, given a list
+        of (seq, status, ballot_id, reason), the reason being one of
+        REJECTION_REASONS for rejected ones.
+        """
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'UPDATE queued_ballot SET status = ?, ballot_id = ?, '
+                'reason = ? WHERE seq = ?',
+                [(status, ballot_id, reason, seq)
+                 for seq, status, ballot_id, reason in outcomes])
+
+
+_ballot_queue = None
+
+
+def get_ballot_queue():
+    """
+    Returns the ballot queue set in the ELECTIONS_BALLOT_QUEUE setting.
+    """
+    global _ballot_queue
+    if _ballot_queue is None:
+        _ballot_queue = BallotQueue(settings.ELECTIONS_BALLOT_QUEUE)
+    return _ballot_queue
+
+
+def save_queued_ballots(queued_ballots):
+    """
+    Saves queued ballots as Ballot objects along with their votes, then
+    returns their (seq, 'COMMITTED', ballot id, None) outcomes. Should be
+    called in a transaction.
+    """
+    Vote = Ballot.voted_candidates.through
+
+    ballots = [Ballot(election_season_id=queued['election_season_id'],
+                      college_id=queued['college_id'],
+                      voter_id=queued['voter_id'],
+                      casted_on=datetime.datetime.fromisoformat(
+                          queued['casted_on']),
+                      signature=queued['signature'],
+                      public_key=queued['public_key'])
+               for queued in queued_ballots]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Ballot.objects.bulk_create(ballots)
+    else:
+        for ballot in ballots:
+            ballot.save()
+
+    votes = []
+    outcomes = []
+    for queued, ballot in zip(queued_ballots, ballots):
+        voted_candidate_ids = json.loads(queued['voted_candidate_ids'])
+        votes += [Vote(ballot_id=ballot.id,
+                       runningcandidate_id=running_candidate_id)
+                  for running_candidate_id in voted_candidate_ids]
+        # Update the live counters along with the ballot
+        if settings.ELECTIONS_LIVE_TALLY:
+            record_votes(ballot, voted_candidate_ids)
+        outcomes.append((queued['seq'], 'COMMITTED', ballot.id, None))
+    Vote.objects.bulk_create(votes)
+    return outcomes
+
+
+def commit_queued_ballots(queue, batch_size, election_season=None):
+    """
+    Saves the next batch of queued ballots in a single transaction, then
+    returns a tuple of how many were committed and rejected.
+
+    Queued ballots are processed in the order they were submitted. Ballots
+    of voters that already have one in the database are rejected, unless it
+    is the very same ballot (i.e. saved before the queue was marked).
+
+    Ballots are only saved while their election season is INITIATED, and
+    rejected once it is CONCLUDED (or gone). Those of a season being
+    concluded are left in the queue, for its conclusion to save by giving
+    the season (see drain_ballot_queue). A ballot that cannot be saved
+    (e.g. one of its candidates is gone) is rejected on its own, without
+    the rest of the batch.
+    """
+    queued_ballots = queue.pending(
+        batch_size, election_season.pk if election_season else None)
+    if not queued_ballots:
+        return 0, 0
+
+    outcomes = []
+
+    with transaction.atomic():
+        # Status of the seasons of this batch, locked until it is saved
+        # (see get_election_season_status)
+        season_statuses = {
+            election_season_id: get_election_season_status(
+                election_season_id)
+            for election_season_id in {queued['election_season_id']
+                                       for queued in queued_ballots}}
+        open_statuses = (('INITIATED', 'CONCLUDING') if election_season
+                         else ('INITIATED',))
+
+        # Foreign keys are only checked on commit, so what the ballots of
+        # this batch refer to (and may be gone since) is checked here
+        voter_ids = {queued['voter_id'] for queued in queued_ballots}
+        existing_voter_ids = set(auth_models.User.objects
+                                 .filter(id__in=voter_ids)
+                                 .values_list('id', flat=True))
+        college_ids = set(College.objects.values_list('id', flat=True))
+        running_candidates = set(
+            RunningCandidate.objects
+            .filter(election_season__in=season_statuses)
+            .values_list('election_season_id', 'id'))
+
+        # Ballots already in the database for the voters of this batch
+        existing_ballots = {}
+        for ballot in (Ballot.objects
+                       .filter(voter__in=voter_ids)
+                       .only('id', 'election_season', 'voter', 'casted_on')):
+            existing_ballots[(ballot.election_season_id, ballot.voter_id)] \
+                = ballot
+
+        new_ballots = []
+        for queued in queued_ballots:
+            status = season_statuses[queued['election_season_id']]
+            existing = existing_ballots.get(
+                (queued['election_season_id'], queued['voter_id']))
+            if existing is not None:
+                casted_on = datetime.datetime.fromisoformat(
+                    queued['casted_on'])
+                outcomes.append(
+                    (queued['seq'], 'COMMITTED', existing.id, None)
+                    if existing.casted_on == casted_on
+                    else (queued['seq'], 'REJECTED', None, 'ALREADY_VOTED'))
+            elif status not in open_statuses:
+                # Left for the conclusion of its season
+                if status == 'CONCLUDING':
+                    continue
+                logger.warning('Rejected queued ballot %s, as its season '
+                               'is not ongoing.', queued['receipt_id'])
+                outcomes.append(
+                    (queued['seq'], 'REJECTED', None, 'ELECTION_CLOSED'))
+            elif (queued['voter_id'] not in existing_voter_ids
+                  or queued['college_id'] not in college_ids
+                  or not all(
+                      (queued['election_season_id'], running_candidate_id)
+                      in running_candidates
+                      for running_candidate_id
+                      in json.loads(queued['voted_candidate_ids']))):
+                logger.warning('Rejected queued ballot %s, as its voter, '
+                               'college or candidates are gone.',
+                               queued['receipt_id'])
+                outcomes.append(
+                    (queued['seq'], 'REJECTED', None, 'BALLOT_CHANGED'))
+            else:
+                new_ballots.append(queued)
+
+        try:
+            with transaction.atomic():
+                outcomes += save_queued_ballots(new_ballots)
+        except IntegrityError:
+            # Save them one at a time, to only reject those that fail
+            # (e.g. one saved by cast_ballot meanwhile)
+            for queued in new_ballots:
+                try:
+                    with transaction.atomic():
+                        outcomes += save_queued_ballots([queued])
+                except IntegrityError as error:
+                    logger.warning('Rejected queued ballot %s: %s',
+                                   queued['receipt_id'], error)
+                    outcomes.append(
+                        (queued['seq'], 'REJECTED', None, 'NOT_SAVED'))
+
+    queue.mark(outcomes)
+
+    return (len([outcome for outcome in outcomes
+                 if outcome[1] == 'COMMITTED']),
+            len([outcome for outcome in outcomes
+                 if outcome[1] == 'REJECTED']))
+
+
+def drain_ballot_queue(election_season, batch_size=500):
+    """
+    Saves every ballot of an election season left in the ballot queue,
+    if there is one, then returns a tuple of how many were committed and
+    rejected. Called by its conclusion, once it is CONCLUDING, so that
+    the ballots acknowledged while it was ongoing are tallied.
+    """
+    committed = rejected = 0
+    if not settings.ELECTIONS_BALLOT_QUEUE:
+        return committed, rejected
+
+    queue = get_ballot_queue()
+    while True:
+        batch_committed, batch_rejected = commit_queued_ballots(
+            queue, batch_size, election_season)
+        if not (batch_committed or batch_rejected):
+            return committed, rejected
+        committed += batch_committed
+        rejected += batch_rejected
@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .conclusion import ConclusionError, conclude_election_season, \
+    refresh_winners
+from .models import Job
+from .receipts import export_receipts_zip, iter_season_receipts
+from .results import materialize_results
+from .tally import audit_recount, recount_votes
+
+from pathlib import Path
+import datetime
+import logging
+import traceback
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Times a job is tried before it is left FAILED
+MAX_JOB_ATTEMPTS = 3
+
+# Seconds a failed job waits before it is tried again, doubled each attempt
+JOB_RETRY_DELAY = 60
+
+
+class JobError(Exception):
+    """
+    Raised when a job cannot be done (e.g. concluding a concluded season),
+    in which case it fails without being tried again.
+    """
+
+
+def enqueue_job(election_season, kind):
+    """
+    Requests a job on an election season, then returns it. If one of the
+    same kind is already pending or running, that one is returned instead.
+    """
+    job = (Job.objects
+           .filter(election_season=election_season, kind=kind,
+                   status__in=('PENDING', 'RUNNING'))
+           .first())
+    if job is None:
+        job = Job.objects.create(election_season=election_season, kind=kind)
+    return job
+
+
+def claim_next_job(stale_after):
+    """
+    Marks the oldest pending job as RUNNING, then returns it, or None if
+    there is none. Pending jobs to be tried again later are skipped until
+    then. Running jobs whose worker has not been heard of for stale_after
+    seconds are tried again, as their worker is likely gone.
+
+    The job is claimed by a conditional update, so that two workers never
+    run the same job.
+    """
+    now = timezone.now()
+    stale_on = now - datetime.timedelta(seconds=stale_after)
+
+    for job in (Job.objects
+                .filter(Q(status='PENDING', run_after__isnull=True)
+                        | Q(status='PENDING', run_after__lte=now)
+                        | Q(status='RUNNING', heartbeat_on__lt=stale_on))
+                .order_by('created_on', 'id')[:10]):
+        unclaimed = Job.objects.filter(pk=job.pk, status=job.status,
+                                       heartbeat_on=job.heartbeat_on)
+        if job.attempts >= MAX_JOB_ATTEMPTS:
+            unclaimed.update(status='FAILED', finished_on=now,
+                             result='Its worker stopped responding.')
+            continue
+        claimed = unclaimed.update(status='RUNNING', progress=0,
+                                   attempts=job.attempts + 1,
+                                   started_on=now, heartbeat_on=now)
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def report_progress(job, done, total):
+    """
+    Stores how far a running job is, which also tells it is still alive.
+    """
+    job.progress = min(100, round(done / total * 100)) if total else 100
+    job.heartbeat_on = timezone.now()
+    Job.objects.filter(pk=job.pk).update(progress=job.progress,
+                                         heartbeat_on=job.heartbeat_on)
+
+
+def run_conclude(job):
+    if job.election_season.status not in ('INITIATED', 'CONCLUDING'):
+        raise JobError(f'{job.election_season} cannot be concluded.')
+    phases = (4 + bool(settings.ELECTIONS_LIVE_TALLY)
+              + bool(settings.ELECTIONS_BALLOT_QUEUE))
+    conclusion = conclude_election_season(
+        job.election_season,
+        progress=lambda done: report_progress(job, done, phases))
+    return (f'Concluded with {len(conclusion.tampered_ballots)} tampered '
+            f'ballot(s), {conclusion.rejected_queued_ballots} rejected '
+            f'queued ballot(s) and {len(conclusion.ties)} tie(s) broken. '
+            f'Took {conclusion.summary()}.')
+
+
+def run_refresh_winners(job):
+    if job.election_season.status != 'CONCLUDED':
+        raise JobError(f'{job.election_season} is not concluded yet.')
+    conclusion = refresh_winners(
+        job.election_season,
+        progress=lambda done: report_progress(job, done, 2))
+    return (f'Winners picked with {len(conclusion.ties)} tie(s) broken. '
+            f'Took {conclusion.summary()}.')
+
+
+def run_results(job):
+    # Only concluded seasons have a tally to build the results from
+    if job.election_season.status != 'CONCLUDED':
+        raise JobError(f'{job.election_season} is not concluded yet.')
+    materialize_results(job.election_season)
+    return 'Results generated.'
+
+
+def run_recount(job):
+    if job.election_season.status != 'CONCLUDED':
+        raise JobError(f'{job.election_season} is not concluded yet.')
+    ballots, votes = recount_votes(
+        job.election_season,
+        progress=lambda counted, ranges, _: report_progress(job, counted,
+                                                            ranges))
+    problems, notes = audit_recount(job.election_season, votes)
+    return '\n'.join(
+        [f'Recounted {ballots} ballots: '
+         + (f'{len(problems)} mismatch(es).' if problems
+            else 'matches the stored results.')]
+        + problems + notes)
+
+
+def run_export_receipts(job):
+    # Named unguessably, as MEDIA_ROOT may be served as is
+    path = (Path(settings.MEDIA_ROOT) / 'exports'
+            / f'receipts-{job.election_season.id}-{uuid.uuid4().hex}.zip')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as output:
+        export_receipts_zip(iter_season_receipts(job.election_season),
+                            output)
+    job.output = str(path)
+    return 'Receipts exported.'
+
+
+JOB_RUNNERS = {
+    'CONCLUDE': run_conclude,
+    'REFRESH_WINNERS': run_refresh_winners,
+    'RESULTS': run_results,
+    'RECOUNT': run_recount,
+    'EXPORT_RECEIPTS': run_export_receipts,
+}
+
+
+def run_job(job):
+    """
+    Runs a claimed job, then stores its outcome. A failed job is tried
+    again later (after JOB_RETRY_DELAY seconds, doubled each attempt) until
+    it has been tried MAX_JOB_ATTEMPTS times; every kind of job can safely
+    be run again after failing partway.
+    """
+    logger.info('Running job #%s (%s), attempt %s.', job.id, job,
+                job.attempts)
+    try:
+        job.result = JOB_RUNNERS[job.kind](job)
+        job.status = 'SUCCEEDED'
+        job.progress = 100
+    except (JobError, ConclusionError) as error:
+        job.result = str(error)
+        job.status = 'FAILED'
+    except Exception:
+        logger.exception('Job #%s (%s) failed.', job.id, job)
+        job.result = traceback.format_exc()
+        job.status = ('PENDING' if job.attempts < MAX_JOB_ATTEMPTS
+                      else 'FAILED')
+    finally:
+        # Connections may have been closed by process pools, or broken
+        close_old_connections()
+
+    job.finished_on = timezone.now()
+    job.run_after = (job.finished_on + datetime.timedelta(
+        seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        if job.status == 'PENDING' else None)
+    job.heartbeat_on = job.finished_on
+    job.save()
+    return job
@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+import time
+
+from .models import OfferedPosition, RunningCandidate
+
+# Version of every compiled layout, bumped whenever a season,
+# its offered positions or its running candidates are changed. It expires
+# after ELECTIONS_LOOKUP_CACHE_TIMEOUT, so that processes not sharing the
+# cache (e.g. with LocMemCache) see the changes of the others that late.
+LAYOUT_VERSION_CACHE_KEY = 'elections:ballot_layout:version'
+
+# Layouts already loaded by this process, keyed by
+# (version, election_season_id, college_id).
+_compiled_layouts = {}
+
+
+def compile_ballot_layout(election_season_id, college_id):
+    """
+    Compiles the structure of the ballot shown to a voter of a college,
+    structured like the ff:
+    [
+      { field_name: 'central_president',
+        label: 'Central - President',
+        max_positions_to_fill: int,
+        candidates: [
+          { id: RunningCandidate id,
+            label: '#1 - First Last',
+            ballot_number: 1,
+            name: 'First Last',
+            image_url: str or None },
+          { ... next candidate }
+        ]
+      },
+      { ... next position }
+    ]
+
+    Only positions belonging either in CENTRAL SC or in the same college SC
+    as the voter, and with actual running candidates, are included.
+    """
+    offered_positions = (
+        OfferedPosition.objects
+        .filter(Q(government_position__college__isnull=True)
+                | Q(government_position__college=college_id),
+                election_season=election_season_id)
+        .select_related('government_position',
+                        'government_position__college')
+        .order_by('id'))
+
+    candidates_per_position = {}
+    for running_candidate in (RunningCandidate.objects
+                              .filter(election_season=election_season_id,
+                                      is_disqualified=False)
+                              .select_related('candidate')
+                              .order_by('id')):
+        candidate = running_candidate.candidate
+        (candidates_per_position
+         .setdefault(running_candidate.government_position_id, [])
+         .append({'id': running_candidate.id,
+                  'label': str(running_candidate),
+                  'ballot_number': running_candidate.ballot_number,
+                  'name': f'{candidate.first_name} {candidate.last_name}',
+                  'image_url': (candidate.image.url
+                                if candidate.image else None)}))
+
+    layout = []
+    for offered_position in offered_positions:
+        government_position = offered_position.government_position
+        position_college = government_position.college
+
+        candidates = candidates_per_position.get(government_position.id)
+        if not candidates:
+            continue
+
+        layout.append({
+            'field_name': (
+                (position_college.name.replace(' ', '').lower()
+                 if position_college else 'central')
+                + '_' + government_position.name.replace(' ', '').lower()),
+            'label': ((position_college.name
+                       if position_college else 'Central')
+                      + ' - ' + government_position.name),
+            'max_positions_to_fill': offered_position.max_positions_to_fill,
+            'candidates': candidates,
+        })
+
+    return layout
+
+
+def get_layout_version():
+    """
+    Returns the current version of the ballot layouts, which changes
+    whenever anything shown in a ballot is changed.
+    """
+    return cache.get_or_set(LAYOUT_VERSION_CACHE_KEY, time.time_ns,
+                            settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+
+
+def get_candidate_manifest(election_season_id, college_id):
+    """
+    Returns what the voter's browser needs to show its selected candidates
+    without asking the server, structured like the ff:
+    { version: int,
+      candidates: {
+        RunningCandidate id: { position: 'Central - President',
+                               ballot_number: 1, name: 'First Last' },
+        ...
+      }
+    }
+    """
+    return {
+        'version': get_layout_version(),
+        'candidates': {
+            candidate['id']: {'position': position['label'],
+                              'ballot_number': candidate['ballot_number'],
+                              'name': candidate['name']}
+            for position in get_ballot_layout(election_season_id, college_id)
+            for candidate in position['candidates']},
+    }
+
+
+def get_ballot_layout(election_season_id, college_id):
+    """
+    Returns the compiled ballot layout of a voter of a college.
+
+    Layouts are compiled once, then kept both in this process and in the
+    cache backend (shared by the other processes if configured so).
+    """
+    version = get_layout_version()
+    key = (version, election_season_id, college_id)
+
+    layout = _compiled_layouts.get(key)
+    if layout is None:
+        cache_key = ('elections:ballot_layout:'
+                     f'{version}:{election_season_id}:{college_id}')
+        layout = cache.get(cache_key)
+        if layout is None:
+            layout = compile_ballot_layout(election_season_id, college_id)
+            # Not needed past its version
+            cache.set(cache_key, layout,
+                      settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+        # Layouts of older versions are not needed anymore
+        if any(other_key[0] != version for other_key in _compiled_layouts):
+            _compiled_layouts.clear()
+        _compiled_layouts[key] = layout
+
+    return layout
+
+
+def invalidate_ballot_layouts():
+    """
+    Drops every compiled ballot layout, of this and the other processes
+    (right away if they share the cache, otherwise once their version
+    expires).
+    """
+    try:
+        cache.incr(LAYOUT_VERSION_CACHE_KEY)
+    except ValueError:
+        # Not in the cache (yet or anymore), nothing to invalidate
+        pass
+    _compiled_layouts.clear()
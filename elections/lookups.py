@@ -0,0 +1,275 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import ElectionSeason, Ballot, College, EligibleVoter
+
+from collections import Counter
+import threading
+import time
+
+CURRENT_SEASON_CACHE_KEY = 'elections:current_election_season'
+HAS_VOTED_CACHE_KEY = 'elections:has_voted:{}:{}'
+# Version of every voter roll, bumped whenever an eligible voter is changed.
+# Like the ballot layout version, it expires after
+# ELECTIONS_LOOKUP_CACHE_TIMEOUT for processes not sharing the cache.
+VOTER_ROLL_VERSION_CACHE_KEY = 'elections:voter_roll:version'
+# Session key of the ids of the seasons the user is known to have voted in
+VOTED_SEASONS_SESSION_KEY = 'voted_election_season_ids'
+
+
+def get_current_election_season():
+    """
+    Returns the initiated election season, or None if there isn't.
+    The result is cached until a season is changed.
+    """
+    # A cached False means there is no initiated season
+    election_season = cache.get(CURRENT_SEASON_CACHE_KEY)
+    if election_season is None:
+        election_season \
+            = ElectionSeason.objects.filter(status='INITIATED').first() \
+            or False
+        cache.set(CURRENT_SEASON_CACHE_KEY, election_season,
+                  settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+    return election_season or None
+
+
+def invalidate_current_election_season():
+    cache.delete(CURRENT_SEASON_CACHE_KEY)
+
+
+class VoterBitmap:
+    """
+    A compact set of the ids of the voters that have voted in an election
+    season, one bit per user id.
+
+    It is built from the season's ballots once, then kept up to date by the
+    ballots casted by this process, and by syncing the ballots casted by
+    other processes every ELECTIONS_LOOKUP_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self, election_season_id):
+        self.election_season_id = election_season_id
+        self._bits = bytearray()
+        self._lock = threading.Lock()
+        self._last_ballot_id = 0
+        self._synced_on = None
+
+    def add(self, voter_id):
+        with self._lock:
+            byte_index = voter_id >> 3
+            if byte_index >= len(self._bits):
+                # Grow with some room, to not grow on every new user
+                self._bits.extend(
+                    bytes(byte_index - len(self._bits) + 1024))
+            self._bits[byte_index] |= 1 << (voter_id & 7)
+
+    def __contains__(self, voter_id):
+        self.sync()
+        byte_index = voter_id >> 3
+        return (byte_index < len(self._bits)
+                and bool(self._bits[byte_index] & (1 << (voter_id & 7))))
+
+    def sync(self):
+        """
+        Adds the voters of the ballots saved since the last sync,
+        if it is time to.
+        """
+        if self._synced_on is not None and (
+                time.monotonic() - self._synced_on
+                < settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT):
+            return
+        self._synced_on = time.monotonic()
+
+        for ballot_id, voter_id in (
+                Ballot.objects
+                .filter(election_season=self.election_season_id,
+                        id__gt=self._last_ballot_id)
+                .order_by('id')
+                .values_list('id', 'voter_id')
+                .iterator(chunk_size=10000)):
+            self.add(voter_id)
+            self._last_ballot_id = ballot_id
+
+
+# Voter bitmaps of this process, keyed by election season id
+_voter_bitmaps = {}
+_voter_bitmaps_lock = threading.Lock()
+
+
+def get_voter_bitmap(election_season):
+    with _voter_bitmaps_lock:
+        voter_bitmap = _voter_bitmaps.get(election_season.pk)
+        if voter_bitmap is None:
+            voter_bitmap = _voter_bitmaps[election_season.pk] \
+                = VoterBitmap(election_season.pk)
+    return voter_bitmap
+
+
+class VoterRoll:
+    """
+    The voter roll of an election season, indexed in memory by email and by
+    student number, to look up the college of a voter without any query.
+
+    It is loaded once, then reloaded if the roll has changed (i.e. its
+    version was bumped, or rows were added or removed in bulk), which is
+    checked every ELECTIONS_LOOKUP_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self, election_season_id):
+        self.election_season_id = election_season_id
+        self._colleges_by_email = {}
+        self._colleges_by_student_number = {}
+        # Number of eligible voters of each college id
+        self.college_sizes = Counter()
+        self._lock = threading.Lock()
+        self._version = None
+        self._synced_on = None
+
+    def get_college_id(self, user):
+        """
+        Returns the college id of a user on the roll, by its email or its
+        username as a student number, or None if it is not on the roll.
+        """
+        self.sync()
+        return (self._colleges_by_email.get((user.email or '').lower())
+                or self._colleges_by_student_number.get(user.username))
+
+    def sync(self):
+        """
+        Reloads the roll if it has changed since the last sync,
+        if it is time to.
+        """
+        if self._synced_on is not None and (
+                time.monotonic() - self._synced_on
+                < settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT):
+            return
+
+        with self._lock:
+            self._synced_on = time.monotonic()
+            roll = EligibleVoter.objects.filter(
+                election_season=self.election_season_id)
+            # Edits bump the roll version, while the count and last id tell
+            # of rows added by bulk_create (e.g. by an import)
+            version = (get_voter_roll_version(),
+                       *roll.aggregate(Count('id'), Max('id')).values())
+            if version == self._version:
+                return
+
+            colleges_by_email = {}
+            colleges_by_student_number = {}
+            for email, student_number, college_id in (
+                    roll.values_list('email', 'student_number', 'college_id')
+                    .iterator(chunk_size=10000)):
+                colleges_by_email[email] = college_id
+                if student_number:
+                    colleges_by_student_number[student_number] = college_id
+            self._colleges_by_email = colleges_by_email
+            self._colleges_by_student_number = colleges_by_student_number
+            self.college_sizes = Counter(colleges_by_email.values())
+            self._version = version
+
+
+# Voter rolls of this process, keyed by election season id
+_voter_rolls = {}
+_voter_rolls_lock = threading.Lock()
+
+
+def get_voter_roll_version():
+    return cache.get_or_set(VOTER_ROLL_VERSION_CACHE_KEY, time.time_ns,
+                            settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+
+
+def invalidate_voter_rolls():
+    """
+    Has every voter roll reloaded, by this process on its next lookup, and
+    by the others on their next sync.
+    """
+    try:
+        cache.incr(VOTER_ROLL_VERSION_CACHE_KEY)
+    except ValueError:
+        # Not in the cache (yet or anymore), so a new version is set anyway
+        pass
+    with _voter_rolls_lock:
+        for voter_roll in _voter_rolls.values():
+            voter_roll._synced_on = None
+
+
+def get_voter_roll(election_season):
+    with _voter_rolls_lock:
+        voter_roll = _voter_rolls.get(election_season.pk)
+        if voter_roll is None:
+            voter_roll = _voter_rolls[election_season.pk] \
+                = VoterRoll(election_season.pk)
+    return voter_roll
+
+
+def get_turnout(election_season):
+    """
+    Returns the number of eligible voters and of ballots of each college of
+    an election season with a voter roll, as a list of dicts, or an empty
+    list if it has none.
+    """
+    voter_roll = get_voter_roll(election_season)
+    voter_roll.sync()
+    if not voter_roll.college_sizes:
+        return []
+
+    ballots = dict(Ballot.objects
+                   .filter(election_season=election_season)
+                   .values_list('college_id')
+                   .annotate(Count('id')))
+    return [{'college': college.name,
+             'eligible': voter_roll.college_sizes[college.id],
+             'voted': ballots.get(college.id, 0),
+             'percentage': (ballots.get(college.id, 0)
+                            / voter_roll.college_sizes[college.id] * 100
+                            if voter_roll.college_sizes[college.id] else 0)}
+            for college in College.objects.order_by('name')]
+
+
+def has_voted(request, election_season):
+    """
+    Checks if the user of the request has already voted in an election
+    season. Checks the session first, then the season's voter bitmap,
+    which rules out voters who have not voted without any query. Voters in
+    the bitmap are confirmed through the cache, then the database.
+    """
+    if election_season.id in request.session.get(VOTED_SEASONS_SESSION_KEY,
+                                                 []):
+        return True
+
+    if request.user.id not in get_voter_bitmap(election_season):
+        return False
+
+    cache_key = HAS_VOTED_CACHE_KEY.format(election_season.id,
+                                           request.user.id)
+    voted = cache.get(cache_key)
+    if voted is None:
+        voted = Ballot.objects.filter(election_season=election_season,
+                                      voter=request.user).exists()
+        cache.set(cache_key, voted, settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+
+    if voted:
+        remember_voted_in_session(request, election_season)
+    return voted
+
+
+def remember_vote(election_season, voter):
+    """
+    Notes in the voter bitmap and in the cache that a voter has voted
+    in an election season.
+    """
+    get_voter_bitmap(election_season).add(voter.pk)
+    cache.set(HAS_VOTED_CACHE_KEY.format(election_season.pk, voter.pk), True,
+              settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+
+
+def remember_voted_in_session(request, election_season):
+    """
+    Notes in the session that its user has voted in an election season.
+    """
+    voted_season_ids = request.session.get(VOTED_SEASONS_SESSION_KEY, [])
+    if election_season.pk not in voted_season_ids:
+        request.session[VOTED_SEASONS_SESSION_KEY] \
+            = voted_season_ids + [election_season.pk]
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth import models as auth_models
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+
+from elections.benchmark import benchmark_casting, benchmark_conclusion, \
+    create_voters, fill_ballots, seed_season
+
+import os
+import tempfile
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks ballot casting, concluding and viewing results on a '
+            'seeded election season, in a separate test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--colleges', type=int, default=20)
+        parser.add_argument('--voters', type=int, default=500,
+                            help='Number of ballots casted through '
+                                 'the voting pages.')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Number of voters voting at the same time.')
+        parser.add_argument('--tally-sizes', default='10000,50000,200000',
+                            help='Comma-separated numbers of ballots to '
+                                 'conclude a season with.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Voters voting at the same time need an on-disk SQLite database
+        # (the in-memory one locks whole tables).
+        test_settings = connection.settings_dict['TEST']
+        if connection.vendor == 'sqlite' and not test_settings['NAME']:
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(),
+                                                 'elections-benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run_benchmarks(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmarks(self, options):
+        self.stdout.write(f'Database profile: {settings.DATABASE_PROFILE} '
+                          f'({connection.settings_dict["ENGINE"]})')
+        election_season = seed_season(colleges=options['colleges'],
+                                      seed=options['seed'])
+        self.stdout.write(
+            f'Seeded {election_season.runningcandidate_set.count()} '
+            f'candidates for '
+            f'{election_season.offeredposition_set.count()} positions '
+            f'in {options["colleges"]} colleges.')
+
+        # Casting through the voting pages
+        timings, ballots_per_second, failures = benchmark_casting(
+            election_season, create_voters(options['voters']),
+            concurrency=options['concurrency'], seed=options['seed'])
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Casting {options["voters"]} ballots '
+            f'({options["concurrency"]} at a time)'))
+        for timing in timings:
+            self.stdout.write(f'  {timing.summary()}')
+        self.stdout.write(f'  {ballots_per_second:.1f} ballots/second, '
+                          f'{failures} failed')
+
+        # Concluding then viewing results with more and more ballots
+        admin_client = Client()
+        admin_client.force_login(auth_models.User.objects.create_superuser(
+            'benchmark-admin', 'admin@example.com', None))
+        for size in sorted(int(size) for size
+                           in options['tally_sizes'].split(',') if size):
+            fill_ballots(election_season, size, seed=options['seed'])
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Concluding with {size} ballots'))
+            for timing in benchmark_conclusion(election_season,
+                                               admin_client):
+                self.stdout.write(f'  {timing.summary()}')
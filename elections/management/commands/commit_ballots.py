@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.intake import commit_queued_ballots, get_ballot_queue
+
+import time
+
+
+class Command(BaseCommand):
+    help = ('Saves the ballots submitted in the ballot queue '
+            '(ELECTIONS_BALLOT_QUEUE) in batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of ballots saved per transaction.')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Stop once the queue is empty.')
+
+    def handle(self, *args, **options):
+        if not settings.ELECTIONS_BALLOT_QUEUE:
+            raise CommandError('ELECTIONS_BALLOT_QUEUE is not set.')
+
+        queue = get_ballot_queue()
+
+        while True:
+            committed, rejected = commit_queued_ballots(
+                queue, options['batch_size'])
+
+            if committed or rejected:
+                self.stdout.write(f'{committed} ballot(s) committed, '
+                                  f'{rejected} rejected.')
+            # Only wait if the queue has been emptied
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.exports import AUDIT_BALLOT_COLUMNS, BALLOT_COLUMNS, \
+    TOTAL_COLUMNS, iter_csv, iter_ballot_rows, iter_gzip, iter_total_rows
+from elections.models import ElectionSeason
+
+import sys
+
+
+class Command(BaseCommand):
+    help = ('Writes every ballot of a concluded election season, or the '
+            'votes of each of its candidates, as CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_season_id', type=int)
+        parser.add_argument('output',
+                            help='Path of the file to write, or - for '
+                                 'the standard output.')
+        parser.add_argument('--totals', action='store_true',
+                            help='Write the votes of each candidate '
+                                 'instead of the ballots.')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the CSV with gzip.')
+        parser.add_argument('--audit', action='store_true',
+                            help='Also write the voter of each ballot, to '
+                                 'verify their signatures. This tells who '
+                                 'voted for whom, so only use it for '
+                                 'audits.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of ballots loaded at a time.')
+
+    def handle(self, *args, **options):
+        try:
+            election_season = ElectionSeason.objects.get(
+                pk=options['election_season_id'])
+        except ElectionSeason.DoesNotExist:
+            raise CommandError('Election season does not exist.')
+
+        # Check if the season is concluded, so no ballot is missed
+        if election_season.status != 'CONCLUDED':
+            raise CommandError(f'{election_season} is not concluded yet.')
+
+        if options['totals']:
+            lines = iter_csv(TOTAL_COLUMNS, iter_total_rows(election_season))
+        else:
+            lines = iter_csv(AUDIT_BALLOT_COLUMNS if options['audit']
+                             else BALLOT_COLUMNS,
+                             iter_ballot_rows(election_season,
+                                              options['chunk_size'],
+                                              audit=options['audit']))
+
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+        else:
+            output = open(options['output'], 'wb')
+        try:
+            if options['gzip']:
+                for data in iter_gzip(lines):
+                    output.write(data)
+            else:
+                for line in lines:
+                    output.write(line.encode())
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Export of {election_season} written to '
+                f'{options["output"]}.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.models import ElectionSeason
+from elections.receipts import export_receipts_pdf, export_receipts_zip, \
+    iter_season_receipts
+
+
+class Command(BaseCommand):
+    help = ('Renders the PDF receipts of every ballot of an election season, '
+            'either in a single multi-page PDF or a ZIP of PDFs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_season_id', type=int)
+        parser.add_argument('output', help='Path of the file to write.')
+        parser.add_argument('--format', choices=('zip', 'pdf'),
+                            default='zip')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of rendering processes (ZIP only). '
+                                 'Defaults to the number of CPUs.')
+
+    def handle(self, *args, **options):
+        try:
+            election_season = ElectionSeason.objects.get(
+                pk=options['election_season_id'])
+        except ElectionSeason.DoesNotExist:
+            raise CommandError('Election season does not exist.')
+
+        receipts = iter_season_receipts(election_season)
+
+        with open(options['output'], 'wb') as output:
+            if options['format'] == 'pdf':
+                export_receipts_pdf(receipts, output)
+            else:
+                export_receipts_zip(receipts, output,
+                                    processes=options['processes'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Receipts of {election_season} written to '
+            f'{options["output"]}.'))
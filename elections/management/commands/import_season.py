@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.imports import IMPORT_SECTIONS, import_season_setup, \
+    read_import_file
+from elections.models import ElectionSeason
+
+from pathlib import Path
+
+
+class Command(BaseCommand):
+    help = ('Loads the positions, candidates, offered positions, running '
+            'candidates and voter roll of an election season from JSON or '
+            'CSV files. Nothing is saved if any row has an error.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_season_id', type=int)
+        parser.add_argument('files', nargs='+',
+                            help='A JSON file of sections, or CSV files each '
+                                 'named after its section (e.g. '
+                                 'candidates.csv).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only check the rows.')
+
+    def handle(self, *args, **options):
+        try:
+            election_season = ElectionSeason.objects.get(
+                pk=options['election_season_id'])
+        except ElectionSeason.DoesNotExist:
+            raise CommandError('Election season does not exist.')
+
+        # Check if the season has not started, as its ballots are set
+        if election_season.status is not None:
+            raise CommandError(f'{election_season} has already started.')
+
+        sections = {}
+        for file in map(Path, options['files']):
+            section = None if file.suffix == '.json' else file.stem
+            if section is not None and section not in IMPORT_SECTIONS:
+                raise CommandError(
+                    f'{file.name} should be named after one of: '
+                    f'{", ".join(IMPORT_SECTIONS)}.')
+            try:
+                with open(file, 'rb') as data:
+                    for name, rows in read_import_file(data,
+                                                       section).items():
+                        sections.setdefault(name, []).extend(rows)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'{file}: {error}')
+
+        season_import = import_season_setup(election_season, sections,
+                                            dry_run=options['dry_run'])
+
+        if season_import.errors:
+            for section, number, message in season_import.errors:
+                self.stderr.write(f'{section} row {number}: {message}')
+            raise CommandError(f'{len(season_import.errors)} row(s) have '
+                               f'errors. Nothing was imported.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('All rows are valid.'))
+            return
+        for section in IMPORT_SECTIONS:
+            self.stdout.write(
+                f'{section}: {season_import.created[section]} created')
+        self.stdout.write(self.style.SUCCESS(
+            f'Setup of {election_season} imported.'))
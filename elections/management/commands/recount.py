@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.models import ElectionSeason
+from elections.tally import audit_recount, recount_votes
+
+import time
+
+
+class Command(BaseCommand):
+    help = ('Recounts the votes of a concluded election season from its '
+            'ballots in parallel processes, then checks the stored tally '
+            'and winners against the recount.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_season_id', type=int)
+        parser.add_argument('--range-size', type=int, default=10000,
+                            help='Number of ballot ids counted per task.')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of counting processes. '
+                                 'Defaults to the number of CPUs.')
+
+    def handle(self, *args, **options):
+        try:
+            election_season = ElectionSeason.objects.get(
+                pk=options['election_season_id'])
+        except ElectionSeason.DoesNotExist:
+            raise CommandError('Election season does not exist.')
+
+        if election_season.status != 'CONCLUDED':
+            raise CommandError(f'Election season {election_season} '
+                               'is not concluded yet.')
+
+        start = time.perf_counter()
+        ballots, votes = recount_votes(
+            election_season, range_size=options['range_size'],
+            processes=options['processes'], progress=self.show_progress)
+        self.stdout.write('')
+        self.stdout.write(f'Recounted {ballots} ballots in '
+                          f'{time.perf_counter() - start:.2f}s.')
+
+        problems, notes = audit_recount(election_season, votes)
+        for note in notes:
+            self.stdout.write(note)
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(problem))
+
+        if problems:
+            raise CommandError(
+                f'Recount does not match the stored results of '
+                f'{election_season} in {len(problems)} place(s).')
+        self.stdout.write(self.style.SUCCESS(
+            f'Recount matches the stored results of {election_season}.'))
+
+    def show_progress(self, counted_ranges, ranges, ballots):
+        self.stdout.write(f'\rCounted {counted_ranges}/{ranges} ballot '
+                          f'ranges ({ballots} ballots)', ending='')
+        self.stdout.flush()
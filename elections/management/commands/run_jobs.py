@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from elections.jobs import claim_next_job, run_job
+
+import time
+
+
+class Command(BaseCommand):
+    help = ('Runs the jobs requested from the admin (e.g. concluding an '
+            'election season) one at a time, as they come.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to wait when there are no jobs.')
+        parser.add_argument('--stale-after', type=float, default=900.0,
+                            help='Seconds after which a running job that '
+                                 'reported no progress is run again.')
+        parser.add_argument('--once', action='store_true',
+                            help='Stop once there are no more jobs.')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job(options['stale_after'])
+
+            if job is not None:
+                self.stdout.write(f'Running job #{job.id} ({job})...')
+                job = run_job(job)
+                self.stdout.write(f'Job #{job.id} {job.status.lower()}: '
+                                  f'{job.result}')
+            # Only wait if there are no more jobs
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
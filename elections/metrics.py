@@ -0,0 +1,162 @@
+from django.db import connection
+
+from collections import deque
+import threading
+import time
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, float('inf'))
+
+
+class QueryCounter:
+    """
+    Context manager counting (and timing) the database queries executed
+    within it, on the current thread's connection.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+class RequestMetrics:
+    """
+    Request statistics per URL name, kept in memory by each process:
+    request count, a latency histogram, database queries and their time,
+    and the most recent requests (in a bounded ring buffer).
+    """
+
+    def __init__(self, recent_size=200):
+        self._lock = threading.Lock()
+        self.recent_size = recent_size
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_on = time.time()
+            self.per_url_name = {}
+            self.recent = deque(maxlen=self.recent_size)
+
+    def record(self, url_name, method, path, status_code, latency, queries,
+               query_duration):
+        with self._lock:
+            stats = self.per_url_name.get(url_name)
+            if stats is None:
+                stats = self.per_url_name[url_name] = {
+                    'count': 0, 'latency_sum': 0.0, 'queries_sum': 0,
+                    'query_duration_sum': 0.0, 'max_queries': 0,
+                    'buckets': [0] * len(LATENCY_BUCKETS)}
+            stats['count'] += 1
+            stats['latency_sum'] += latency
+            stats['queries_sum'] += queries
+            stats['query_duration_sum'] += query_duration
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            for index, upper_bound in enumerate(LATENCY_BUCKETS):
+                if latency <= upper_bound:
+                    stats['buckets'][index] += 1
+                    break
+
+            self.recent.append({
+                'url_name': url_name, 'method': method, 'path': path,
+                'status_code': status_code, 'latency': latency,
+                'queries': queries, 'query_duration': query_duration,
+                'time': time.time()})
+
+    def summary(self, slowest=20):
+        """
+        Returns the statistics of each URL name (busiest first),
+        and the slowest of the recent requests. Durations are in seconds.
+        """
+        with self._lock:
+            url_names = []
+            for url_name, stats in self.per_url_name.items():
+                count = stats['count']
+                url_names.append({
+                    'url_name': url_name,
+                    'count': count,
+                    'average_latency': stats['latency_sum'] / count,
+                    'p50_latency': self._bucket_percentile(stats, 0.5),
+                    'p99_latency': self._bucket_percentile(stats, 0.99),
+                    'average_queries': stats['queries_sum'] / count,
+                    'max_queries': stats['max_queries'],
+                    'average_query_duration':
+                        stats['query_duration_sum'] / count,
+                })
+            slowest_requests = sorted(self.recent,
+                                      key=lambda request: request['latency'],
+                                      reverse=True)[:slowest]
+
+        url_names.sort(key=lambda stats: stats['count'], reverse=True)
+        return url_names, slowest_requests
+
+    def _bucket_percentile(self, stats, fraction):
+        # Upper bound of the bucket where the percentile falls in
+        # (None if it falls in the last, unbounded, bucket)
+        target = stats['count'] * fraction
+        cumulative = 0
+        for upper_bound, count in zip(LATENCY_BUCKETS[:-1],
+                                      stats['buckets']):
+            cumulative += count
+            if cumulative >= target:
+                return upper_bound
+        return None
+
+    def export_prometheus(self):
+        """
+        Returns the statistics in the Prometheus text exposition format.
+        """
+        lines = [
+            '# HELP elections_request_duration_seconds Request latency.',
+            '# TYPE elections_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            per_url_name = {url_name: dict(stats, buckets=list(
+                                stats['buckets']))
+                            for url_name, stats in self.per_url_name.items()}
+
+        for url_name, stats in sorted(per_url_name.items()):
+            label = f'url_name="{url_name}"'
+            cumulative = 0
+            for upper_bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                bound = '+Inf' if upper_bound == float('inf') \
+                    else upper_bound
+                lines.append('elections_request_duration_seconds_bucket'
+                             f'{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'elections_request_duration_seconds_sum{{{label}}} '
+                         f'{stats["latency_sum"]}')
+            lines.append('elections_request_duration_seconds_count'
+                         f'{{{label}}} {stats["count"]}')
+
+        for name, key, description in (
+                ('elections_db_queries_total', 'queries_sum',
+                 'Database queries executed.'),
+                ('elections_db_query_duration_seconds_total',
+                 'query_duration_sum', 'Time spent in database queries.')):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for url_name, stats in sorted(per_url_name.items()):
+                lines.append(f'{name}{{url_name="{url_name}"}} {stats[key]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics of this process
+request_metrics = RequestMetrics()
@@ -0,0 +1,54 @@
+from django.utils.decorators import sync_and_async_middleware
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+
+from .metrics import QueryCounter, request_metrics
+
+import asyncio
+import time
+
+
+@sync_and_async_middleware
+class RequestMetricsMiddleware:
+    """
+    Records the latency and database queries of every request
+    in the request metrics, per URL name.
+
+    Under ASGI it runs asynchronously, so that asynchronous views are not
+    moved to a thread for it. The database work of a request is all run in
+    one thread then (by sync_to_async, thread sensitive), so its queries
+    are counted on that thread's connection.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        with QueryCounter() as queries:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        queries = QueryCounter()
+        await sync_to_async(queries.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.__exit__)(None, None, None)
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    def record(self, request, response, latency, queries):
+        resolver_match = getattr(request, 'resolver_match', None)
+        request_metrics.record(
+            resolver_match.view_name if resolver_match else '<unresolved>',
+            request.method, request.path, response.status_code, latency,
+            queries.count, queries.duration)
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.5 on 2026-10-17 22:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0006_ballot_college'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('running_candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.runningcandidate')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='votecounter',
+            constraint=models.UniqueConstraint(fields=('running_candidate', 'shard'), name='unique_vote_counter_shard'),
+        ),
+    ]
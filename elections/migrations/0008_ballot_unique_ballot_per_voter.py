@@ -0,0 +1,17 @@
+# Generated by Django 4.1.5 on 2026-10-17 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0007_votecounter'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ballot',
+            constraint=models.UniqueConstraint(fields=('election_season', 'voter'), name='unique_ballot_per_voter'),
+        ),
+    ]
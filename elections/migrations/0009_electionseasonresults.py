@@ -0,0 +1,28 @@
+# Generated by Django 4.1.5 on 2026-10-17 22:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import jsoneditor.fields.django3_jsonfield
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0008_ballot_unique_ballot_per_voter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionSeasonResults',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', jsoneditor.fields.django3_jsonfield.JSONField()),
+                ('generated_on', models.DateTimeField()),
+                ('election_season', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='elections.electionseason')),
+            ],
+            options={
+                'verbose_name': 'Election Season Results',
+                'verbose_name_plural': 'Election Season Results',
+            },
+        ),
+    ]
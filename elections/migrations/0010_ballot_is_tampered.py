@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0009_electionseasonresults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ballot',
+            name='is_tampered',
+            field=models.BooleanField(default=False),
+        ),
+    ]
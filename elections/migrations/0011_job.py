@@ -0,0 +1,36 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0010_ballot_is_tampered'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CONCLUDE', 'Conclude'), ('REFRESH_WINNERS', 'Refresh winners'), ('RESULTS', 'Generate results'), ('RECOUNT', 'Recount'), ('EXPORT_RECEIPTS', 'Export receipts')], max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.TextField(blank=True, null=True)),
+                ('output', models.CharField(blank=True, max_length=255, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_on', models.DateTimeField(blank=True, null=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_on', models.DateTimeField(blank=True, null=True)),
+                ('election_season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.electionseason')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'created_on'], name='job_status_created_on'),
+        ),
+    ]
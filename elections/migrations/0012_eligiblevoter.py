@@ -0,0 +1,31 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EligibleVoter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=255)),
+                ('student_number', models.CharField(blank=True, max_length=15, null=True)),
+                ('college', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='elections.college')),
+                ('election_season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.electionseason')),
+            ],
+            options={
+                'verbose_name': 'Eligible Voter',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eligiblevoter',
+            constraint=models.UniqueConstraint(fields=('election_season', 'email'), name='unique_eligible_voter_email'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0012_eligiblevoter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidate',
+            name='student_number',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='eligiblevoter',
+            index=models.Index(fields=['email'], name='eligible_voter_email'),
+        ),
+        migrations.AddIndex(
+            model_name='eligiblevoter',
+            index=models.Index(fields=['student_number'], name='eligible_voter_student_number'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:52
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    EligibleVoter = apps.get_model('elections', 'EligibleVoter')
+    EligibleVoter.objects.update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0014_job_run_after'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='eligiblevoter',
+            constraint=models.UniqueConstraint(fields=('election_season', 'student_number'), name='unique_eligible_voter_student_number'),
+        ),
+    ]
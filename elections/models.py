@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import models as auth_models
+from django.utils import timezone
 
 from jsoneditor.fields.django3_jsonfield import JSONField
 
@@ -39,7 +40,7 @@ class Candidate(models.Model):
     A recognized candidate after filing its Certificate of Candidacy
     and is lawfully processed.
     """
-    student_number = models.CharField(max_length=15)
+    student_number = models.CharField(max_length=15, db_index=True)
     college = models.ForeignKey(to=College, on_delete=models.PROTECT)
     party = models.CharField(max_length=255, null=True, blank=True)
     first_name = models.CharField(max_length=255)
@@ -83,6 +84,50 @@ class OfferedPosition(models.Model):
     max_positions_to_fill = models.PositiveSmallIntegerField()
 
 
+class EligibleVoter(models.Model):
+    """
+    A student on the voter roll of an election season, as given by the
+    registrar, and the college it votes for. Emails are kept in lowercase.
+    """
+    election_season = models.ForeignKey(to=ElectionSeason,
+                                        on_delete=models.CASCADE)
+    email = models.EmailField(max_length=255)
+    student_number = models.CharField(max_length=15, null=True, blank=True)
+    college = models.ForeignKey(to=College, on_delete=models.PROTECT)
+
+    def __str__(self):
+        return self.email
+
+    def clean(self):
+        # Voters are looked up by their email in lowercase, whether
+        # imported or added in the admin
+        self.email = self.email.lower()
+        self.student_number = self.student_number or None
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = 'Eligible Voter'
+        constraints = [
+            # A voter is on the roll of an election season only once,
+            # and is looked up by either
+            models.UniqueConstraint(fields=['election_season', 'email'],
+                                    name='unique_eligible_voter_email'),
+            models.UniqueConstraint(
+                fields=['election_season', 'student_number'],
+                name='unique_eligible_voter_student_number'),
+        ]
+        # Voters are searched by either in the admin
+        indexes = [
+            models.Index(fields=['email'],
+                         name='eligible_voter_email'),
+            models.Index(fields=['student_number'],
+                         name='eligible_voter_student_number'),
+        ]
+
+
 class RunningCandidate(models.Model):
     """
     A candidate that runs for the specified election scenario. Its ballot
@@ -106,6 +151,24 @@ class RunningCandidate(models.Model):
                 f'{self.candidate.last_name}')
 
 
+class VoteCounter(models.Model):
+    """
+    A live vote counter of a running candidate, incremented as ballots are
+    casted. A candidate's votes are split across several shards so that
+    concurrent ballots do not all wait on one row.
+    """
+    running_candidate = models.ForeignKey(to=RunningCandidate,
+                                          on_delete=models.CASCADE)
+    shard = models.PositiveSmallIntegerField()
+    votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['running_candidate', 'shard'],
+                                    name='unique_vote_counter_shard'),
+        ]
+
+
 class Ballot(models.Model):
     """
     A voter's evidence of voting.
@@ -119,6 +182,16 @@ class Ballot(models.Model):
     casted_on = models.DateTimeField()
     signature = models.TextField(null=True, blank=True)
     public_key = models.TextField(null=True, blank=True)
+    # Set when its signature does not match its voted candidates,
+    # in which case it is left out of the tally
+    is_tampered = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # A voter can only cast one ballot per election season
+            models.UniqueConstraint(fields=['election_season', 'voter'],
+                                    name='unique_ballot_per_voter'),
+        ]
 
 
 class ElectionSeasonWinningCandidate(models.Model):
@@ -134,3 +207,63 @@ class ElectionSeasonWinningCandidate(models.Model):
     position_name = models.CharField(max_length=510)
     ballot_number = models.PositiveSmallIntegerField()
     candidate_name = models.CharField(max_length=510)
+
+
+class ElectionSeasonResults(models.Model):
+    """
+    A result model (summary table) that holds the precomputed results of an
+    election season: the total votes of each position, and its candidates
+    ranked with their percentage of votes garnered.
+    """
+    election_season = models.OneToOneField(to=ElectionSeason,
+                                           on_delete=models.CASCADE,
+                                           related_name='results')
+    summary = JSONField()
+    generated_on = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Election Season Results'
+        verbose_name_plural = 'Election Season Results'
+
+
+class Job(models.Model):
+    """
+    A long operation on an election season (e.g. concluding it) requested
+    from the admin, then run in the background by the run_jobs command.
+    """
+    election_season = models.ForeignKey(to=ElectionSeason,
+                                        on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20,
+                            choices=(('CONCLUDE', 'Conclude'),
+                                     ('REFRESH_WINNERS', 'Refresh winners'),
+                                     ('RESULTS', 'Generate results'),
+                                     ('RECOUNT', 'Recount'),
+                                     ('EXPORT_RECEIPTS', 'Export receipts')))
+    status = models.CharField(max_length=10, default='PENDING',
+                              choices=(('PENDING', 'Pending'),
+                                       ('RUNNING', 'Running'),
+                                       ('SUCCEEDED', 'Succeeded'),
+                                       ('FAILED', 'Failed')))
+    # Percentage done, while running
+    progress = models.PositiveSmallIntegerField(default=0)
+    # Summary of the outcome, or the error it failed with
+    result = models.TextField(null=True, blank=True)
+    # Path of the file it made, if any (e.g. exported receipts)
+    output = models.CharField(max_length=255, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_on = models.DateTimeField(default=timezone.now)
+    started_on = models.DateTimeField(null=True, blank=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+    # Touched while running, to tell if its worker is gone
+    heartbeat_on = models.DateTimeField(null=True, blank=True)
+    # Not run before then, when it is to be tried again after failing
+    run_after = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.election_season}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_on'],
+                         name='job_status_created_on'),
+        ]
@@ -0,0 +1,340 @@
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Prefetch
+
+from .models import Ballot, OfferedPosition, RunningCandidate
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, \
+    PageBreak
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.enums import TA_CENTER
+
+# Paragraph styles of the receipt, built once per process
+_sample_styles = getSampleStyleSheet()
+HEADING_STYLE = ParagraphStyle('ReceiptHeading',
+                               parent=_sample_styles['Heading2'],
+                               alignment=TA_CENTER)
+POSITION_HEADING_STYLE = ParagraphStyle('ReceiptPositionHeading',
+                                        parent=_sample_styles['Heading3'],
+                                        fontSize=10)
+NORMAL_STYLE = _sample_styles['Normal']
+NORMAL_CENTER_STYLE = ParagraphStyle('ReceiptNormalCenter',
+                                     parent=NORMAL_STYLE,
+                                     alignment=TA_CENTER)
+HELPER_TEXT_STYLE = ParagraphStyle('ReceiptHelperText',
+                                   parent=_sample_styles['Italic'],
+                                   fontSize=6)
+
+PAGE_SIZE = (269, 600)
+
+
+def get_offered_positions(election_season_id):
+    """
+    Returns the offered positions of an election season,
+    in the order they are shown in a receipt.
+    """
+    return (OfferedPosition.objects
+            .filter(election_season=election_season_id)
+            .select_related('government_position',
+                            'government_position__college')
+            .order_by('id'))
+
+
+def get_ballots(ballot_ids):
+    """
+    Returns the ballots having the ids along with everything
+    shown in their receipts, in two queries.
+    """
+    return (Ballot.objects
+            .filter(pk__in=ballot_ids)
+            .select_related('voter', 'election_season')
+            .prefetch_related(Prefetch(
+                'voted_candidates',
+                queryset=(RunningCandidate.objects
+                          .select_related('candidate')
+                          .order_by('ballot_number', 'id'))))
+            .order_by('id'))
+
+
+def get_receipt_data(ballot, offered_positions):
+    """
+    Extracts what is printed in the receipt of a ballot, structured like:
+    { id: int, academic_year: str, voter_name: str,
+      positions: [
+        { position: 'CENTRAL - President',
+          candidates: [ '#1 - First Last', ... ],
+          undervotes: int },
+        { ... next position }
+      ]
+    }
+    Only positions of CENTRAL SC or of the voter's college are included.
+    """
+    candidates_per_position = {}
+    for voted_candidate in ballot.voted_candidates.all():
+        candidates_per_position.setdefault(
+            voted_candidate.government_position_id, []).append(
+                str(voted_candidate))
+
+    positions = []
+    for offered_position in offered_positions:
+        government_position = offered_position.government_position
+
+        if not (government_position.college_id is None
+                or government_position.college_id == ballot.college_id):
+            continue
+
+        candidates = candidates_per_position.get(government_position.id, [])
+        positions.append({
+            'position': str(government_position),
+            'candidates': candidates,
+            'undervotes': max(offered_position.max_positions_to_fill
+                              - len(candidates), 0),
+        })
+
+    return {'id': ballot.id,
+            'academic_year': ballot.election_season.academic_year,
+            'voter_name': (f'{ballot.voter.first_name} '
+                           f'{ballot.voter.last_name}'),
+            'positions': positions}
+
+
+def get_receipt_flowables(receipt):
+    """
+    Returns the ReportLab flowables of a receipt.
+    """
+    flowables = []
+
+    # Header
+    flowables.append(Paragraph("PUP Student Council Elections",
+                               style=HEADING_STYLE))
+    flowables.append(Paragraph(f"Elections {receipt['academic_year']}",
+                               style=NORMAL_CENTER_STYLE))
+    flowables.append(Spacer(0, 12))
+    # Voter Information
+    flowables.append(Paragraph(f"Voter: {receipt['voter_name']}",
+                               style=NORMAL_STYLE))
+    flowables.append(Spacer(0, 9))
+    # Ballot Information
+    flowables.append(Paragraph(f"Ballot #: {receipt['id']}",
+                               style=NORMAL_STYLE))
+    flowables.append(Paragraph("We will use this to refer to your ballot "
+                               "in the system in case of problems.",
+                               style=HELPER_TEXT_STYLE))
+
+    for position in receipt['positions']:
+        # Output position header
+        flowables.append(Paragraph(position['position'],
+                                   style=POSITION_HEADING_STYLE))
+        # Output voted candidates
+        for candidate in position['candidates']:
+            flowables.append(Paragraph(candidate, style=NORMAL_STYLE))
+        # Output -undervoted- if user has undervoted
+        for i in range(position['undervotes']):
+            flowables.append(Paragraph("--undervoted--", style=NORMAL_STYLE))
+
+    return flowables
+
+
+def build_pdf(flowables, title="Student Ballot", output=None):
+    """
+    Builds a receipt-sized PDF document out of flowables. It is written
+    to output (a file) if given, otherwise returned.
+    """
+    buffer = io.BytesIO() if output is None else output
+    doc = SimpleDocTemplate(buffer,
+                            title=title,
+                            pagesize=PAGE_SIZE,
+                            leftMargin=10,
+                            rightMargin=10,
+                            topMargin=10,
+                            bottomMargin=10)
+    doc.build(flowables)
+    if output is None:
+        return buffer.getvalue()
+
+
+def render_receipt(receipt):
+    """
+    Renders the PDF of a receipt (from get_receipt_data()). Touches no
+    database, so that it can be run in worker processes.
+    """
+    return build_pdf(get_receipt_flowables(receipt))
+
+
+def render_ballot_receipt(ballot_id):
+    """
+    Renders the PDF receipt of a ballot in three queries.
+    Raises Ballot.DoesNotExist if there is no such ballot.
+    """
+    ballot = get_ballots([ballot_id]).get()
+    return render_receipt(get_receipt_data(
+        ballot, get_offered_positions(ballot.election_season_id)))
+
+
+def get_receipt_path(receipt):
+    """
+    Returns the path of the PDF of a receipt (from get_receipt_data())
+    under MEDIA_ROOT/receipts/, along with the digest of its contents.
+
+    Stored receipts are named after the ballot id and a digest of what is
+    printed in them, so a receipt is only rendered again if that changes
+    (e.g. a candidate's name is corrected).
+    """
+    digest = hashlib.sha256(
+        json.dumps(receipt, sort_keys=True).encode()).hexdigest()[:32]
+    return (Path(settings.MEDIA_ROOT) / 'receipts'
+            / f'{receipt["id"]}-{digest}.pdf'), digest
+
+
+def store_receipt(receipt):
+    """
+    Renders then stores the PDF of a receipt at its path, if it is not
+    stored yet. Touches no database, so that it can be run in any thread.
+    """
+    path, digest = get_receipt_path(receipt)
+
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so that a receipt being
+        # written by another request is never read half-written.
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(render_receipt(receipt))
+        os.replace(temp_path, path)
+
+        # Remove the receipts of the ballot's previous contents
+        for stale_path in path.parent.glob(f'{receipt["id"]}-*.pdf'):
+            if stale_path != path:
+                stale_path.unlink(missing_ok=True)
+
+    return path, digest
+
+
+def get_stored_receipt(ballot_id):
+    """
+    Returns the path of the stored PDF receipt of a ballot, along with the
+    digest of its contents. The receipt is stored first if it is not yet.
+    Raises Ballot.DoesNotExist if there is no such ballot.
+    """
+    ballot = get_ballots([ballot_id]).get()
+    return store_receipt(get_receipt_data(
+        ballot, get_offered_positions(ballot.election_season_id)))
+
+
+async def aget_ballot_receipt_data(ballot_id):
+    """
+    Asynchronous get_receipt_data() of a ballot, by its id.
+    Raises Ballot.DoesNotExist if there is no such ballot.
+    """
+    ballot = await get_ballots([ballot_id]).aget()
+    offered_positions = [
+        offered_position async for offered_position
+        in get_offered_positions(ballot.election_season_id)]
+    return get_receipt_data(ballot, offered_positions)
+
+
+_receipt_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def store_receipt_in_background(ballot_id):
+    """
+    Renders then stores the receipt of a ballot in a background thread.
+    """
+    def store_receipt():
+        close_old_connections()
+        try:
+            get_stored_receipt(ballot_id)
+        finally:
+            close_old_connections()
+
+    _receipt_executor.submit(store_receipt)
+
+
+def iter_season_receipts(election_season, chunk_size=500):
+    """
+    Yields the receipt data of every ballot of an election season,
+    loading the ballots in chunks.
+    """
+    offered_positions = get_offered_positions(election_season.id)
+    ballot_ids = list(Ballot.objects
+                      .filter(election_season=election_season)
+                      .order_by('id').values_list('id', flat=True))
+
+    for start in range(0, len(ballot_ids), chunk_size):
+        for ballot in get_ballots(ballot_ids[start:start + chunk_size]):
+            yield get_receipt_data(ballot, offered_positions)
+
+
+class ChunkedFlowables(list):
+    """
+    A list of flowables that is refilled from an iterator of lists of
+    flowables whenever it runs out. The document is built by taking
+    flowables off the front of its list until it is empty, so only a
+    chunk of them is ever held in memory.
+    """
+
+    def __init__(self, chunks):
+        super().__init__()
+        self.chunks = iter(chunks)
+
+    def __len__(self):
+        while not super().__len__():
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.extend(chunk)
+        return super().__len__()
+
+
+def iter_receipt_flowables(receipts, chunk_size=100):
+    """
+    Yields the flowables of the receipts, one receipt per page, in lists
+    of the flowables of chunk_size receipts.
+    """
+    chunk = []
+    for number, receipt in enumerate(receipts, start=1):
+        if number > 1:
+            chunk.append(PageBreak())
+        chunk += get_receipt_flowables(receipt)
+        if number % chunk_size == 0:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_receipts_pdf(receipts, output):
+    """
+    Writes the receipts in a single multi-page PDF, one receipt per page.
+    The receipts are laid out a chunk at a time (see ChunkedFlowables).
+    """
+    build_pdf(ChunkedFlowables(iter_receipt_flowables(receipts)),
+              title="Student Ballots", output=output)
+
+
+def export_receipts_zip(receipts, output, processes=None):
+    """
+    Writes the receipts as separate PDFs in a ZIP archive,
+    rendered in parallel by a pool of processes.
+    """
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=processes) as executor:
+        # Render in batches so that only a batch is held in memory
+        receipts = iter(receipts)
+        while True:
+            batch = [receipt for _, receipt in zip(range(500), receipts)]
+            if not batch:
+                break
+            for receipt, pdf in zip(batch,
+                                    executor.map(render_receipt, batch,
+                                                 chunksize=25)):
+                archive.writestr(f"ballot-{receipt['id']}.pdf", pdf)
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ElectionSeasonResults, ElectionSeasonWinningCandidate, \
+    OfferedPosition, RunningCandidate
+
+# Cache key of the summary of a season's materialized results
+RESULTS_CACHE_KEY = 'elections:results:{}'
+
+
+def build_results(election_season, votes=None):
+    """
+    Computes the results of an election season in three queries,
+    structured like the ff:
+    {
+      election_season: { id: int, academic_year: str, status: str },
+      positions: [
+        { position: 'CENTRAL - President',
+          total_votes: int,
+          candidates: [
+            { running_candidate_id: int, ballot_number: int,
+              name: str, votes: int, vote_percentage: float,
+              rank: int, is_winner: bool },
+            { ... next candidate, by most votes }
+          ],
+          winners: [ 'First Last', ... ]
+        },
+        { ... next position }
+      ]
+    }
+
+    The candidates' tallied votes are used, unless a dict of
+    { running_candidate_id: votes } is given (e.g. live counts).
+    """
+    candidates_per_position = {}
+    for running_candidate in (RunningCandidate.objects
+                              .filter(election_season=election_season)
+                              .select_related('candidate')
+                              .order_by('ballot_number', 'id')):
+        candidates_per_position.setdefault(
+            running_candidate.government_position_id, []).append(
+                running_candidate)
+
+    winners_per_position = {}
+    winning_candidate_ids = set()
+    for position_id, running_candidate_id, candidate_name in (
+            ElectionSeasonWinningCandidate.objects
+            .filter(election_season=election_season)
+            .values_list('running_candidate__government_position_id',
+                         'running_candidate_id', 'candidate_name')):
+        winners_per_position.setdefault(position_id, []).append(
+            candidate_name)
+        winning_candidate_ids.add(running_candidate_id)
+
+    positions = []
+    for offered_position in (OfferedPosition.objects
+                             .filter(election_season=election_season)
+                             .select_related('government_position',
+                                             'government_position__college')
+                             .order_by('id')):
+        government_position = offered_position.government_position
+        running_candidates = candidates_per_position.get(
+            government_position.id, [])
+
+        candidates = [
+            {'running_candidate_id': running_candidate.id,
+             'ballot_number': running_candidate.ballot_number,
+             'name': (f'{running_candidate.candidate.first_name} '
+                      f'{running_candidate.candidate.last_name}'),
+             'votes': (running_candidate.tallied_votes if votes is None
+                       else votes.get(running_candidate.id, 0)),
+             'is_winner': running_candidate.id in winning_candidate_ids}
+            for running_candidate in running_candidates]
+        # Rank the candidates by most votes (stable, by ballot number)
+        candidates.sort(key=lambda candidate: -candidate['votes'])
+
+        total = sum(candidate['votes'] for candidate in candidates)
+        for rank, candidate in enumerate(candidates, start=1):
+            candidate['rank'] = rank
+            candidate['vote_percentage'] \
+                = candidate['votes'] / total * 100 if total else 0.0
+
+        positions.append({
+            'position': str(government_position),
+            'total_votes': total,
+            'candidates': candidates,
+            'winners': winners_per_position.get(government_position.id, []),
+        })
+
+    return {
+        'election_season': {'id': election_season.id,
+                            'academic_year': election_season.academic_year,
+                            'status': election_season.status},
+        'positions': positions,
+    }
+
+
+def materialize_results(election_season):
+    """
+    Builds then stores the results of an election season,
+    replacing the previous ones.
+    """
+    results, _ = ElectionSeasonResults.objects.update_or_create(
+        election_season=election_season,
+        defaults={'summary': build_results(election_season),
+                  'generated_on': timezone.now()})
+    cache.delete(RESULTS_CACHE_KEY.format(election_season.id))
+    return results
+
+
+def get_results_summary(election_season_id):
+    """
+    Returns the materialized results of an election season as a tuple of
+    (summary, generated_on), or None if there are none yet.
+
+    They are cached for ELECTIONS_LOOKUP_CACHE_TIMEOUT, so processes not
+    sharing the cache see newly generated results that late.
+    """
+    cache_key = RESULTS_CACHE_KEY.format(election_season_id)
+    cached = cache.get(cache_key)
+    if cached is None:
+        results = (ElectionSeasonResults.objects
+                   .filter(election_season=election_season_id)
+                   .only('summary', 'generated_on').first())
+        if results is None:
+            return None
+        cached = (results.summary, results.generated_on)
+        cache.set(cache_key, cached, settings.ELECTIONS_LOOKUP_CACHE_TIMEOUT)
+    return cached
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .layout import invalidate_ballot_layouts
+from .lookups import invalidate_current_election_season, \
+    invalidate_voter_rolls
+from .models import College, GovernmentPosition, Candidate, ElectionSeason, \
+    EligibleVoter, OfferedPosition, RunningCandidate
+
+
+@receiver(post_save, sender=College)
+@receiver(post_save, sender=GovernmentPosition)
+@receiver(post_save, sender=Candidate)
+@receiver(post_save, sender=ElectionSeason)
+@receiver(post_save, sender=OfferedPosition)
+@receiver(post_save, sender=RunningCandidate)
+@receiver(post_delete, sender=College)
+@receiver(post_delete, sender=GovernmentPosition)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_delete, sender=ElectionSeason)
+@receiver(post_delete, sender=OfferedPosition)
+@receiver(post_delete, sender=RunningCandidate)
+def ballot_structure_changed(sender, **kwargs):
+    """
+    Drops the compiled ballot layouts whenever anything shown
+    in a ballot is changed.
+    """
+    invalidate_ballot_layouts()
+
+
+@receiver(post_save, sender=ElectionSeason)
+@receiver(post_delete, sender=ElectionSeason)
+def election_season_changed(sender, **kwargs):
+    """
+    Drops the cached current election season whenever a season is changed
+    (e.g. initiated or concluded).
+    """
+    invalidate_current_election_season()
+
+
+@receiver(post_save, sender=EligibleVoter)
+@receiver(post_delete, sender=EligibleVoter)
+def voter_roll_changed(sender, **kwargs):
+    """
+    Has the voter rolls reloaded whenever an eligible voter is changed
+    (e.g. moved to another college in the admin).
+    """
+    invalidate_voter_rolls()
@@ -0,0 +1,132 @@
+from django.db import connections
+
+from .models import Ballot
+from .tally import get_ballot_id_ranges
+
+from concurrent.futures import ProcessPoolExecutor
+import base64
+import functools
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import \
+    encode_dss_signature
+from cryptography.hazmat.primitives.serialization import load_der_public_key
+
+
+def serialize_ballot(election_season_id, voter_id, voted_candidate_ids):
+    """
+    Serializes the votes of a ballot into what its voter signs, like:
+    'ballot:<season id>:<voter id>:<voted candidate ids, ascending>'
+    e.g. 'ballot:1:42:3,7,12'. The voting page builds the very same string.
+    """
+    return (f'ballot:{election_season_id}:{voter_id}:'
+            f'{",".join(str(id) for id in sorted(voted_candidate_ids))}')
+
+
+@functools.lru_cache(maxsize=4096)
+def load_public_key(public_key):
+    """
+    Loads a P-256 public key from its base64 DER (SubjectPublicKeyInfo)
+    encoding, as exported by the voting page. Loaded keys are cached.
+    Raises ValueError if it is not such a key.
+    """
+    key = load_der_public_key(base64.b64decode(public_key, validate=True))
+    if not (isinstance(key, ec.EllipticCurvePublicKey)
+            and isinstance(key.curve, ec.SECP256R1)):
+        raise ValueError('Public key is not a P-256 key.')
+    return key
+
+
+def verify_ballot_signature(election_season_id, voter_id,
+                            voted_candidate_ids, signature, public_key):
+    """
+    Checks the ECDSA (P-256, SHA-256) signature of a ballot's votes.
+    Signatures are in base64, in the raw r || s form made by browsers.
+    Returns False if the signature or the public key is malformed.
+    """
+    try:
+        key = load_public_key(public_key)
+        raw_signature = base64.b64decode(signature, validate=True)
+        if len(raw_signature) != 64:
+            return False
+        key.verify(
+            encode_dss_signature(int.from_bytes(raw_signature[:32], 'big'),
+                                 int.from_bytes(raw_signature[32:], 'big')),
+            serialize_ballot(election_season_id, voter_id,
+                             voted_candidate_ids).encode(),
+            ec.ECDSA(hashes.SHA256()))
+    except (InvalidSignature, ValueError, TypeError):
+        return False
+    return True
+
+
+def find_tampered_ballots_in_range(election_season_id, first_ballot_id,
+                                   last_ballot_id):
+    """
+    Verifies the signed ballots of an election season whose ids are within
+    a range. Returns the number of signed ballots, and the ids of those
+    whose signature does not match their voted candidates.
+    """
+    ballots = (Ballot.objects
+               .filter(election_season=election_season_id,
+                       id__range=(first_ballot_id, last_ballot_id),
+                       signature__isnull=False)
+               .exclude(signature=''))
+
+    voted_candidates = {}
+    for ballot_id, running_candidate_id in (
+            Ballot.voted_candidates.through.objects
+            .filter(ballot__in=ballots)
+            .values_list('ballot_id', 'runningcandidate_id')
+            .iterator(chunk_size=10000)):
+        voted_candidates.setdefault(ballot_id, []).append(
+            running_candidate_id)
+
+    signed, tampered = 0, []
+    for ballot_id, voter_id, signature, public_key in (
+            ballots.values_list('id', 'voter_id', 'signature', 'public_key')
+            .iterator(chunk_size=10000)):
+        signed += 1
+        if not verify_ballot_signature(
+                election_season_id, voter_id,
+                voted_candidates.get(ballot_id, []), signature,
+                public_key or ''):
+            tampered.append(ballot_id)
+    return signed, tampered
+
+
+def flag_tampered_ballots(election_season, range_size=10000, processes=None):
+    """
+    Verifies every signed ballot of an election season, each range of
+    ballot ids verified by a pool of processes, then flags those whose
+    signature does not match their voted candidates as tampered.
+    Unsigned ballots (e.g. manually entered ones) are left as is.
+    Returns the number of signed ballots and the ids of the tampered ones.
+    """
+    id_ranges = get_ballot_id_ranges(election_season, range_size)
+
+    signed, tampered = 0, []
+    if len(id_ranges) > 1:
+        # Worker processes must open connections of their own
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(find_tampered_ballots_in_range,
+                                       election_season.id, first_id, last_id)
+                       for first_id, last_id in id_ranges]
+            for future in futures:
+                range_signed, range_tampered = future.result()
+                signed += range_signed
+                tampered += range_tampered
+    else:
+        for first_id, last_id in id_ranges:
+            signed, tampered = find_tampered_ballots_in_range(
+                election_season.id, first_id, last_id)
+
+    ballots = Ballot.objects.filter(election_season=election_season)
+    ballots.filter(is_tampered=True).exclude(pk__in=tampered) \
+        .update(is_tampered=False)
+    ballots.filter(pk__in=tampered).update(is_tampered=True)
+
+    return signed, tampered
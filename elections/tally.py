@@ -0,0 +1,234 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Max, Min, Sum
+
+from .models import Ballot, RunningCandidate, VoteCounter
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def count_votes(election_season):
+    """
+    Counts the votes garnered by each running candidate of an election
+    season, returned as a dict of { running_candidate_id: votes }.
+
+    Counting is done by the database through a single grouped query over
+    the ballots' voted candidates, so no ballot is loaded in memory
+    regardless of the turnout. Candidates without votes are not included,
+    nor are ballots flagged as tampered.
+    """
+    return dict(
+        Ballot.voted_candidates.through.objects
+        .filter(ballot__election_season=election_season,
+                ballot__is_tampered=False)
+        .order_by()
+        .values('runningcandidate_id')
+        .annotate(votes=Count('ballot_id'))
+        .values_list('runningcandidate_id', 'votes'))
+
+
+def create_vote_counters(election_season):
+    """
+    Creates the live vote counter shards of every running candidate
+    of an election season. Existing counters are left untouched.
+    """
+    VoteCounter.objects.bulk_create(
+        [VoteCounter(running_candidate_id=running_candidate_id, shard=shard)
+         for running_candidate_id
+         in (RunningCandidate.objects
+             .filter(election_season=election_season)
+             .values_list('id', flat=True))
+         for shard in range(settings.ELECTIONS_LIVE_TALLY_SHARDS)],
+        ignore_conflicts=True)
+
+
+def record_votes(ballot, voted_candidates):
+    """
+    Adds the votes of a newly casted ballot to the live vote counters.
+    Should be called in the same transaction that saves the ballot.
+    """
+    if not voted_candidates:
+        return
+
+    # Ballots are spread across the shards by their id
+    shard = ballot.id % settings.ELECTIONS_LIVE_TALLY_SHARDS
+    counters = VoteCounter.objects.filter(
+        running_candidate__in=voted_candidates, shard=shard)
+
+    with transaction.atomic():
+        if counters.update(votes=F('votes') + 1) == len(voted_candidates):
+            return
+        # Some counters are missing (e.g. candidate added after initiation),
+        # so undo the partial update, create the counters then retry.
+        transaction.set_rollback(True)
+
+    create_vote_counters(ballot.election_season_id)
+    counters.update(votes=F('votes') + 1)
+
+
+def count_live_votes(election_season):
+    """
+    Sums up the live vote counters of an election season, returned in the
+    same form as count_votes().
+    """
+    return dict(
+        VoteCounter.objects
+        .filter(running_candidate__election_season=election_season,
+                votes__gt=0)
+        .order_by()
+        .values('running_candidate_id')
+        .annotate(total=Sum('votes'))
+        .values_list('running_candidate_id', 'total'))
+
+
+def find_tally_mismatches(expected, actual):
+    """
+    Returns the ids of the candidates whose votes differ between two
+    { running_candidate_id: votes } tallies.
+    """
+    return sorted(running_candidate_id for running_candidate_id
+                  in expected.keys() | actual.keys()
+                  if expected.get(running_candidate_id, 0)
+                  != actual.get(running_candidate_id, 0))
+
+
+def get_ballot_id_ranges(election_season, range_size):
+    """
+    Splits the ids of the ballots of an election season into
+    (first_id, last_id) ranges spanning range_size ids each.
+    """
+    bounds = (Ballot.objects.filter(election_season=election_season)
+              .aggregate(first_id=Min('id'), last_id=Max('id')))
+    if bounds['first_id'] is None:
+        return []
+    return [(first_id, min(first_id + range_size - 1, bounds['last_id']))
+            for first_id in range(bounds['first_id'], bounds['last_id'] + 1,
+                                  range_size)]
+
+
+def count_votes_in_range(election_season_id, first_ballot_id,
+                         last_ballot_id):
+    """
+    Counts the votes of the ballots of an election season whose ids are
+    within a range, one voted candidate at a time, so as not to rely on
+    the grouped query of count_votes(). Ballots flagged as tampered are
+    left out. Returns the number of ballots counted and a
+    { running_candidate_id: votes } dict.
+    """
+    ballots = Ballot.objects.filter(
+        election_season=election_season_id,
+        id__range=(first_ballot_id, last_ballot_id),
+        is_tampered=False)
+    votes = Counter(
+        Ballot.voted_candidates.through.objects
+        .filter(ballot__in=ballots)
+        .values_list('runningcandidate_id', flat=True)
+        .iterator(chunk_size=10000))
+    return ballots.count(), dict(votes)
+
+
+def recount_votes(election_season, range_size=10000, processes=None,
+                  progress=None):
+    """
+    Recounts the votes of an election season from its ballots, each range
+    of ballot ids counted by a pool of processes. Returns the number of
+    ballots counted and a { running_candidate_id: votes } dict.
+
+    progress, if given, is called with the number of ranges counted so
+    far, the number of ranges, and the number of ballots counted so far.
+    """
+    id_ranges = get_ballot_id_ranges(election_season, range_size)
+
+    # Worker processes must open connections of their own
+    connections.close_all()
+
+    ballots, votes = 0, Counter()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(count_votes_in_range, election_season.id,
+                                   first_id, last_id)
+                   for first_id, last_id in id_ranges]
+        for counted, future in enumerate(as_completed(futures), start=1):
+            range_ballots, range_votes = future.result()
+            ballots += range_ballots
+            votes.update(range_votes)
+            if progress:
+                progress(counted, len(id_ranges), ballots)
+
+    return ballots, dict(votes)
+
+
+def find_winner_mismatches(winners_per_position, votes):
+    """
+    Returns the ids of the winners that were outvoted by a candidate of
+    the same position that did not win, given the running candidates of
+    each position as { position_id: [(running_candidate_id, is_winner)] }
+    and a { running_candidate_id: votes } tally. Ties are not mismatches.
+    """
+    mismatches = []
+    for candidates in winners_per_position.values():
+        losers_votes = [votes.get(running_candidate_id, 0)
+                        for running_candidate_id, is_winner in candidates
+                        if not is_winner]
+        most_losing_votes = max(losers_votes, default=0)
+        mismatches += [running_candidate_id
+                       for running_candidate_id, is_winner in candidates
+                       if is_winner
+                       and votes.get(running_candidate_id, 0)
+                       < most_losing_votes]
+    return sorted(mismatches)
+
+
+def audit_recount(election_season, votes):
+    """
+    Checks the stored tally and winners of a concluded election season
+    against a { running_candidate_id: votes } recount. Returns the problems
+    found, and notes worth telling, as two lists of messages.
+    """
+    running_candidates = {
+        running_candidate.id: running_candidate
+        for running_candidate in (RunningCandidate.objects
+                                  .filter(election_season=election_season)
+                                  .select_related('candidate'))}
+    winner_ids = set(election_season.electionseasonwinningcandidate_set
+                     .values_list('running_candidate_id', flat=True))
+    problems, notes = [], []
+
+    # Check that no winner was outvoted by a candidate that did not win
+    candidates_per_position = {}
+    for running_candidate in running_candidates.values():
+        candidates_per_position.setdefault(
+            running_candidate.government_position_id, []).append(
+                (running_candidate.id, running_candidate.id in winner_ids))
+    for running_candidate_id in find_winner_mismatches(
+            candidates_per_position, votes):
+        problems.append(f'{running_candidates[running_candidate_id]}: won '
+                        f'despite being outvoted in the recount.')
+
+    # Check the stored tally, except for the vote that used to be added
+    # to the winner of a tie upon tiebreaking (in older seasons)
+    most_losing_votes = {
+        position_id: max((votes.get(running_candidate_id, 0)
+                          for running_candidate_id, is_winner
+                          in candidates if not is_winner), default=0)
+        for position_id, candidates in candidates_per_position.items()}
+    for running_candidate_id in find_tally_mismatches(
+            {running_candidate.id: running_candidate.tallied_votes
+             for running_candidate in running_candidates.values()},
+            votes):
+        running_candidate = running_candidates.get(running_candidate_id)
+        recounted_votes = votes.get(running_candidate_id, 0)
+        if running_candidate is not None \
+                and running_candidate_id in winner_ids \
+                and running_candidate.tallied_votes == recounted_votes + 1 \
+                and recounted_votes == most_losing_votes[
+                    running_candidate.government_position_id]:
+            notes.append(f'{running_candidate}: won a tie of '
+                         f'{recounted_votes} votes.')
+        else:
+            problems.append(
+                f'{running_candidate or running_candidate_id}: '
+                f'stored {getattr(running_candidate, "tallied_votes", 0)} '
+                f'votes, recounted {recounted_votes}.')
+
+    return problems, notes
@@ -1,3 +1,1132 @@
-from django.test import TestCase
+from django.contrib.auth import models as auth_models
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from .admin import EligibleVoterModelAdmin
+from .ballots import AlreadyVotedError, ElectionClosedError, cast_ballot
+from .conclusion import conclude_election_season
+from .exports import AUDIT_BALLOT_COLUMNS, BALLOT_COLUMNS, \
+    iter_ballot_rows
+from .forms import VotingForm
+from .imports import import_season_setup
+from .intake import REJECTION_REASONS, BallotQueue, \
+    commit_queued_ballots
+from .jobs import JOB_RETRY_DELAY, MAX_JOB_ATTEMPTS, claim_next_job, \
+    enqueue_job, run_job
+from .layout import get_ballot_layout, get_layout_version
+from .lookups import VOTED_SEASONS_SESSION_KEY, VoterBitmap, \
+    get_current_election_season, get_voter_roll, has_voted
+from .models import Ballot, Candidate, College, ElectionSeason, \
+    ElectionSeasonResults, ElectionSeasonWinningCandidate, EligibleVoter, \
+    GovernmentPosition, Job, RunningCandidate, VoteCounter
+from .receipts import export_receipts_pdf, iter_receipt_flowables, \
+    iter_season_receipts, render_ballot_receipt
+from .results import materialize_results
+from .signatures import flag_tampered_ballots, serialize_ballot, \
+    verify_ballot_signature
+from .tally import count_live_votes, count_votes, create_vote_counters, \
+    find_tally_mismatches
+from .turnout import get_turnout_aggregator
+from .winners import get_tiebreak_key, pick_winners
+
+from functools import partial
+from pathlib import Path
+from unittest import mock
+import base64
+import csv
+import datetime
+import gzip
+import io
+import re
+import tempfile
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import \
+    decode_dss_signature
+from cryptography.hazmat.primitives.serialization import Encoding, \
+    PublicFormat
+
+def sign_ballot(private_key, election_season_id, voter_id,
+                voted_candidate_ids):
+    """
+    Signs the votes of a ballot like the voting page does, returning the
+    base64 raw r || s signature.
+    """
+    r, s = decode_dss_signature(private_key.sign(
+        serialize_ballot(election_season_id, voter_id,
+                         voted_candidate_ids).encode(),
+        ec.ECDSA(hashes.SHA256())))
+    return base64.b64encode(r.to_bytes(32, 'big')
+                            + s.to_bytes(32, 'big')).decode()
+
+
+def export_public_key(private_key):
+    return base64.b64encode(private_key.public_key().public_bytes(
+        Encoding.DER, PublicFormat.SubjectPublicKeyInfo)).decode()
+
+
+class ElectionTestCase(TestCase):
+    """
+    Base of the tests run against the sample data, with its election
+    season initiated.
+    """
+    fixtures = ['sampledata']
+
+    def setUp(self):
+        cache.clear()
+        # Lookups kept by this process are of the data of other tests
+        for lookups in ('elections.lookups._voter_bitmaps',
+                        'elections.lookups._voter_rolls',
+                        'elections.turnout._turnout_aggregators'):
+            patcher = mock.patch.dict(lookups, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.election_season = ElectionSeason.objects.get(pk=1)
+        self.election_season.status = 'INITIATED'
+        self.election_season.save()
+        self.college = College.objects.get(pk=1)
+
+    def make_voters(self, count):
+        first = auth_models.User.objects.count()
+        return [auth_models.User.objects.create(username=f'voter{number}')
+                for number in range(first, first + count)]
+
+    def cast(self, voter, voted_candidate_ids, **kwargs):
+        return cast_ballot(self.election_season, self.college, voter,
+                           voted_candidate_ids, **kwargs)
+
+
+class CountVotesTests(ElectionTestCase):
+
+    def test_counts_votes_of_every_ballot(self):
+        voters = self.make_voters(3)
+        self.cast(voters[0], [9, 11, 1])
+        self.cast(voters[1], [9, 12])
+        self.cast(voters[2], [10])
+
+        self.assertEqual(count_votes(self.election_season),
+                         {9: 2, 10: 1, 11: 1, 12: 1, 1: 1})
+
+    def test_leaves_out_tampered_ballots(self):
+        voters = self.make_voters(2)
+        self.cast(voters[0], [9])
+        ballot = self.cast(voters[1], [10])
+        Ballot.objects.filter(pk=ballot.pk).update(is_tampered=True)
+
+        self.assertEqual(count_votes(self.election_season), {9: 1})
+
+    @override_settings(ELECTIONS_LIVE_TALLY=True,
+                       ELECTIONS_LIVE_TALLY_SHARDS=4)
+    def test_live_counters_match_the_count(self):
+        create_vote_counters(self.election_season)
+        for voter in self.make_voters(6):
+            self.cast(voter, [9, 11] if voter.pk % 2 else [10, 12, 2])
+
+        votes = count_votes(self.election_season)
+        self.assertEqual(count_live_votes(self.election_season), votes)
+        self.assertEqual(find_tally_mismatches(
+            votes, count_live_votes(self.election_season)), [])
+
+        # A counter off by one is told apart
+        counter = VoteCounter.objects.filter(running_candidate=9,
+                                             votes__gt=0).first()
+        counter.votes += 1
+        counter.save()
+        self.assertEqual(find_tally_mismatches(
+            votes, count_live_votes(self.election_season)), [9])
+
+
+class PickWinnersTests(SimpleTestCase):
+
+    def test_picks_most_votes(self):
+        self.assertEqual(pick_winners({1: 3, 2: 5, 3: 4}, 1, 'seed'),
+                         ([2], []))
+
+    def test_picks_every_seat_by_rank(self):
+        self.assertEqual(
+            pick_winners({1: 3, 2: 5, 3: 4, 4: 1, 5: 2}, 3, 'seed'),
+            ([2, 3, 1], []))
+
+    def test_fewer_candidates_than_seats(self):
+        self.assertEqual(pick_winners({1: 0, 2: 2}, 3, 'seed'),
+                         ([2, 1], []))
+
+    def test_breaks_ties_for_the_last_seat_by_seed(self):
+        votes = {1: 5, 2: 3, 3: 3, 4: 3}
+        winners, tied = pick_winners(votes, 2, 'seed')
+
+        self.assertEqual(tied, [2, 3, 4])
+        favored = min(tied, key=lambda running_candidate_id:
+                      get_tiebreak_key('seed', running_candidate_id))
+        self.assertEqual(winners, [1, favored])
+        # Anyone given the seed picks the same winners
+        self.assertEqual(pick_winners(votes, 2, 'seed'), (winners, tied))
+
+    def test_tie_within_the_seats_is_not_a_tie(self):
+        winners, tied = pick_winners({1: 3, 2: 3, 3: 1}, 2, 'seed')
+
+        self.assertEqual(sorted(winners), [1, 2])
+        self.assertEqual(tied, [])
+
+
+class CastBallotTests(ElectionTestCase):
+
+    def test_saves_ballot_and_votes(self):
+        voter, = self.make_voters(1)
+        ballot = self.cast(voter, [9, 11])
+
+        self.assertEqual(
+            sorted(ballot.voted_candidates.values_list('id', flat=True)),
+            [9, 11])
+
+    def test_second_ballot_raises_already_voted(self):
+        voter, = self.make_voters(1)
+        self.cast(voter, [9])
+
+        with self.assertRaises(AlreadyVotedError):
+            self.cast(voter, [10])
+        self.assertEqual(Ballot.objects.filter(voter=voter).count(), 1)
+        self.assertEqual(count_votes(self.election_season), {9: 1})
+
+    def test_concluded_season_raises_election_closed(self):
+        voter, = self.make_voters(1)
+        # Concluded while the voter still had it as the ongoing one
+        ElectionSeason.objects.filter(pk=self.election_season.pk).update(
+            status='CONCLUDED')
+
+        with self.assertRaises(ElectionClosedError):
+            self.cast(voter, [9])
+        self.assertFalse(Ballot.objects.exists())
+
+
+class SignatureTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.private_key = ec.generate_private_key(ec.SECP256R1())
+        self.public_key = export_public_key(self.private_key)
+
+    def test_verifies_signed_votes(self):
+        signature = sign_ballot(self.private_key, 1, 42, [11, 9])
+
+        self.assertTrue(verify_ballot_signature(1, 42, [9, 11], signature,
+                                                self.public_key))
+        self.assertFalse(verify_ballot_signature(1, 42, [9, 12], signature,
+                                                 self.public_key))
+        self.assertFalse(verify_ballot_signature(1, 43, [9, 11], signature,
+                                                 self.public_key))
+        self.assertFalse(verify_ballot_signature(
+            1, 42, [9, 11], signature,
+            export_public_key(ec.generate_private_key(ec.SECP256R1()))))
+
+    def test_malformed_signatures_do_not_verify(self):
+        self.assertFalse(verify_ballot_signature(1, 42, [9], 'not base64!',
+                                                 self.public_key))
+        self.assertFalse(verify_ballot_signature(
+            1, 42, [9], base64.b64encode(b'short').decode(),
+            self.public_key))
+        self.assertFalse(verify_ballot_signature(
+            1, 42, [9], sign_ballot(self.private_key, 1, 42, [9]), 'key'))
+
+    def test_flags_and_leaves_out_tampered_ballots(self):
+        voters = self.make_voters(3)
+        for voter in voters:
+            self.cast(voter, [9], public_key=self.public_key,
+                      signature=sign_ballot(self.private_key,
+                                            self.election_season.pk,
+                                            voter.pk, [9]))
+        # Unsigned ballots (e.g. manually entered) are not checked
+        self.cast(*self.make_voters(1), [10])
+        # A vote changed after the ballot was signed
+        tampered = Ballot.objects.get(voter=voters[1])
+        tampered.voted_candidates.set([10])
+
+        signed, tampered_ids = flag_tampered_ballots(self.election_season)
+
+        self.assertEqual((signed, tampered_ids), (3, [tampered.pk]))
+        self.assertEqual(
+            list(Ballot.objects.filter(is_tampered=True)
+                 .values_list('id', flat=True)), [tampered.pk])
+        self.assertEqual(count_votes(self.election_season), {9: 2, 10: 1})
+
+
+class ConclusionTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        voters = self.make_voters(3)
+        self.cast(voters[0], [9, 11, 1])
+        self.cast(voters[1], [9, 12, 1])
+        self.cast(voters[2], [10, 12, 2])
+
+    def test_concludes_with_tally_and_winners(self):
+        conclude_election_season(self.election_season)
+
+        self.election_season.refresh_from_db()
+        self.assertEqual(self.election_season.status, 'CONCLUDED')
+        self.assertIsNotNone(self.election_season.concluded_on)
+        self.assertEqual(
+            dict(RunningCandidate.objects.filter(tallied_votes__gt=0)
+                 .values_list('id', 'tallied_votes')),
+            {9: 2, 10: 1, 11: 1, 12: 2, 1: 2, 2: 1})
+        # One winner per offered position, even without votes
+        winner_ids = set(ElectionSeasonWinningCandidate.objects
+                         .filter(election_season=self.election_season)
+                         .values_list('running_candidate_id', flat=True))
+        self.assertEqual(len(winner_ids), 6)
+        self.assertLessEqual({9, 12, 1}, winner_ids)
+        self.assertIsNotNone(self.election_season.results)
+
+    def test_failed_save_leaves_nothing_behind(self):
+        with mock.patch('elections.conclusion.save_winners',
+                        side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            conclude_election_season(self.election_season)
+
+        # Left CONCLUDING, without its tally or winners
+        self.election_season.refresh_from_db()
+        self.assertEqual(self.election_season.status, 'CONCLUDING')
+        self.assertIsNone(self.election_season.concluded_on)
+        self.assertFalse(RunningCandidate.objects.filter(
+            tallied_votes__gt=0).exists())
+        self.assertFalse(ElectionSeasonWinningCandidate.objects.exists())
+
+        # Then concluded again
+        conclude_election_season(self.election_season)
+        self.election_season.refresh_from_db()
+        self.assertEqual(self.election_season.status, 'CONCLUDED')
+        self.assertEqual(ElectionSeasonWinningCandidate.objects.count(), 6)
+
+
+class BallotQueueTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue_path = Path(directory.name) / 'queue.sqlite3'
+        self.queue = BallotQueue(self.queue_path)
+        self.addCleanup(lambda: self.queue.connection.close())
+
+    def enqueue(self, voter, voted_candidate_ids):
+        return self.queue.enqueue(self.election_season, self.college, voter,
+                                  voted_candidate_ids)
+
+    def get_status(self, receipt_id):
+        return self.queue.get(receipt_id)['status']
+
+    def get_reason(self, receipt_id):
+        return self.queue.get(receipt_id)['reason']
+
+    def test_commits_queued_ballots(self):
+        voters = self.make_voters(2)
+        receipt_ids = [self.enqueue(voters[0], [9, 11]),
+                       self.enqueue(voters[1], [10])]
+
+        self.assertEqual(commit_queued_ballots(self.queue, 500), (2, 0))
+        self.assertEqual([self.get_status(receipt_id)
+                          for receipt_id in receipt_ids],
+                         ['COMMITTED', 'COMMITTED'])
+        self.assertEqual(count_votes(self.election_season),
+                         {9: 1, 10: 1, 11: 1})
+        # Nothing left to commit
+        self.assertEqual(commit_queued_ballots(self.queue, 500), (0, 0))
+
+    def test_second_queued_ballot_raises_already_voted(self):
+        voter, = self.make_voters(1)
+        self.enqueue(voter, [9])
+
+        with self.assertRaises(AlreadyVotedError):
+            self.enqueue(voter, [10])
+
+    def test_rejects_ballots_that_cannot_be_saved(self):
+        voters = self.make_voters(3)
+        saved = self.enqueue(voters[0], [9])
+        gone_candidate = self.enqueue(voters[1], [9, 999])
+        # Cast directly meanwhile
+        self.cast(voters[2], [10])
+        already_voted = self.enqueue(voters[2], [9])
+
+        self.assertEqual(commit_queued_ballots(self.queue, 500), (1, 2))
+        self.assertEqual(self.get_status(saved), 'COMMITTED')
+        self.assertEqual(self.get_status(gone_candidate), 'REJECTED')
+        self.assertEqual(self.get_reason(gone_candidate), 'BALLOT_CHANGED')
+        self.assertEqual(self.get_status(already_voted), 'REJECTED')
+        self.assertEqual(self.get_reason(already_voted), 'ALREADY_VOTED')
+        self.assertEqual(count_votes(self.election_season), {9: 1, 10: 1})
+
+    def test_rejects_ballots_of_concluded_seasons(self):
+        receipt_id = self.enqueue(*self.make_voters(1), [9])
+        ElectionSeason.objects.filter(pk=self.election_season.pk).update(
+            status='CONCLUDED')
+
+        self.assertEqual(commit_queued_ballots(self.queue, 500), (0, 1))
+        self.assertEqual(self.get_status(receipt_id), 'REJECTED')
+        self.assertEqual(self.get_reason(receipt_id), 'ELECTION_CLOSED')
+        self.assertFalse(Ballot.objects.exists())
+
+    def test_concluded_season_raises_election_closed(self):
+        voter, = self.make_voters(1)
+        # Concluded while the voter still had it as the ongoing one
+        ElectionSeason.objects.filter(pk=self.election_season.pk).update(
+            status='CONCLUDED')
+
+        with self.assertRaises(ElectionClosedError):
+            self.enqueue(voter, [9])
+        self.assertFalse(self.queue.has_ballot(self.election_season, voter))
+
+    def test_receipt_tells_why_a_ballot_was_rejected(self):
+        receipt_id = self.enqueue(*self.make_voters(1), [9])
+        ElectionSeason.objects.filter(pk=self.election_season.pk).update(
+            status='CONCLUDED')
+        commit_queued_ballots(self.queue, 500)
+
+        with override_settings(ELECTIONS_BALLOT_QUEUE=str(self.queue_path)), \
+                mock.patch('elections.intake._ballot_queue', self.queue):
+            response = self.client.get(
+                reverse('elections:queued_ballot_receipt',
+                        kwargs={'receipt_id': receipt_id}))
+
+        self.assertEqual([message.message for message
+                          in get_messages(response.wsgi_request)],
+                         [REJECTION_REASONS['ELECTION_CLOSED']])
+
+    def test_conclusion_saves_queued_ballots(self):
+        receipt_id = self.enqueue(*self.make_voters(1), [9])
+        ElectionSeason.objects.filter(pk=self.election_season.pk).update(
+            status='CONCLUDING')
+
+        # Left for the conclusion
+        self.assertEqual(commit_queued_ballots(self.queue, 500), (0, 0))
+        self.assertEqual(self.get_status(receipt_id), 'PENDING')
+
+        self.election_season.refresh_from_db()
+        with override_settings(ELECTIONS_BALLOT_QUEUE=str(self.queue_path)), \
+                mock.patch('elections.intake._ballot_queue', self.queue):
+            conclude_election_season(self.election_season)
+
+        self.assertEqual(self.get_status(receipt_id), 'COMMITTED')
+        self.assertEqual(RunningCandidate.objects.get(pk=9).tallied_votes, 1)
+
+
+class SeasonImportTests(ElectionTestCase):
+
+    def test_rejects_texts_longer_than_their_fields(self):
+        season_import = import_season_setup(self.election_season, {
+            'positions': [{'name': 'P' * 256, 'to_fill': 1}],
+            'candidates': [
+                {'student_number': '2099-00001-MN-0', 'college': 'CCIS',
+                 'first_name': 'First', 'last_name': 'Last',
+                 'contact': '0' * 256},
+                {'student_number': '2099-00002-MN-0', 'college': 'CCIS',
+                 'first_name': 'First', 'last_name': 'Last',
+                 'image': f'{"i" * 100}.png'},
+                {'student_number': '2099-00003-MN-00', 'college': 'CCIS',
+                 'first_name': 'First', 'last_name': 'Last'}],
+            'voters': [{'email': f'{"v" * 250}@example.com',
+                        'college': 'CCIS'}]})
+
+        self.assertEqual(
+            [(section, number, message.split(' is too long')[0])
+             for section, number, message in season_import.errors],
+            [('positions', 2, 'name'), ('candidates', 2, 'contact'),
+             ('candidates', 3, 'image'), ('candidates', 4, 'student_number'),
+             ('voters', 2, 'email')])
+        # Nothing is saved if any row has an error
+        self.assertEqual(GovernmentPosition.objects.count(), 7)
+        self.assertEqual(Candidate.objects.count(), 12)
+
+
+class KeysetChangeListTests(TestCase):
+    fixtures = ['sampledata']
+
+    def setUp(self):
+        self.client.force_login(auth_models.User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+        election_season = ElectionSeason.objects.get(pk=1)
+        college = College.objects.get(pk=1)
+        self.voter_ids = [
+            EligibleVoter.objects.create(
+                election_season=election_season, college=college,
+                email=f'voter{number}@example.com').pk
+            for number in range(5)]
+
+    def get_page(self, url):
+        with mock.patch.object(EligibleVoterModelAdmin, 'list_per_page', 2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def get_ids(self, changelist):
+        return [voter.pk for voter in changelist.result_list]
+
+    def test_pages_by_id(self):
+        changelist_url = reverse('admin:elections_eligiblevoter_changelist')
+        ids = self.voter_ids[::-1]
+
+        first_page = self.get_page(changelist_url)
+        self.assertEqual(self.get_ids(first_page), ids[:2])
+        self.assertIsNone(first_page.newer_url)
+        self.assertIsNone(first_page.full_result_count)
+
+        second_page = self.get_page(changelist_url + first_page.older_url)
+        self.assertEqual(self.get_ids(second_page), ids[2:4])
+
+        last_page = self.get_page(changelist_url + second_page.older_url)
+        self.assertEqual(self.get_ids(last_page), ids[4:])
+        self.assertIsNone(last_page.older_url)
+
+        # Back from the last page
+        self.assertEqual(
+            self.get_ids(self.get_page(changelist_url + last_page.newer_url)),
+            ids[2:4])
+        self.assertEqual(
+            self.get_ids(self.get_page(changelist_url
+                                       + second_page.newer_url)),
+            ids[:2])
+
+    def test_filters_start_over(self):
+        changelist_url = reverse('admin:elections_eligiblevoter_changelist')
+        first_page = self.get_page(changelist_url)
+        second_page = self.get_page(changelist_url + first_page.older_url)
+
+        self.assertNotIn('older_than',
+                         second_page.get_query_string({'college__id__exact':
+                                                       1}))
+
+
+class VoterRollTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.voter = EligibleVoter.objects.create(
+            election_season=self.election_season, college=self.college,
+            email='voter@example.com', student_number='2099-00001-MN-0')
+        self.voter_roll = get_voter_roll(self.election_season)
+        self.client.force_login(auth_models.User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+
+    def test_looks_up_by_email_or_student_number(self):
+        self.assertEqual(self.voter_roll.get_college_id(auth_models.User(
+            username='someone', email='Voter@Example.com')), 1)
+        self.assertEqual(self.voter_roll.get_college_id(auth_models.User(
+            username='2099-00001-MN-0')), 1)
+        self.assertIsNone(self.voter_roll.get_college_id(auth_models.User(
+            username='someone', email='someone@example.com')))
+        self.assertEqual(self.voter_roll.college_sizes, {1: 1})
+
+    def test_reloads_on_edits(self):
+        self.voter_roll.sync()
+        self.voter.college = College.objects.get(pk=2)
+        self.voter.save()
+
+        self.assertEqual(self.voter_roll.get_college_id(auth_models.User(
+            email='voter@example.com')), 2)
+        self.assertEqual(self.voter_roll.college_sizes, {2: 1})
+
+    def add_in_admin(self, **data):
+        return self.client.post(
+            reverse('admin:elections_eligiblevoter_add'),
+            {'election_season': self.election_season.pk,
+             'college': self.college.pk, 'student_number': '', **data})
+
+    def test_emails_added_in_the_admin_are_looked_up(self):
+        self.add_in_admin(email='V2@X.edu')
+
+        self.assertTrue(EligibleVoter.objects.filter(email='v2@x.edu')
+                        .exists())
+        self.assertEqual(self.voter_roll.get_college_id(auth_models.User(
+            email='V2@x.edu')), 1)
+
+    def test_student_numbers_are_unique_per_season(self):
+        response = self.add_in_admin(email='other@example.com',
+                                     student_number='2099-00001-MN-0')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(EligibleVoter.objects.filter(
+            email='other@example.com').exists())
+        # Unless it has none
+        self.add_in_admin(email='v2@example.com')
+        self.add_in_admin(email='v3@example.com')
+        self.assertEqual(EligibleVoter.objects.filter(
+            student_number__isnull=True).count(), 2)
+
+    @override_settings(ELECTIONS_VOTER_ROLL=True)
+    def test_voters_get_the_ballot_of_their_college(self):
+        self.voter.college = College.objects.get(pk=2)
+        self.voter.save()
+        self.client.force_login(auth_models.User.objects.create(
+            username='voter', email='Voter@example.com'))
+
+        response = self.client.get(reverse('elections:vote_step_second'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context['voting_form'].fields),
+            ['central_president', 'central_vicepresident',
+             'cssd_president', 'cssd_vicepresident'])
+
+    @override_settings(ELECTIONS_VOTER_ROLL=True)
+    def test_voters_not_on_the_roll_cannot_vote(self):
+        self.client.force_login(auth_models.User.objects.create(
+            username='someone', email='someone@example.com'))
+
+        response = self.client.get(reverse('elections:vote_step_second'))
+
+        self.assertRedirects(response, reverse('elections:index'))
+        self.assertEqual(
+            [message.message
+             for message in get_messages(response.wsgi_request)],
+            ['You are not on the voter roll of this election.'])
+
+
+class BallotLayoutTests(ElectionTestCase):
+
+    def test_lays_out_central_and_college_positions(self):
+        layout = get_ballot_layout(self.election_season.pk, self.college.pk)
+
+        self.assertEqual(
+            [(position['field_name'],
+              [candidate['id'] for candidate in position['candidates']])
+             for position in layout],
+            [('central_president', [9, 10]),
+             ('central_vicepresident', [11, 12]),
+             ('ccis_president', [1, 2]), ('ccis_vicepresident', [3, 4])])
+
+    def test_voting_form_is_built_without_queries(self):
+        get_ballot_layout(self.election_season.pk, self.college.pk)
+
+        with self.assertNumQueries(0):
+            voting_form = VotingForm(election_season=self.election_season,
+                                     college=self.college)
+        self.assertEqual(len(voting_form.fields), 4)
+
+    def test_changes_are_laid_out(self):
+        version = get_layout_version()
+        get_ballot_layout(self.election_season.pk, self.college.pk)
+
+        candidate = Candidate.objects.get(pk=9)
+        candidate.first_name = 'Renamed'
+        candidate.save()
+        running_candidate = RunningCandidate.objects.get(pk=10)
+        running_candidate.is_disqualified = True
+        running_candidate.save()
+
+        self.assertNotEqual(get_layout_version(), version)
+        central_president = get_ballot_layout(self.election_season.pk,
+                                              self.college.pk)[0]
+        self.assertEqual(
+            [candidate['name']
+             for candidate in central_president['candidates']],
+            [f'Renamed {candidate.last_name}'])
+
+
+class SeasonResultsTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        voters = self.make_voters(3)
+        self.cast(voters[0], [9, 11])
+        self.cast(voters[1], [9, 12])
+        self.cast(voters[2], [10, 12])
+        conclude_election_season(self.election_season)
+        self.results_url = reverse('elections:season_results',
+                                   kwargs={'id': self.election_season.pk})
+
+    def test_serves_the_materialized_results(self):
+        response = self.client.get(self.results_url)
+
+        self.assertEqual(response.status_code, 200)
+        central_president = response.json()['positions'][0]
+        self.assertEqual(central_president['position'], 'CENTRAL - President')
+        self.assertEqual(central_president['total_votes'], 3)
+        self.assertEqual(
+            [(candidate['running_candidate_id'], candidate['votes'],
+              candidate['rank'], candidate['is_winner'])
+             for candidate in central_president['candidates']],
+            [(9, 2, 1, True), (10, 1, 2, False)])
+
+    def test_unchanged_results_are_not_sent_again(self):
+        last_modified = self.client.get(self.results_url)['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.results_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_regenerated_results_are_served(self):
+        self.client.get(self.results_url)
+        RunningCandidate.objects.filter(pk=10).update(tallied_votes=5)
+        materialize_results(self.election_season)
+
+        central_president = self.client.get(
+            self.results_url).json()['positions'][0]
+        self.assertEqual(central_president['candidates'][0]['votes'], 5)
+
+    def test_no_results_yet(self):
+        ElectionSeasonResults.objects.all().delete()
+        cache.clear()
+
+        self.assertEqual(self.client.get(self.results_url).status_code, 404)
+
+
+def count_pdf_pages(pdf):
+    return len(re.findall(rb'/Type /Page\b', pdf))
+
+
+class ReceiptTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ballots = [self.cast(voter, [9, 1])
+                        for voter in self.make_voters(5)]
+
+    def test_loads_receipts_in_a_few_queries_per_chunk(self):
+        # The ballot ids, the offered positions, then two per chunk
+        with self.assertNumQueries(2 + 3 * 2):
+            receipts = list(iter_season_receipts(self.election_season,
+                                                 chunk_size=2))
+
+        self.assertEqual([receipt['id'] for receipt in receipts],
+                         [ballot.id for ballot in self.ballots])
+        self.assertEqual(
+            [(position['position'], position['candidates'],
+              position['undervotes'])
+             for position in receipts[0]['positions']],
+            [('CENTRAL - President', ['#1 - Zaina Bolton'], 0),
+             ('CENTRAL - Vice President', [], 1),
+             ('CCIS - President', ['#1 - Cian Fry'], 0),
+             ('CCIS - Vice President', [], 1)])
+
+    def test_exports_a_page_per_receipt(self):
+        receipts = list(iter_season_receipts(self.election_season))
+        output = io.BytesIO()
+        with mock.patch('elections.receipts.iter_receipt_flowables',
+                        partial(iter_receipt_flowables, chunk_size=2)):
+            export_receipts_pdf(receipts, output)
+
+        self.assertEqual(count_pdf_pages(output.getvalue()), 5)
+        self.assertEqual(
+            count_pdf_pages(render_ballot_receipt(self.ballots[0].id)), 1)
+
+
+class StoredReceiptTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.receipts_path = Path(media_root.name) / 'receipts'
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.ballot = self.cast(*self.make_voters(1), [9])
+        self.receipt_url = reverse('elections:ballot_pdf_receipt',
+                                   kwargs={'id': self.ballot.id})
+
+    def get_receipt(self, **headers):
+        response = self.client.get(self.receipt_url, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_stores_then_serves_the_receipt(self):
+        response = self.get_receipt()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            count_pdf_pages(b''.join(response.streaming_content)), 1)
+        # Named after the ballot and the digest its ETag is made of
+        digest = response['ETag'][1:-1]
+        self.assertEqual(
+            [path.name for path in self.receipts_path.iterdir()],
+            [f'{self.ballot.id}-{digest}.pdf'])
+
+    def test_unchanged_receipt_is_not_sent_again(self):
+        etag = self.get_receipt()['ETag']
+
+        self.assertEqual(self.get_receipt(HTTP_IF_NONE_MATCH=etag)
+                         .status_code, 304)
+
+    def test_changed_receipt_is_stored_anew(self):
+        etag = self.get_receipt()['ETag']
+        candidate = Candidate.objects.get(pk=9)
+        candidate.last_name = 'Renamed'
+        candidate.save()
+
+        response = self.get_receipt(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # The receipt of its previous contents is removed
+        self.assertEqual(len(list(self.receipts_path.iterdir())), 1)
+
+    def test_no_such_ballot(self):
+        self.assertEqual(self.client.get(
+            reverse('elections:ballot_pdf_receipt', kwargs={'id': 999}))
+            .status_code, 404)
+
+
+class VotingAccessTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.voter, = self.make_voters(1)
+        self.step_first_url = reverse('elections:vote_step_first')
+
+    def get_messages(self, response):
+        return [message.message
+                for message in get_messages(response.wsgi_request)]
+
+    def test_voter_must_log_in(self):
+        response = self.client.get(self.step_first_url)
+
+        self.assertRedirects(response, reverse('elections:index'))
+        self.assertEqual(self.get_messages(response), [
+            'Login first to your Microsoft Webmail account prior to voting.'])
+
+    def test_voter_not_yet_voted(self):
+        self.client.force_login(self.voter)
+
+        self.assertEqual(self.client.get(self.step_first_url).status_code,
+                         200)
+
+    def test_no_ongoing_election(self):
+        self.client.force_login(self.voter)
+        self.client.get(self.step_first_url)
+        # Concluding a season drops the cached current season
+        self.election_season.status = 'CONCLUDED'
+        self.election_season.save()
+
+        response = self.client.get(self.step_first_url)
+        self.assertRedirects(response, reverse('elections:index'))
+        self.assertEqual(self.get_messages(response), [
+            'You are trying to vote when there is no ongoing election.'])
+
+    def test_voter_already_voted(self):
+        self.client.force_login(self.voter)
+        self.cast(self.voter, [9])
+
+        response = self.client.get(self.step_first_url)
+        self.assertRedirects(response, reverse('elections:index'))
+        self.assertEqual(self.get_messages(response), [
+            'You have already voted for this election.'])
+        # Then known from the session alone
+        self.assertEqual(self.client.session[VOTED_SEASONS_SESSION_KEY],
+                         [self.election_season.pk])
+
+    def test_current_election_season_is_cached(self):
+        self.assertEqual(get_current_election_season(), self.election_season)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_current_election_season(),
+                             self.election_season)
+
+
+class VoterBitmapTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.voters = self.make_voters(2)
+        self.cast(self.voters[0], [9])
+
+    def make_request(self, voter):
+        request = RequestFactory().get('/')
+        request.user = voter
+        request.session = {}
+        return request
+
+    def test_holds_the_voters_of_the_season(self):
+        voter_bitmap = VoterBitmap(self.election_season.pk)
+
+        self.assertIn(self.voters[0].pk, voter_bitmap)
+        self.assertNotIn(self.voters[1].pk, voter_bitmap)
+        voter_bitmap.add(100000)
+        self.assertIn(100000, voter_bitmap)
+        self.assertNotIn(100001, voter_bitmap)
+
+    def test_rules_out_voters_who_have_not_voted_without_queries(self):
+        self.assertTrue(has_voted(self.make_request(self.voters[0]),
+                                  self.election_season))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(has_voted(self.make_request(self.voters[1]),
+                                       self.election_season))
+
+    def test_ballots_cast_meanwhile_are_synced(self):
+        request = self.make_request(self.voters[1])
+        self.assertFalse(has_voted(request, self.election_season))
+
+        # Cast by another process
+        self.cast(self.voters[1], [10])
+        self.assertFalse(has_voted(request, self.election_season))
+        with override_settings(ELECTIONS_LOOKUP_CACHE_TIMEOUT=0):
+            self.assertTrue(has_voted(request, self.election_season))
+        self.assertEqual(request.session[VOTED_SEASONS_SESSION_KEY],
+                         [self.election_season.pk])
+
+
+class CandidateManifestTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(*self.make_voters(1))
+
+    def get_manifest(self, election_season_id=1, college_id=1,
+                     version=None):
+        return self.client.get(reverse(
+            'elections:candidate_manifest',
+            kwargs={'election_season_id': election_season_id,
+                    'college_id': college_id,
+                    'version': version or get_layout_version()}))
+
+    def test_lists_the_candidates_of_the_voters_ballot(self):
+        response = self.get_manifest()
+
+        self.assertEqual(response.status_code, 200)
+        manifest = response.json()
+        self.assertEqual(manifest['version'], get_layout_version())
+        self.assertEqual(sorted(map(int, manifest['candidates'])),
+                         [1, 2, 3, 4, 9, 10, 11, 12])
+        self.assertEqual(manifest['candidates']['9'],
+                         {'position': 'Central - President',
+                          'ballot_number': 1, 'name': 'Zaina Bolton'})
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_outdated_version_is_not_cached(self):
+        response = self.get_manifest(version=1)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_only_ballots_of_the_ongoing_election(self):
+        self.assertEqual(self.get_manifest(college_id=999).status_code, 404)
+        self.assertEqual(self.get_manifest(election_season_id=2)
+                         .status_code, 404)
+
+        self.election_season.status = 'CONCLUDED'
+        self.election_season.save()
+        self.assertEqual(self.get_manifest().status_code, 404)
+
+    def test_voter_must_log_in(self):
+        self.client.logout()
+
+        self.assertRedirects(self.get_manifest(), reverse('elections:index'))
+
+
+class JobTests(ElectionTestCase):
+
+    def run_next_job(self):
+        job = claim_next_job(stale_after=60)
+        return job and run_job(job)
+
+    def test_runs_jobs_once_by_age(self):
+        conclude = enqueue_job(self.election_season, 'CONCLUDE')
+        recount = enqueue_job(self.election_season, 'RECOUNT')
+        # Already requested
+        self.assertEqual(enqueue_job(self.election_season, 'CONCLUDE'),
+                         conclude)
+
+        self.assertEqual(claim_next_job(stale_after=60), conclude)
+        self.assertEqual(claim_next_job(stale_after=60), recount)
+        self.assertIsNone(claim_next_job(stale_after=60))
+
+    def test_concludes_in_the_background(self):
+        enqueue_job(self.election_season, 'CONCLUDE')
+        job = self.run_next_job()
+
+        self.assertEqual((job.status, job.progress, job.attempts),
+                         ('SUCCEEDED', 100, 1))
+        self.election_season.refresh_from_db()
+        self.assertEqual(self.election_season.status, 'CONCLUDED')
+
+    def test_failed_job_is_tried_again_later(self):
+        job = enqueue_job(self.election_season, 'RESULTS')
+
+        with mock.patch.dict('elections.jobs.JOB_RUNNERS',
+                             {'RESULTS': mock.Mock(side_effect=OSError)}), \
+                self.assertLogs('elections.jobs', 'ERROR'):
+            for attempt in range(1, MAX_JOB_ATTEMPTS):
+                job = self.run_next_job()
+                self.assertEqual((job.status, job.attempts),
+                                 ('PENDING', attempt))
+                # Not before its delay, doubled each attempt
+                self.assertEqual(
+                    job.run_after - job.finished_on,
+                    datetime.timedelta(seconds=JOB_RETRY_DELAY
+                                       * 2 ** (attempt - 1)))
+                self.assertIsNone(claim_next_job(stale_after=60))
+                Job.objects.filter(pk=job.pk).update(
+                    run_after=timezone.now())
+
+            job = self.run_next_job()
+        self.assertEqual((job.status, job.attempts),
+                         ('FAILED', MAX_JOB_ATTEMPTS))
+        self.assertIn('OSError', job.result)
+
+    def test_job_that_cannot_be_done_is_not_tried_again(self):
+        # Results are of concluded seasons only
+        enqueue_job(self.election_season, 'RESULTS')
+        job = self.run_next_job()
+
+        self.assertEqual((job.status, job.attempts), ('FAILED', 1))
+        self.assertIsNone(job.run_after)
+
+    def test_job_of_a_gone_worker_is_taken_over(self):
+        job = enqueue_job(self.election_season, 'RECOUNT')
+        claim_next_job(stale_after=60)
+        self.assertIsNone(claim_next_job(stale_after=60))
+
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_on=timezone.now() - datetime.timedelta(minutes=2))
+        self.assertEqual(claim_next_job(stale_after=60).attempts, 2)
+
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_on=timezone.now() - datetime.timedelta(minutes=2),
+            attempts=MAX_JOB_ATTEMPTS)
+        self.assertIsNone(claim_next_job(stale_after=60))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'FAILED')
+
+
+class ExportTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.voters = self.make_voters(3)
+        self.ballots = [self.cast(self.voters[0], [11, 9]),
+                        self.cast(self.voters[1], [10]),
+                        self.cast(self.voters[2], [])]
+
+    def conclude(self):
+        conclude_election_season(self.election_season)
+
+    def test_exports_ballots_a_chunk_at_a_time(self):
+        rows = list(iter_ballot_rows(self.election_season, chunk_size=2))
+
+        self.assertEqual(
+            [(ballot_id, college, voted_candidate_ids)
+             for ballot_id, _, college, _, voted_candidate_ids, _, _
+             in rows],
+            [(self.ballots[0].id, 'CCIS', '9 11'),
+             (self.ballots[1].id, 'CCIS', '10'),
+             (self.ballots[2].id, 'CCIS', '')])
+
+    def test_only_audits_tell_the_voters(self):
+        rows = list(iter_ballot_rows(self.election_season))
+        audit_rows = list(iter_ballot_rows(self.election_season, audit=True))
+
+        self.assertTrue(all(len(row) == len(BALLOT_COLUMNS)
+                            for row in rows))
+        self.assertEqual([row[:-1] for row in audit_rows], rows)
+        self.assertEqual([row[-1] for row in audit_rows],
+                         [voter.pk for voter in self.voters])
+
+    def test_command_writes_the_audit_export(self):
+        self.conclude()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'ballots.csv.gz'
+
+        call_command('export_ballots', self.election_season.pk, str(path),
+                     '--gzip', '--audit', stdout=io.StringIO())
+
+        rows = list(csv.reader(io.StringIO(
+            gzip.decompress(path.read_bytes()).decode())))
+        self.assertEqual(tuple(rows[0]), AUDIT_BALLOT_COLUMNS)
+        self.assertEqual([row[-1] for row in rows[1:]],
+                         [str(voter.pk) for voter in self.voters])
+
+    def test_command_exports_concluded_seasons_only(self):
+        with self.assertRaisesMessage(CommandError, 'is not concluded yet'):
+            call_command('export_ballots', self.election_season.pk, '-')
+
+    def test_admin_downloads_ballots_without_voters(self):
+        self.conclude()
+        self.client.force_login(auth_models.User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+
+        response = self.client.get(
+            reverse('admin:elections_electionseason_changelist')
+            + f'{self.election_season.pk}/export/ballots/')
+
+        rows = list(csv.reader(io.StringIO(
+            b''.join(response.streaming_content).decode())))
+        self.assertEqual(tuple(rows[0]), BALLOT_COLUMNS)
+        self.assertEqual(len(rows), 4)
+
+
+class TurnoutTests(ElectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.voters = self.make_voters(3)
+        self.cast(self.voters[0], [9])
+        self.turnout_aggregator = get_turnout_aggregator(
+            self.election_season.pk)
+        self.turnout_url = reverse('elections:season_turnout',
+                                   kwargs={'id': self.election_season.pk})
+
+    def get_colleges(self):
+        return [(college['college'], college['voted'], college['eligible'],
+                 college['percentage'])
+                for college in self.turnout_aggregator.snapshot()['colleges']]
+
+    def test_counts_new_ballots_every_interval(self):
+        self.turnout_aggregator.sync()
+        version = self.turnout_aggregator.version
+        self.assertEqual(self.get_colleges(),
+                         [('CCIS', 1, None, None), ('CSSD', 0, None, None)])
+
+        self.cast(self.voters[1], [10])
+        # Not read until the interval has passed
+        self.turnout_aggregator.sync()
+        self.assertEqual(self.turnout_aggregator.total_ballots, 1)
+        with override_settings(ELECTIONS_TURNOUT_REFRESH_INTERVAL=0):
+            self.turnout_aggregator.sync()
+            self.assertEqual(self.turnout_aggregator.total_ballots, 2)
+            self.assertEqual(self.turnout_aggregator.version, version + 1)
+            # Nothing new, same version
+            self.turnout_aggregator.sync()
+            self.assertEqual(self.turnout_aggregator.version, version + 1)
+
+        self.assertEqual(
+            sum(minute['ballots'] for minute
+                in self.turnout_aggregator.snapshot()['ballots_per_minute']),
+            2)
+
+    def test_turnout_of_the_voter_roll(self):
+        EligibleVoter.objects.bulk_create(
+            EligibleVoter(election_season=self.election_season,
+                          college_id=college_id,
+                          email=f'voter{number}@example.com')
+            for number, college_id in enumerate([1, 1, 1, 1, 2]))
+        self.turnout_aggregator.sync()
+
+        self.assertEqual(self.get_colleges(),
+                         [('CCIS', 1, 4, 25.0), ('CSSD', 0, 1, 0.0)])
+        self.assertEqual(self.turnout_aggregator.snapshot()['eligible_voters'],
+                         5)
+
+    def test_replies_once_there_is_a_new_version(self):
+        self.client.force_login(auth_models.User.objects.create_user(
+            'staff', is_staff=True))
+
+        turnout = self.client.get(self.turnout_url).json()
+        self.assertEqual(turnout['total_ballots'], 1)
+        # Nothing new, so it waits until its timeout
+        with mock.patch('elections.views.TURNOUT_POLL_TIMEOUT', 0):
+            self.assertEqual(
+                self.client.get(self.turnout_url,
+                                {'version': turnout['version']}).json(),
+                turnout)
+
+    def test_staff_only(self):
+        self.client.force_login(self.voters[0])
+
+        self.assertEqual(self.client.get(self.turnout_url).status_code, 403)
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+
+from .lookups import get_voter_roll
+from .models import Ballot, College, ElectionSeason
+
+from collections import Counter
+import datetime
+import threading
+import time
+
+
+class TurnoutAggregator:
+    """
+    Ballot counts of an election season per college and per minute, kept
+    in memory by this process and shared by all of its dashboard viewers.
+
+    New ballots are read by id at most every
+    ELECTIONS_TURNOUT_REFRESH_INTERVAL seconds, however many are watching.
+    version goes up each time new ballots are counted.
+    """
+
+    def __init__(self, election_season):
+        self.election_season = election_season
+        self.ballots_per_college = Counter()
+        # Ballots per minute they were casted on, in local time
+        self.ballots_per_minute = Counter()
+        self.total_ballots = 0
+        self.version = 0
+        self._colleges = {}
+        self._last_ballot_id = 0
+        self._synced_on = None
+        self._lock = threading.Lock()
+
+    def is_due(self):
+        return self._synced_on is None or (
+            time.monotonic() - self._synced_on
+            >= settings.ELECTIONS_TURNOUT_REFRESH_INTERVAL)
+
+    def sync(self):
+        """
+        Counts the ballots saved since the last sync, if it is time to.
+        """
+        if not self.is_due():
+            return
+
+        with self._lock:
+            # Another thread may have synced while this one waited
+            if not self.is_due():
+                return
+            self._synced_on = time.monotonic()
+
+            counted = 0
+            for ballot_id, college_id, casted_on in (
+                    Ballot.objects
+                    .filter(election_season=self.election_season,
+                            id__gt=self._last_ballot_id)
+                    .order_by('id')
+                    .values_list('id', 'college_id', 'casted_on')
+                    .iterator(chunk_size=10000)):
+                self.ballots_per_college[college_id] += 1
+                self.ballots_per_minute[timezone.localtime(casted_on)
+                                        .replace(second=0,
+                                                 microsecond=0)] += 1
+                self._last_ballot_id = ballot_id
+                counted += 1
+
+            if counted or not self._colleges:
+                self.total_ballots += counted
+                self._colleges = dict(College.objects.order_by('name')
+                                      .values_list('id', 'name'))
+                self.version += 1
+
+            get_voter_roll(self.election_season).sync()
+
+    def snapshot(self, minutes=60):
+        """
+        Returns the turnout of each college, and the ballots of each of the
+        last minutes, as a JSON-serializable dict.
+        """
+        college_sizes = get_voter_roll(self.election_season).college_sizes
+        colleges = []
+        for college_id, name in self._colleges.items():
+            voted = self.ballots_per_college[college_id]
+            eligible = college_sizes.get(college_id)
+            colleges.append({
+                'college': name,
+                'voted': voted,
+                'eligible': eligible,
+                'percentage': (round(voted / eligible * 100, 2)
+                               if eligible else None)})
+
+        now = timezone.localtime().replace(second=0, microsecond=0)
+        per_minute = []
+        for minute in range(minutes - 1, -1, -1):
+            on = now - datetime.timedelta(minutes=minute)
+            per_minute.append({'minute': on.strftime('%H:%M'),
+                               'ballots': self.ballots_per_minute[on]})
+
+        return {'version': self.version,
+                'election_season': str(self.election_season),
+                'total_ballots': self.total_ballots,
+                'eligible_voters': sum(college_sizes.values()) or None,
+                'colleges': colleges,
+                'ballots_per_minute': per_minute}
+
+
+# Turnout aggregators of this process, keyed by election season id
+_turnout_aggregators = {}
+_turnout_aggregators_lock = threading.Lock()
+
+
+def get_turnout_aggregator(election_season_id):
+    """
+    Returns the turnout aggregator of an election season, making it the
+    first time. Raises Http404 if there is no such season.
+    """
+    turnout_aggregator = _turnout_aggregators.get(election_season_id)
+    if turnout_aggregator is None:
+        try:
+            election_season = ElectionSeason.objects.get(
+                pk=election_season_id)
+        except ElectionSeason.DoesNotExist:
+            raise Http404('No such election season.')
+        with _turnout_aggregators_lock:
+            turnout_aggregator = _turnout_aggregators.setdefault(
+                election_season_id, TurnoutAggregator(election_season))
+    return turnout_aggregator
@@ -11,6 +11,15 @@ urlpatterns = [
     path('step-2/', views.vote_step_second, name='vote_step_second'),
     path('confirm-candidates/', views.confirm_selected_candidates,
          name='confirm_selected_candidates'),
+    path('candidates/<int:election_season_id>/<int:college_id>/'
+         '<int:version>/', views.candidate_manifest,
+         name='candidate_manifest'),
     path('ballot/<int:id>/', views.ballot_pdf_receipt,
          name='ballot_pdf_receipt'),
+    path('results/<int:id>/', views.season_results, name='season_results'),
+    path('turnout/<int:id>/', views.season_turnout, name='season_turnout'),
+    path('metrics/', views.request_metrics_export,
+         name='request_metrics_export'),
+    path('ballot/queued/<str:receipt_id>/', views.queued_ballot_receipt,
+         name='queued_ballot_receipt'),
 ]
@@ -1,68 +1,72 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from django.http import JsonResponse, FileResponse
-from django.utils import timezone
+from django.http import Http404, HttpResponse, JsonResponse, FileResponse
 from django.contrib import messages
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from .forms import VoteCollegeChoiceForm, VotingForm
-from .models import ElectionSeason, College, RunningCandidate, Ballot
+from asgiref.sync import sync_to_async
 
-import io
+from .ballots import AlreadyVotedError, ElectionClosedError, cast_ballot
+from .decorators import voter_login_required, ongoing_election_required, \
+    not_yet_voted_required, staff_required
+from .forms import VoteCollegeChoiceForm, VotingForm
+from .intake import REJECTION_REASONS, get_ballot_queue
+from .layout import get_candidate_manifest, get_layout_version
+from .lookups import get_current_election_season, get_voter_roll, \
+    has_voted, remember_voted_in_session
+from .metrics import request_metrics
+from .models import College, RunningCandidate, Ballot
+from .receipts import aget_ballot_receipt_data, store_receipt
+from .results import get_results_summary
+from .turnout import get_turnout_aggregator
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
+import asyncio
+import hashlib
 
-# TODO: Use view decorators for checking for current election season,
-#       and if voter has voted.
+# Seconds a turnout request waits for new ballots before replying anyway
+TURNOUT_POLL_TIMEOUT = 25
 
 
-def index(request):
+async def index(request):
     """
     Homepage of the application.
     """
     # Get initiated election season (will be set to None if there aren't)
     current_election_season \
-        = ElectionSeason.objects.filter(status="INITIATED").first()
+        = await sync_to_async(get_current_election_season)()
     # Flag if voter has already voted for this election season
     has_already_voted = False
-    if request.user.is_authenticated and current_election_season:
-        has_already_voted \
-            = Ballot.objects.filter(election_season=current_election_season,
-                              voter=request.user).first() != None
-    return render(request, 'elections/index.html',
-                  {'current_election_season': current_election_season,
-                   'has_already_voted': has_already_voted})
-
-
-def vote_step_first(request):
+    if current_election_season:
+        has_already_voted = await sync_to_async(
+            lambda: request.user.is_authenticated
+            and has_voted(request, current_election_season))()
+    # Voters on a roll skip choosing their college
+    vote_url = reverse('elections:vote_step_second'
+                       if settings.ELECTIONS_VOTER_ROLL
+                       else 'elections:vote_step_first')
+    return await sync_to_async(render)(
+        request, 'elections/index.html',
+        {'current_election_season': current_election_season,
+         'has_already_voted': has_already_voted,
+         'vote_url': vote_url})
+
+
+@voter_login_required
+@ongoing_election_required
+@not_yet_voted_required
+async def vote_step_first(request):
     """
     First step of the voting process. Displays and processes the
     voter's college.
     """
-
-    # Check if logged in
-    # TODO: Refactor to a decorator
-    if not request.user.is_authenticated:
-        messages.add_message(request, messages.WARNING,
-        'Login first to your Microsoft Webmail account prior to voting.')
-        return redirect(reverse('elections:index'))
-
-    # Check first if there is an existing election season
-    current_election_season \
-        = ElectionSeason.objects.filter(status='INITIATED').first()
-    if not current_election_season:
-        messages.add_message(request, messages.WARNING,
-            'You are trying to vote when there is no ongoing election.')
-        return redirect(reverse('elections:index'))
-
-    # Check if voter has already voted for this election season
-    if Ballot.objects.filter(election_season=current_election_season,
-        voter=request.user).first() != None:
-        messages.add_message(request, messages.WARNING,
-            'You have already voted for this election.')
-        return redirect(reverse('elections:index'))
+    # The voter roll gives the college instead
+    if settings.ELECTIONS_VOTER_ROLL:
+        return redirect(reverse('elections:vote_step_second'))
 
     # If method is GET, initialize form for voter to choose his/her college
     if request.method == 'GET':
@@ -72,67 +76,61 @@ def vote_step_first(request):
     else:
         college_choice_form = VoteCollegeChoiceForm(request.POST)
 
-        if college_choice_form.is_valid():
+        # Validating queries the chosen college
+        if await sync_to_async(college_choice_form.is_valid)():
             # Save choice to session
             request.session['choice_college_id'] \
                 = college_choice_form.cleaned_data['college_of_voter'].id
             # Redirect to step 2
             return redirect(reverse('elections:vote_step_second'))
 
-    return render(request, 'elections/vote_step_first.html',
-                  {'college_choice_form': college_choice_form})
+    return await sync_to_async(render)(
+        request, 'elections/vote_step_first.html',
+        {'college_choice_form': college_choice_form})
 
 
-def vote_step_second(request):
+@voter_login_required
+@ongoing_election_required
+@not_yet_voted_required
+async def vote_step_second(request):
     """
     Second step of the voting process. Displays and processes the
     voter's ballot.
     """
-    # TODO: Refactor to a decorator
-    if not request.user.is_authenticated:
-        messages.add_message(request, messages.WARNING,
-        'Login first to your Microsoft Webmail account prior to voting.')
-        return redirect(reverse('elections:index'))
-
-    # Check first if there is an existing election season
-    current_election_season \
-        = (ElectionSeason.objects
-           .prefetch_related("offeredposition_set",
-                             "offeredposition_set__government_position",
-                             "offeredposition_set__government_position__college",
-                             "runningcandidate_set",
-                             "runningcandidate_set__candidate",
-                             "runningcandidate_set__government_position")
-           .filter(status="INITIATED")).first()
-    if not current_election_season:
-        messages.add_message(request, messages.WARNING,
-            'You are trying to vote when there is no ongoing election.')
-        return redirect(reverse('elections:index'))
-
-    # Check if voter has already voted for this election season
-    if Ballot.objects.filter(election_season=current_election_season,
-        voter=request.user).first() != None:
-        messages.add_message(request, messages.WARNING,
-            'You have already voted for this election.')
-        return redirect(reverse('elections:index'))
+    current_election_season = request.current_election_season
+
+    # Look up the college of the voter in the voter roll
+    if settings.ELECTIONS_VOTER_ROLL:
+        college_id = await sync_to_async(
+            get_voter_roll(current_election_season).get_college_id)(
+                request.user)
+        if college_id is None:
+            messages.add_message(request, messages.WARNING,
+                'You are not on the voter roll of this election.')
+            return redirect(reverse('elections:index'))
 
     # Check if a college is already chosen by voter prior to proceeding
-    if 'choice_college_id' not in request.session:
+    # (the session is already loaded by voter_login_required)
+    elif 'choice_college_id' not in request.session:
         return redirect(reverse('elections:vote_step_first'))
 
     # Fetch chosen college of voter from step 1 stored in session
-    college = College.objects.get(pk=request.session['choice_college_id'])
+    else:
+        college_id = request.session['choice_college_id']
+
+    college = await College.objects.aget(pk=college_id)
 
     # If method is GET, initialize the voting form
     if request.method == 'GET':
-        voting_form = VotingForm(election_season=current_election_season,
-                                 college=college,
-                                 use_custom_candidate_field=True)
+        voting_form = await sync_to_async(VotingForm)(
+            election_season=current_election_season, college=college,
+            use_custom_candidate_field=True)
 
     # Otherwise, process the form submitted
     else:
-        voting_form = VotingForm(request.POST, college=college,
-                                 election_season=current_election_season)
+        voting_form = await sync_to_async(VotingForm)(
+            request.POST, college=college,
+            election_season=current_election_season, voter=request.user)
 
         if voting_form.is_valid():
             # Extract all voted candidates from form
@@ -140,121 +138,231 @@ def vote_step_second(request):
                                 in list(voting_form.cleaned_data.values())
                                 for voted_candidate in position_candidates]
 
-            # Construct then save the ballot object
-            ballot = Ballot(election_season=current_election_season,
-                            college=college,
-                            voter=request.user,
-                            casted_on=timezone.now())
-            ballot.save()
-            # Set the voted candidates of this ballot
-            # then trigger another save
-            ballot.voted_candidates.set(voted_candidates)
-            ballot.save()
-            # TODO: Validate signature with public key
-            return render(request, 'elections/vote_conclusion.html',
-                          {'ballot_id': ballot.id})
-
-    return render(request, 'elections/vote_step_second.html',
-                  {'voting_form': voting_form})
-
-
-def confirm_selected_candidates(request):
+            # Save the ballot, or queue it to be saved in the background
+            try:
+                if settings.ELECTIONS_BALLOT_QUEUE:
+                    context = {'receipt_id': await sync_to_async(
+                        get_ballot_queue().enqueue)(
+                            current_election_season, college, request.user,
+                            voted_candidates, voting_form.signature,
+                            voting_form.public_key)}
+                else:
+                    ballot = await sync_to_async(cast_ballot)(
+                        current_election_season, college, request.user,
+                        voted_candidates, voting_form.signature,
+                        voting_form.public_key)
+                    context = {'ballot_id': ballot.id}
+            except AlreadyVotedError:
+                remember_voted_in_session(request, current_election_season)
+                messages.add_message(request, messages.WARNING,
+                    'You have already voted for this election.')
+                return redirect(reverse('elections:index'))
+            except ElectionClosedError:
+                messages.add_message(request, messages.WARNING,
+                    'This election has already been concluded. '
+                    'Your ballot was not recorded.')
+                return redirect(reverse('elections:index'))
+            remember_voted_in_session(request, current_election_season)
+            return await sync_to_async(render)(
+                request, 'elections/vote_conclusion.html', context)
+
+    # The voter's browser shows its selected candidates from this manifest
+    candidate_manifest_url = reverse(
+        'elections:candidate_manifest',
+        kwargs={'election_season_id': current_election_season.id,
+                'college_id': college.id,
+                'version': await sync_to_async(get_layout_version)()})
+
+    return await sync_to_async(render)(
+        request, 'elections/vote_step_second.html',
+        {'voting_form': voting_form,
+         'election_season_id': current_election_season.id,
+         'candidate_manifest_url': candidate_manifest_url})
+
+
+async def confirm_selected_candidates(request):
+    """
+    Selected candidates grouped by position, for confirming a ballot.
+    The voting page builds this from its candidate manifest instead,
+    so this is only a fallback.
+    """
+    # Same candidates of the same ballot layout version, same response
     ids = request.GET.getlist('ids')
+    ids_digest = hashlib.sha256(
+        ','.join(sorted(ids)).encode()).hexdigest()[:16]
+    etag = f'{await sync_to_async(get_layout_version)()}-{ids_digest}'
+
+    response = get_conditional_response(request, etag=quote_etag(etag))
+    if response is None:
+        cache_key = f'elections:confirm_selected_candidates:{etag}'
+        candidates_per_position = await cache.aget(cache_key)
+
+        if candidates_per_position is None:
+            running_candidates = (
+                RunningCandidate.objects.filter(pk__in=ids)
+                .select_related('candidate', 'government_position',
+                                'government_position__college'))
+
+            candidates_per_position = {}
+
+            async for running_candidate in running_candidates:
+                position_college \
+                    = running_candidate.government_position.college
+
+                position_name = (
+                    (position_college.name if position_college
+                     else 'CENTRAL')
+                    + ' - '
+                    + running_candidate.government_position.name)
+
+                if position_name not in candidates_per_position:
+                    candidates_per_position[position_name] = []
+
+                candidates_per_position[position_name].append(
+                    f"#{running_candidate.ballot_number} - "
+                    f"{running_candidate.candidate.first_name} "
+                    f"{running_candidate.candidate.last_name}")
+
+            await cache.aset(cache_key, candidates_per_position, 300)
+
+        response = JsonResponse(candidates_per_position)
 
-    running_candidates = (RunningCandidate.objects.filter(pk__in=ids)
-                          .select_related('candidate',
-                                          'government_position',
-                                          'government_position__college'))
-
-    candidates_per_position = {}
-
-    for running_candidate in running_candidates:
-        position_college = running_candidate.government_position.college
-
-        position_name = (
-            (position_college.name if position_college else 'CENTRAL')
-            + ' - '
-            + running_candidate.government_position.name)
-
-        if position_name not in candidates_per_position:
-            candidates_per_position[position_name] = []
-
-        candidates_per_position[position_name].append(
-            f"#{running_candidate.ballot_number} - "
-            f"{running_candidate.candidate.first_name} "
-            f"{running_candidate.candidate.last_name}")
-
-    return JsonResponse(candidates_per_position)
-
-
-def ballot_pdf_receipt(request, id):
-    # Fetch the ballot
-    # TODO: Prefetch the needed related models
-    ballot = Ballot.objects.get(pk=id)
-    election_season = ballot.election_season
-
-    buffer = io.BytesIO()
-
-    styleSheet = getSampleStyleSheet()
-
-    flowables = []
-
-    # STYLES
-    headingStyle = styleSheet["Heading2"]
-    headingStyle.alignment = TA_CENTER
-    positionHeadingStyle = styleSheet["Heading3"]
-    positionHeadingStyle.fontSize = 10
-    normalCenterTextStyle = styleSheet["Normal"]
-    normalCenterTextStyle.alignment = TA_CENTER
-    helperTextStyle = styleSheet["Italic"]
-    helperTextStyle.fontSize = 6
-
-    # Header
-    flowables.append(Paragraph("PUP Student Council Elections",
-                               style=headingStyle))
-    flowables.append(Paragraph("Elections AY2022-2023",
-                               style=normalCenterTextStyle))
-    flowables.append(Spacer(0, 12))
-    # Voter Information
-    flowables.append(Paragraph(f"Voter: {ballot.voter.first_name} "
-                               f"{ballot.voter.last_name}"))
-    flowables.append(Spacer(0, 9))
-    # Ballot Information
-    flowables.append(Paragraph(f"Ballot #: {id}"))
-    flowables.append(Paragraph("We will use this to refer to your ballot "
-                               "in the system in case of problems.",
-                               style=helperTextStyle))
-    
-    for offeredpos in election_season.offeredposition_set.filter():
-        govtpos = offeredpos.government_position
-
-        if not (govtpos.college is None or govtpos.college == ballot.college):
-            continue
-
-        voted_candidates_for_pos = (ballot.voted_candidates
-                                    .filter(government_position=govtpos))
-
-        # Output position header
-        flowables.append(Paragraph(str(offeredpos.government_position),
-                                   style=positionHeadingStyle))
-        # Output voted candidates
-        for voted_candidate in voted_candidates_for_pos:
-            flowables.append(Paragraph(str(voted_candidate)))
-
-        # Output -undervoted- if user has undervoted
-        needed = offeredpos.max_positions_to_fill
-        voted = voted_candidates_for_pos.count()
-        for i in range(needed - voted):
-            flowables.append(Paragraph(f"--undervoted--"))
-
-    doc = SimpleDocTemplate(buffer,
-                            title="Student Ballot",
-                            pagesize=(269, 600),
-                            leftMargin=10,
-                            rightMargin=10,
-                            topMargin=10,
-                            bottomMargin=10)
-    doc.build(flowables)
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=False, filename="ballot.pdf")
+    response['ETag'] = quote_etag(etag)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@voter_login_required
+def candidate_manifest(request, election_season_id, college_id, version):
+    """
+    Candidate manifest of a voter's ballot in the ongoing election. Its URL
+    has the ballot layout version, so the voter's browser may cache it for
+    as long as it is current.
+    """
+    # Only ballots of the ongoing election are shown, as when voting
+    current_election_season = get_current_election_season()
+    if (current_election_season is None
+            or current_election_season.id != election_season_id
+            or not College.objects.filter(pk=college_id).exists()):
+        raise Http404('No such ballot.')
+
+    manifest = get_candidate_manifest(election_season_id, college_id)
+
+    response = JsonResponse(manifest)
+    if manifest['version'] == version:
+        patch_cache_control(response, private=True, max_age=31536000,
+                            immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def queued_ballot_receipt(request, receipt_id):
+    """
+    Redirects to the PDF receipt of a queued ballot once it is saved.
+    """
+    queued_ballot = (get_ballot_queue().get(receipt_id)
+                     if settings.ELECTIONS_BALLOT_QUEUE else None)
+
+    if queued_ballot is None:
+        raise Http404('No ballot has this receipt.')
+
+    if queued_ballot['status'] == 'COMMITTED':
+        return redirect(reverse('elections:ballot_pdf_receipt',
+                                kwargs={'id': queued_ballot['ballot_id']}))
+
+    if queued_ballot['status'] == 'REJECTED':
+        messages.add_message(request, messages.WARNING,
+            REJECTION_REASONS.get(queued_ballot['reason'],
+                                  'Your ballot was rejected.'))
+    else:
+        messages.add_message(request, messages.INFO,
+            'Your ballot is still being recorded. '
+            'Please try getting your receipt again in a while.')
+    return redirect(reverse('elections:index'))
+
+
+def results_last_modified(request, id):
+    results = get_results_summary(id)
+    return results[1] if results else None
+
+
+@condition(last_modified_func=results_last_modified)
+@cache_control(public=True, max_age=60)
+def season_results(request, id):
+    """
+    Results of a concluded election season in JSON,
+    for the statistics page and external dashboards to poll.
+    """
+    results = get_results_summary(id)
+    if results is None:
+        raise Http404('No results for this election season yet.')
+    return JsonResponse(results[0])
+
+
+@staff_required
+async def season_turnout(request, id):
+    """
+    Turnout of an election season in JSON, for the turnout dashboard.
+    Long-polled: given the version the viewer already has, it waits for
+    new ballots (up to TURNOUT_POLL_TIMEOUT seconds) before replying.
+    Waiting viewers only check the in-memory turnout aggregator, which
+    alone reads the new ballots.
+    """
+    turnout_aggregator = await sync_to_async(get_turnout_aggregator)(id)
+    try:
+        version = int(request.GET.get('version', ''))
+    except ValueError:
+        version = None
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TURNOUT_POLL_TIMEOUT
+    while True:
+        if turnout_aggregator.is_due():
+            await sync_to_async(turnout_aggregator.sync)()
+        if turnout_aggregator.version != version \
+                or loop.time() >= deadline:
+            break
+        await asyncio.sleep(1)
+
+    response = JsonResponse(turnout_aggregator.snapshot())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def request_metrics_export(request):
+    """
+    Request metrics of this process in the Prometheus text format,
+    if exporting them is enabled.
+    """
+    if not settings.ELECTIONS_METRICS_EXPORT:
+        raise Http404('Metrics are not exported.')
+    return HttpResponse(request_metrics.export_prometheus(),
+                        content_type='text/plain; version=0.0.4')
+
+
+async def ballot_pdf_receipt(request, id):
+    """
+    PDF receipt of a ballot. Receipts are rendered once then stored,
+    and are served with an ETag and Last-Modified for clients to cache.
+    """
+    try:
+        receipt = await aget_ballot_receipt_data(id)
+    except Ballot.DoesNotExist:
+        raise Http404('No such ballot.')
+
+    # Rendering is CPU-bound, so it is left to a thread of its own
+    path, digest = await sync_to_async(store_receipt,
+                                       thread_sensitive=False)(receipt)
+
+    etag = f'"{digest}"'
+    last_modified = int(path.stat().st_mtime)
+
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), as_attachment=False,
+                                filename="ballot.pdf")
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,116 @@
+from .models import ElectionSeasonWinningCandidate, OfferedPosition, \
+    RunningCandidate
+
+import hashlib
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_tiebreak_seed(election_season):
+    """
+    Returns the seed ties of an election season are broken with. It is
+    only known once the season is concluded, and stays the same after,
+    so anyone can redo the tiebreaking (see get_tiebreak_key()).
+    Seasons without a conclusion time (e.g. concluded before it was kept)
+    are seeded by their id alone.
+    """
+    if election_season.concluded_on is None:
+        return str(election_season.id)
+    return (f'{election_season.id}:'
+            f'{election_season.concluded_on.isoformat()}')
+
+
+def get_tiebreak_key(seed, running_candidate_id):
+    """
+    Returns the order a candidate is favored in a tie, by the SHA-256 of
+    '<seed>:<running candidate id>' (the lowest digest is favored).
+    """
+    return hashlib.sha256(
+        f'{seed}:{running_candidate_id}'.encode()).hexdigest()
+
+
+def pick_winners(votes, seats, seed):
+    """
+    Picks the winners of a position's seats out of a
+    { running_candidate_id: votes } dict of its candidates, by most votes.
+    Ties are broken by get_tiebreak_key(). Returns the ids of the winners
+    (by rank), and the ids of the candidates tied for the last seat if
+    the tie had to be broken, otherwise an empty list.
+    """
+    winners = heapq.nsmallest(
+        seats, votes,
+        key=lambda running_candidate_id: (
+            -votes[running_candidate_id],
+            get_tiebreak_key(seed, running_candidate_id)))
+
+    tied = []
+    if winners and len(votes) > len(winners):
+        last_seat_votes = votes[winners[-1]]
+        tied = sorted(running_candidate_id for running_candidate_id in votes
+                      if votes[running_candidate_id] == last_seat_votes)
+        # Only a tie if some of them did not get a seat
+        if all(running_candidate_id in winners
+               for running_candidate_id in tied):
+            tied = []
+
+    return winners, tied
+
+
+def get_season_winners(election_season, votes):
+    """
+    Picks the winners of every offered position of a concluded election
+    season, given a { running_candidate_id: votes } tally, in two queries.
+    Each position has as many winners as its max_positions_to_fill, and
+    disqualified candidates cannot win.
+
+    Returns the winners as unsaved ElectionSeasonWinningCandidate objects,
+    and the ties broken as a list of (position name, tied candidate ids).
+    """
+    seed = get_tiebreak_seed(election_season)
+
+    candidates_per_position = {}
+    for running_candidate in (RunningCandidate.objects
+                              .filter(election_season=election_season,
+                                      is_disqualified=False)
+                              .select_related('candidate')):
+        candidates_per_position.setdefault(
+            running_candidate.government_position_id, {})[
+                running_candidate.id] = running_candidate
+
+    winners = []
+    ties = []
+    for offered_position in (OfferedPosition.objects
+                             .filter(election_season=election_season)
+                             .select_related('government_position',
+                                             'government_position__college')
+                             .order_by('id')):
+        government_position = offered_position.government_position
+        running_candidates = candidates_per_position.get(
+            government_position.id, {})
+
+        position_winners, tied = pick_winners(
+            {running_candidate_id: votes.get(running_candidate_id, 0)
+             for running_candidate_id in running_candidates},
+            offered_position.max_positions_to_fill, seed)
+
+        position_name = str(government_position)
+        if tied:
+            logger.info('Tie of candidates %s for %s of %s broken with '
+                        'seed %r.', tied, position_name, election_season,
+                        seed)
+            ties.append((position_name, tied))
+
+        for running_candidate_id in position_winners:
+            running_candidate = running_candidates[running_candidate_id]
+            candidate = running_candidate.candidate
+            winners.append(ElectionSeasonWinningCandidate(
+                election_season=election_season,
+                running_candidate=running_candidate,
+                position_name=position_name,
+                ballot_number=running_candidate.ballot_number,
+                candidate_name=(f'{candidate.first_name} '
+                                f'{candidate.last_name}')))
+
+    return winners, ties
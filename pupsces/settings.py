@@ -88,10 +88,68 @@ WSGI_APPLICATION = 'pupsces.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_PROFILE picks one of:
+# - sqlite: the default SQLite database, fine for development.
+# - sqlite-wal: SQLite tuned for concurrent voters (see
+#   pupsces/backends/sqlite3/base.py), for single-server deployments.
+# - postgresql: PostgreSQL (needs psycopg2) with persistent connections,
+#   configured by the DATABASE_* variables below.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'pupsces'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            # Each worker keeps its connection for this many seconds,
+            # checking it is still usable before reusing it.
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE',
+                                               '600')),
+            'CONN_HEALTH_CHECKS': True,
+            # Set to True behind a transaction-pooling PgBouncer
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get(
+                'DATABASE_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite-wal':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'pupsces.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds to wait for the write lock
+                'timeout': int(os.environ.get('DATABASE_BUSY_TIMEOUT',
+                                              '20')),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Ballot layouts are kept in here. Use a cache shared by all worker
+# processes (e.g. file-based or Redis) so edits invalidate them everywhere
+# right away; otherwise, other processes see them after
+# ELECTIONS_LOOKUP_CACHE_TIMEOUT.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -176,3 +234,62 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Grappelli Admin
 
 GRAPPELLI_ADMIN_TITLE = 'PUPSC - Online Elections'
+
+
+# Elections
+
+# Keep live vote counters of each candidate while ballots are casted.
+# The counters are then checked against a recount upon conclusion.
+ELECTIONS_LIVE_TALLY = os.environ.get('ELECTIONS_LIVE_TALLY',
+                                      'False') == 'True'
+ELECTIONS_LIVE_TALLY_SHARDS = int(
+    os.environ.get('ELECTIONS_LIVE_TALLY_SHARDS', '8'))
+
+# Have concluding a season and refreshing its winners run in the background
+# by `manage.py run_jobs`, instead of in the admin's request.
+ELECTIONS_BACKGROUND_JOBS = os.environ.get('ELECTIONS_BACKGROUND_JOBS',
+                                           'False') == 'True'
+
+# Only let voters on the voter roll of the season vote, for the college the
+# roll gives them, instead of having them choose their college.
+ELECTIONS_VOTER_ROLL = os.environ.get('ELECTIONS_VOTER_ROLL',
+                                      'False') == 'True'
+
+# Path of a SQLite journal where submitted ballots are queued, to be saved
+# in batches by `manage.py commit_ballots`. Ballots are saved right away
+# if not set.
+ELECTIONS_BALLOT_QUEUE = os.environ.get('ELECTIONS_BALLOT_QUEUE') or None
+
+# Reject ballots not signed by the voter's browser. Browsers can only sign
+# ballots over HTTPS (or on localhost), so only set this when served so.
+ELECTIONS_REQUIRE_BALLOT_SIGNATURES = os.environ.get(
+    'ELECTIONS_REQUIRE_BALLOT_SIGNATURES', 'False') == 'True'
+
+# Render the PDF receipt of a ballot in the background right after it is
+# casted. Receipts are stored under MEDIA_ROOT/receipts/ either way.
+ELECTIONS_PREGENERATE_RECEIPTS = os.environ.get(
+    'ELECTIONS_PREGENERATE_RECEIPTS', 'False') == 'True'
+
+# Record the latency and database queries of each request, per URL name.
+# Viewable in the admin at /admin/elections/electionseason/request-metrics/,
+# and kept in memory by each process.
+ELECTIONS_REQUEST_METRICS = os.environ.get('ELECTIONS_REQUEST_METRICS',
+                                           'False') == 'True'
+if ELECTIONS_REQUEST_METRICS:
+    MIDDLEWARE.insert(0, 'elections.middleware.RequestMetricsMiddleware')
+# Also expose them at /metrics/ in the Prometheus text format.
+ELECTIONS_METRICS_EXPORT = os.environ.get('ELECTIONS_METRICS_EXPORT',
+                                          'False') == 'True'
+
+# Seconds between reads of new ballots by the turnout dashboard, shared by
+# all of its viewers in a process.
+ELECTIONS_TURNOUT_REFRESH_INTERVAL = int(
+    os.environ.get('ELECTIONS_TURNOUT_REFRESH_INTERVAL', '2'))
+
+# Seconds the current election season, whether a voter has voted, the
+# versions of the ballot layouts and of the voter rolls, and the stored
+# results are cached. With a cache shared by all processes, changes are seen
+# right away regardless; otherwise this bounds how long other processes lag
+# behind.
+ELECTIONS_LOOKUP_CACHE_TIMEOUT = int(
+    os.environ.get('ELECTIONS_LOOKUP_CACHE_TIMEOUT', '30'))